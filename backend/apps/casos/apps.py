@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class CasosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.apps.casos'
+
+    def ready(self):
+        # Mantenimiento de caso_finanzas a partir de datos_modificados
+        from . import finanzas  # noqa: F401
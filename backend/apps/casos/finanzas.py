@@ -0,0 +1,182 @@
+"""
+Resumen financiero por caso (tabla `caso_finanzas`).
+
+Cada escritura sobre Donacion o Gasto emite `datos_modificados`; aquí se
+recalculan desde las tablas de hechos, dentro de la misma transacción, los
+casos afectados (el de antes y el de después si la fila cambió de caso). Antes
+de recalcular se bloquean las filas de esos casos (SELECT ... FOR UPDATE) para
+que dos transacciones concurrentes sobre el mismo caso no se pisen.
+
+Un caso sin fila en `caso_finanzas` equivale a un caso sin movimientos (todo en 0).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from backend.apps.core import estados
+from backend.apps.core.signals import datos_modificados
+from backend.apps.donaciones.models import Donacion
+from backend.apps.finanzas.models import Gasto
+
+from .models import Caso, CasoFinanzas
+
+CAMPOS = ('recaudado', 'gastado', 'gastado_con_pendiente', 'ultimo_movimiento', 'cantidad_donaciones')
+CEROS = {
+    'recaudado': Decimal('0'),
+    'gastado': Decimal('0'),
+    'gastado_con_pendiente': Decimal('0'),
+    'ultimo_movimiento': None,
+    'cantidad_donaciones': 0,
+}
+
+# Campos de cada tabla de hechos que afectan el resumen
+_CAMPOS_RELEVANTES = {
+    Donacion: ('id_caso_id', 'monto', 'estado', 'fecha_donacion'),
+    Gasto: ('id_caso_id', 'monto', 'estado', 'fecha_pago'),
+}
+
+
+def anotar_finanzas(queryset):
+    """Anota total_recaudado / total_gastado de un queryset de Caso (un LEFT JOIN a caso_finanzas)."""
+    return queryset.annotate(
+        total_recaudado=Coalesce(F('finanzas__recaudado'), Decimal('0'), output_field=DecimalField()),
+        total_gastado=Coalesce(F('finanzas__gastado'), Decimal('0'), output_field=DecimalField()),
+    )
+
+
+def casos_afectados(model, antes, despues):
+    campos = _CAMPOS_RELEVANTES[model]
+    pk = model._meta.pk.attname
+    previos = {fila[pk]: fila for fila in antes if fila.get(pk) is not None}
+    ids = set()
+    for fila in despues:
+        previa = previos.pop(fila.get(pk), None)
+        if previa is not None:
+            if all(previa.get(c) == fila.get(c) for c in campos):
+                continue
+            ids.add(previa.get('id_caso_id'))
+        ids.add(fila.get('id_caso_id'))
+    for previa in previos.values():
+        ids.add(previa.get('id_caso_id'))
+    ids.discard(None)
+    return ids
+
+
+def calcular(caso_ids, using='default', donacion=Donacion, gasto=Gasto):
+    """
+    {id_caso: valores} calculados sobre las tablas de hechos (solo casos con
+    movimientos). `donacion`/`gasto` permiten pasar modelos históricos desde
+    una migración.
+    """
+    exito = estados.filtro(Donacion, 'exito')
+    donaciones = (
+        donacion._base_manager.using(using).filter(id_caso__in=caso_ids)
+        .values('id_caso')
+        .annotate(
+            recaudado=Sum('monto', filter=exito),
+            cantidad_donaciones=Count('pk', filter=exito),
+            ultima=Max('fecha_donacion', filter=exito),
+        )
+        .order_by()
+    )
+    gastos = (
+        gasto._base_manager.using(using).filter(id_caso__in=caso_ids)
+        .values('id_caso')
+        .annotate(
+            gastado=Sum('monto', filter=estados.filtro(Gasto, 'pagado')),  # Excluye PENDIENTE y ANULADO
+            gastado_con_pendiente=Sum('monto'),
+            ultima=Max('fecha_pago'),
+        )
+        .order_by()
+    )
+
+    resultado = {}
+    for fila in list(donaciones) + list(gastos):
+        valores = resultado.setdefault(fila['id_caso'], dict(CEROS))
+        for campo in ('recaudado', 'gastado', 'gastado_con_pendiente', 'cantidad_donaciones'):
+            if fila.get(campo):
+                valores[campo] = fila[campo]
+        ultima = fila['ultima']
+        if ultima and (valores['ultimo_movimiento'] is None or ultima > valores['ultimo_movimiento']):
+            valores['ultimo_movimiento'] = ultima
+    return {
+        caso_id: valores for caso_id, valores in resultado.items()
+        if valores != CEROS
+    }
+
+
+def recalcular(caso_ids, using='default'):
+    """Recalcula y guarda (upsert) el resumen de los casos indicados."""
+    ids = sorted(set(caso_ids))
+    if not ids:
+        return 0
+    with transaction.atomic(using=using):
+        # Bloqueo en orden de pk para evitar deadlocks entre escritores
+        existentes = list(
+            Caso.objects.using(using).select_for_update()
+            .filter(pk__in=ids).order_by('pk').values_list('pk', flat=True)
+        )
+        datos = calcular(existentes, using)
+        CasoFinanzas.objects.using(using).bulk_create(
+            [CasoFinanzas(caso_id=caso_id, **datos.get(caso_id, CEROS)) for caso_id in existentes],
+            update_conflicts=True,
+            unique_fields=['caso'],
+            update_fields=[*CAMPOS, 'actualizado'],
+        )
+        huerfanos = set(ids) - set(existentes)
+        if huerfanos:
+            CasoFinanzas.objects.using(using).filter(pk__in=huerfanos).delete()
+    return len(existentes)
+
+
+@receiver(datos_modificados)
+def _actualizar_finanzas(sender, antes, despues, using=None, **kwargs):
+    if sender in _CAMPOS_RELEVANTES:
+        recalcular(casos_afectados(sender, antes, despues), using or 'default')
+
+
+@receiver(post_delete, sender=Caso)
+def _borrar_finanzas(sender, instance, using=None, **kwargs):
+    CasoFinanzas.objects.using(using).filter(pk=instance.pk).delete()
+
+
+# --- Reconciliación -------------------------------------------------------
+
+def _lotes_de_casos(using, batch_size):
+    ultimo = 0
+    while True:
+        lote = list(
+            Caso.objects.using(using).filter(pk__gt=ultimo).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1]
+
+
+def diferencias(using='default', batch_size=1000):
+    """
+    Genera (id_caso, esperado, actual) por cada caso cuyo resumen no coincide
+    con las tablas de hechos, recorriendo los casos en lotes.
+    """
+    for lote in _lotes_de_casos(using, batch_size):
+        esperados = calcular(lote, using)
+        actuales = {
+            fila.pop('caso_id'): fila
+            for fila in CasoFinanzas.objects.using(using).filter(pk__in=lote).values('caso_id', *CAMPOS)
+        }
+        for caso_id in lote:
+            esperado = esperados.get(caso_id, CEROS)
+            actual = actuales.get(caso_id, CEROS)
+            if esperado != actual:
+                yield caso_id, esperado, actual
+
+
+def huerfanos(using='default'):
+    """Filas de caso_finanzas cuyo caso ya no existe."""
+    return CasoFinanzas.objects.using(using).exclude(caso_id__in=Caso.objects.using(using).values('pk'))
@@ -0,0 +1,46 @@
+"""
+Compara el resumen caso_finanzas con las tablas de hechos y, con --fix,
+corrige los casos desviados en lotes (también borra filas huérfanas).
+
+    python manage.py reconcile_caso_finanzas
+    python manage.py reconcile_caso_finanzas --fix --batch-size 500
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.apps.casos import finanzas
+
+
+class Command(BaseCommand):
+    help = 'Detecta (y con --fix corrige) desvíos entre caso_finanzas y donaciones/gastos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recalcular los casos desviados')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        batch_size = options['batch_size']
+
+        desviados = []
+        for caso_id, esperado, actual in finanzas.diferencias(using, batch_size):
+            if len(desviados) < 20:
+                self.stdout.write(f"  caso {caso_id}: esperado={esperado} actual={actual}")
+            desviados.append(caso_id)
+        huerfanos = finanzas.huerfanos(using)
+        cantidad_huerfanos = huerfanos.count()
+        self.stdout.write(f"{len(desviados)} casos desviados, {cantidad_huerfanos} filas huérfanas")
+
+        if not options['fix']:
+            if desviados or cantidad_huerfanos:
+                raise CommandError('caso_finanzas inconsistente; ejecute con --fix')
+            self.stdout.write(self.style.SUCCESS('caso_finanzas consistente'))
+            return
+
+        for inicio in range(0, len(desviados), batch_size):
+            finanzas.recalcular(desviados[inicio:inicio + batch_size], using)
+        if cantidad_huerfanos:
+            huerfanos.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(desviados)} casos recalculados, {cantidad_huerfanos} filas huérfanas eliminadas"
+        ))
@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def renombrar_presupuesto(apps, schema_editor):
+    # 0001 creó la columna `presupuesto`, pero las bases existentes ya usan
+    # `presupuesto_estimado` (el modelo cambió sin migración): solo se renombra
+    # si la columna vieja existe.
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columnas = [c.name for c in connection.introspection.get_table_description(cursor, 'casos')]
+    if 'presupuesto' in columnas and 'presupuesto_estimado' not in columnas:
+        q = schema_editor.quote_name
+        schema_editor.execute(
+            f"ALTER TABLE {q('casos')} RENAME COLUMN {q('presupuesto')} TO {q('presupuesto_estimado')}"
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(renombrar_presupuesto, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.RenameField(
+                    model_name='caso',
+                    old_name='presupuesto',
+                    new_name='presupuesto_estimado',
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CasoFinanzas',
+            fields=[
+                ('caso', models.OneToOneField(db_column='id_caso', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='finanzas', serialize=False, to='casos.caso')),
+                ('recaudado', models.DecimalField(decimal_places=2, default=0, help_text='Donaciones exitosas', max_digits=14)),
+                ('gastado', models.DecimalField(decimal_places=2, default=0, help_text='Gastos APROBADA/PAGADO', max_digits=14)),
+                ('gastado_con_pendiente', models.DecimalField(decimal_places=2, default=0, help_text='Todos los gastos', max_digits=14)),
+                ('ultimo_movimiento', models.DateField(blank=True, null=True)),
+                ('cantidad_donaciones', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Finanzas del caso',
+                'verbose_name_plural': 'Finanzas de casos',
+                'db_table': 'caso_finanzas',
+            },
+        ),
+    ]
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+
+# Copias congeladas de core.estados y casos.finanzas al momento de la migración
+ALIAS = {
+    'ABIERTA': 'ABIERTO',
+    'CERRADA': 'CERRADO',
+    'TRATAMIENTO': 'EN_TRATAMIENTO',
+    'ADOPTADA': 'ADOPTADO',
+    'FALLECIDA': 'FALLECIDO',
+}
+CAMPOS = ('recaudado', 'gastado', 'gastado_con_pendiente', 'ultimo_movimiento', 'cantidad_donaciones')
+CEROS = {
+    'recaudado': Decimal('0'),
+    'gastado': Decimal('0'),
+    'gastado_con_pendiente': Decimal('0'),
+    'ultimo_movimiento': None,
+    'cantidad_donaciones': 0,
+}
+
+
+def normalizar(valor):
+    limpio = ' '.join(str(valor).split())
+    if not limpio:
+        return None
+    limpio = limpio.upper().replace(' ', '_')
+    return ALIAS.get(limpio, limpio)
+
+
+def normalizar_estados(apps, schema_editor):
+    # Reescribe por lotes (por pk) los estados no canónicos
+    Caso = apps.get_model('casos', 'Caso')
+    canonicos = {valor for valor, _ in Caso._meta.get_field('estado').choices}
+    pendientes = Caso._base_manager.exclude(estado__in=canonicos).exclude(estado__isnull=True).order_by('pk')
+    ultimo = None
+    while True:
+        lote_qs = pendientes.filter(pk__gt=ultimo) if ultimo is not None else pendientes
+        lote = list(lote_qs.values_list('pk', 'estado')[:1000])
+        if not lote:
+            return
+        por_valor = defaultdict(list)
+        for pk, valor in lote:
+            nuevo = normalizar(valor)
+            if nuevo != valor:
+                por_valor[nuevo].append(pk)
+        for nuevo, pks in por_valor.items():
+            Caso._base_manager.filter(pk__in=pks).update(estado=nuevo)
+        ultimo = lote[-1][0]
+
+
+def calcular(caso_ids, using, Donacion, Gasto):
+    """{id_caso: valores} de los casos con movimientos (donaciones APROBADA, gastos PAGADO)."""
+    exito = Q(estado='APROBADA')
+    donaciones = (
+        Donacion._base_manager.using(using).filter(id_caso__in=caso_ids)
+        .values('id_caso')
+        .annotate(
+            recaudado=Sum('monto', filter=exito),
+            cantidad_donaciones=Count('pk', filter=exito),
+            ultima=Max('fecha_donacion', filter=exito),
+        )
+        .order_by()
+    )
+    gastos = (
+        Gasto._base_manager.using(using).filter(id_caso__in=caso_ids)
+        .values('id_caso')
+        .annotate(
+            gastado=Sum('monto', filter=Q(estado='PAGADO')),
+            gastado_con_pendiente=Sum('monto'),
+            ultima=Max('fecha_pago'),
+        )
+        .order_by()
+    )
+
+    resultado = {}
+    for fila in list(donaciones) + list(gastos):
+        valores = resultado.setdefault(fila['id_caso'], dict(CEROS))
+        for campo in ('recaudado', 'gastado', 'gastado_con_pendiente', 'cantidad_donaciones'):
+            if fila.get(campo):
+                valores[campo] = fila[campo]
+        ultima = fila['ultima']
+        if ultima and (valores['ultimo_movimiento'] is None or ultima > valores['ultimo_movimiento']):
+            valores['ultimo_movimiento'] = ultima
+    return resultado
+
+
+def recalcular_finanzas(apps, schema_editor):
+    # Las migraciones de estado de donaciones/gastos no emiten señales: se
+    # recalcula caso_finanzas con los estados ya normalizados.
+    Caso = apps.get_model('casos', 'Caso')
+    CasoFinanzas = apps.get_model('casos', 'CasoFinanzas')
+    Donacion = apps.get_model('donaciones', 'Donacion')
+    Gasto = apps.get_model('finanzas', 'Gasto')
+    using = schema_editor.connection.alias
+    ids = list(Caso.objects.using(using).order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(ids), 1000):
+        lote = ids[inicio:inicio + 1000]
+        datos = calcular(lote, using, Donacion, Gasto)
+        CasoFinanzas.objects.using(using).bulk_create(
+            [CasoFinanzas(caso_id=caso_id, **datos.get(caso_id, CEROS)) for caso_id in lote],
+            update_conflicts=True,
+            unique_fields=['caso'],
+            update_fields=list(CAMPOS),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0002_caso_finanzas'),
+        ('donaciones', '0002_estado_canonico'),
+        ('finanzas', '0002_estado_canonico'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_estados, migrations.RunPython.noop),
+        migrations.RunPython(recalcular_finanzas, migrations.RunPython.noop),
+    ]
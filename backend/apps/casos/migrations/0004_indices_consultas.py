@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0003_estado_canonico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='caso',
+            index=models.Index(fields=['fecha_ingreso'], name='casos_fecha_ingreso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caso',
+            index=models.Index(fields=['estado', 'fecha_ingreso'], name='casos_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caso',
+            index=models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['fecha_ingreso'], name='casos_activos_idx'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from backend.apps.core.models import TimeStampedModel
+from backend.apps.core.models import TrackedModel
 
 class HogarDePaso(models.Model):
     """
@@ -28,7 +28,7 @@ class HogarDePaso(models.Model):
     def __str__(self):
         return str(self.nombre_hogar)
 
-class Caso(TimeStampedModel):
+class Caso(TrackedModel):
     """
     Representa un caso de rescate o ayuda a un animal específico.
     """
@@ -54,8 +54,47 @@ class Caso(TimeStampedModel):
 
     class Meta:
         db_table = 'casos'
+        indexes = [
+            # Listado (ordering -fecha_ingreso) y filtros por rango de ingreso
+            models.Index(fields=['fecha_ingreso'], name='casos_fecha_ingreso_idx'),
+            # Conteos por estado en los KPIs
+            models.Index(fields=['estado', 'fecha_ingreso'], name='casos_estado_fecha_idx'),
+            # Casos activos (fecha_salida IS NULL): Dashboard, KPIs y /casos/activos/
+            models.Index(
+                fields=['fecha_ingreso'], condition=models.Q(fecha_salida__isnull=True),
+                name='casos_activos_idx',
+            ),
+        ]
         verbose_name = _('Caso')
         verbose_name_plural = _('Casos')
 
     def __str__(self):
         return str(self.nombre_caso)
+
+
+class CasoFinanzas(models.Model):
+    """
+    Resumen financiero denormalizado por caso (una fila por caso con movimientos).
+    Se mantiene en la misma transacción de cada escritura sobre Donacion/Gasto
+    (ver `casos/finanzas.py`); `manage.py reconcile_caso_finanzas` corrige desvíos.
+    """
+    # Sin constraint en BD: durante el borrado en cascada de un caso las señales
+    # de sus donaciones/gastos pueden reescribir la fila antes de borrar el caso.
+    caso = models.OneToOneField(
+        Caso, primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False,
+        db_column='id_caso', related_name='finanzas'
+    )
+    recaudado = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Donaciones exitosas")
+    gastado = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Gastos APROBADA/PAGADO")
+    gastado_con_pendiente = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Todos los gastos")
+    ultimo_movimiento = models.DateField(null=True, blank=True)
+    cantidad_donaciones = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'caso_finanzas'
+        verbose_name = _('Finanzas del caso')
+        verbose_name_plural = _('Finanzas de casos')
+
+    def __str__(self):
+        return f"Finanzas caso {self.caso_id}"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import HogarDePaso, Caso
+from backend.apps.core.serializers import EstadoField
 
 class HogarDePasoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,10 +12,13 @@ class CasoSerializer(serializers.ModelSerializer):
     total_gastado = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     nombre_hogar_de_paso = serializers.CharField(source='id_hogar_de_paso.nombre_hogar', read_only=True, allow_null=True)
     dias_activo = serializers.SerializerMethodField()
+    estado = EstadoField(Caso)
     
     class Meta:
         model = Caso
         fields = '__all__'
+        # FK que leen los campos de solo lectura (ver core/carga.py)
+        relaciones = {'id_hogar_de_paso': ('nombre_hogar',)}
     
     def get_dias_activo(self, obj):
         """Calculate days since fecha_ingreso (only for active cases)"""
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.test import TestCase
+
+from backend.apps.core.carga import cargar, verificar_consultas
+
+from .finanzas import anotar_finanzas
+from .models import Caso, HogarDePaso
+from .serializers import CasoSerializer
+
+
+class CasoSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Un hogar de paso distinto por caso: una FK sin cargar se nota
+        for i in range(5):
+            Caso.objects.create(
+                nombre_caso=f'Caso {i}', fecha_ingreso=date(2024, 3, 1 + i),
+                id_hogar_de_paso=HogarDePaso.objects.create(nombre_hogar=f'Hogar {i}'),
+            )
+
+    def test_sin_n_mas_1(self):
+        # Como en CasoViewSet: totales de caso_finanzas anotados en el listado
+        queryset = cargar(anotar_finanzas(Caso.objects.all()), CasoSerializer)
+        verificar_consultas(CasoSerializer, queryset, filas=5)
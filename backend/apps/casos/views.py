@@ -2,50 +2,37 @@ from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Sum, Q, F, ExpressionWrapper, fields
-from django.utils import timezone
 from datetime import date
 from .models import Caso, HogarDePaso
+from .finanzas import anotar_finanzas
 from .serializers import CasoSerializer, HogarDePasoSerializer
 from backend.apps.donaciones.serializers import DonacionSerializer
 from backend.apps.finanzas.serializers import GastoSerializer
+from backend.apps.core.cache import cachear_respuesta
+from backend.apps.core.carga import CargaAnticipadaMixin, cargar
+from backend.apps.core.exports import Columna, ExportacionMixin
+from backend.apps.core.replicas import LecturaReplicaMixin
 
-class CasoViewSet(viewsets.ModelViewSet):
+class CasoViewSet(LecturaReplicaMixin, CargaAnticipadaMixin, ExportacionMixin, viewsets.ModelViewSet):
     queryset = Caso.objects.all()
     serializer_class = CasoSerializer
     search_fields = ['nombre_caso', 'diagnostico']
     ordering_fields = ['fecha_ingreso', 'updated_at']
     filterset_fields = ['estado', 'veterinaria']
     ordering = ['-fecha_ingreso']
+    nombre_exportacion = 'casos'
+    columnas_exportacion = [
+        Columna('ID', 'id_caso'),
+        Columna('Nombre', 'nombre_caso'),
+        Columna('Estado', 'estado'),
+        Columna('Fecha Ingreso', 'fecha_ingreso'),
+        Columna('Veterinaria', 'veterinaria'),
+        Columna('Diagnóstico', 'diagnostico'),
+    ]
 
     def get_queryset(self):
-        """Override to add computed fields using Subqueries to avoid aggregation issues"""
-        from decimal import Decimal
-        from django.db.models import DecimalField, OuterRef, Subquery
-        from django.db.models.functions import Coalesce
-        from backend.apps.donaciones.models import Donacion
-        from backend.apps.finanzas.models import Gasto
-        
-        queryset = super().get_queryset()
-        
-        # Estados válidos para donaciones
-        estados_validos = ['APROBADA', 'Aprobada', 'aprobada', 'COMPLETADA', 'Completada', 'completada']
-        
-        # Subquery para total_recaudado
-        sq_recaudado = Donacion.objects.filter(
-            id_caso=OuterRef('pk'),
-            estado__in=estados_validos
-        ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
-        
-        # Subquery para total_gastado (solo gastos APROBADA o PAGADO, excluir PENDIENTE)
-        sq_gastado = Gasto.objects.filter(
-            id_caso=OuterRef('pk'),
-            estado__in=['APROBADA', 'PAGADO']  # Excluir PENDIENTE
-        ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
-        
-        queryset = queryset.annotate(
-            total_recaudado=Coalesce(Subquery(sq_recaudado), Decimal('0'), output_field=DecimalField()),
-            total_gastado=Coalesce(Subquery(sq_gastado), Decimal('0'), output_field=DecimalField())
-        )
+        """Agrega total_recaudado / total_gastado desde el resumen caso_finanzas (un LEFT JOIN)"""
+        queryset = anotar_finanzas(super().get_queryset())
         
         # Filtro de fecha para la lista principal
         start_date = self.request.query_params.get('start_date')
@@ -56,11 +43,22 @@ class CasoViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def filtrar_exportacion(self, queryset):
+        # Legacy (fecha_desde/fecha_hasta) + nuevos (start_date/end_date)
+        params = self.request.query_params
+        for desde in (params.get('fecha_desde'), params.get('start_date')):
+            if desde:
+                queryset = queryset.filter(fecha_ingreso__gte=desde)
+        for hasta in (params.get('fecha_hasta'), params.get('end_date')):
+            if hasta:
+                queryset = queryset.filter(fecha_ingreso__lte=hasta)
+        return queryset
+
     @action(detail=False, methods=['get'])
+    @cachear_respuesta('casos.kpis')
     def kpis(self, request):
         """Retorna indicadores clave de estado para casos"""
         from datetime import date, datetime
-        from decimal import Decimal
         from django.db.models import Avg
         
         # Obtener fechas del filtro
@@ -147,10 +145,9 @@ class CasoViewSet(viewsets.ModelViewSet):
         # KPIs Operativos Avanzados
         # Para costo diario, necesitamos incluir TODOS los gastos (incluso PENDIENTE)
         # porque queremos ver el "burn rate" real
-        from backend.apps.finanzas.models import Gasto
         # Importante: total gastado de los casos activos filtrados
         total_gastado_con_pendiente = casos_activos.aggregate(
-            total=Sum('gastos__monto')  # Incluye TODOS los gastos, incluso PENDIENTE
+            total=Sum('finanzas__gastado_con_pendiente')  # Incluye TODOS los gastos, incluso PENDIENTE
         )['total'] or 0
         
         # Costo diario promedio por caso (con todos los gastos)
@@ -202,7 +199,7 @@ class CasoViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def activos(self, request):
         """Retorna casos que no tienen fecha de salida (activos)"""
-        casos = Caso.objects.filter(fecha_salida__isnull=True)
+        casos = cargar(Caso.objects.filter(fecha_salida__isnull=True), CasoSerializer)
         serializer = self.get_serializer(casos, many=True)
         return Response(serializer.data)
 
@@ -221,128 +218,29 @@ class CasoViewSet(viewsets.ModelViewSet):
             "total_recaudado": total_donado,
             "total_gastado": total_gastado,
             "balance": total_donado - total_gastado,
-            "donaciones": DonacionSerializer(donaciones, many=True).data,
-            "gastos": GastoSerializer(gastos, many=True).data
+            "donaciones": DonacionSerializer(cargar(donaciones, DonacionSerializer), many=True).data,
+            "gastos": GastoSerializer(cargar(gastos, GastoSerializer), many=True).data
         })
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar casos a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="casos_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Nombre', 'Estado', 'Fecha Ingreso', 'Veterinaria', 'Diagnóstico'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        fecha_desde = request.query_params.get('fecha_desde')
-        fecha_hasta = request.query_params.get('fecha_hasta')
-        
-        if fecha_desde:
-            queryset = queryset.filter(fecha_ingreso__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_ingreso__lte=fecha_hasta)
-            
-        # Support new params
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if start_date:
-             queryset = queryset.filter(fecha_ingreso__gte=start_date)
-        if end_date:
-             queryset = queryset.filter(fecha_ingreso__lte=end_date)
-            
-        for obj in queryset:
-            writer.writerow([
-                obj.id_caso,
-                obj.nombre_caso,
-                obj.estado,
-                obj.fecha_ingreso,
-                obj.veterinaria,
-                obj.diagnostico
-            ])
-            
-        return response
-
-    @action(detail=False, methods=['get'])
-    def exportar_excel(self, request):
-        """Exportar casos a Excel (.xlsx)"""
-        import openpyxl
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="casos_{timezone.now().date()}.xlsx"'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Casos"
-        
-        headers = ['ID', 'Nombre', 'Estado', 'Fecha Ingreso', 'Veterinaria', 'Diagnóstico']
-        ws.append(headers)
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Filtros (Legacy + New)
-        start_date = request.query_params.get('start_date') or request.query_params.get('fecha_desde')
-        end_date = request.query_params.get('end_date') or request.query_params.get('fecha_hasta')
-        
-        if start_date:
-            queryset = queryset.filter(fecha_ingreso__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(fecha_ingreso__lte=end_date)
-            
-        for obj in queryset:
-            ws.append([
-                obj.id_caso,
-                obj.nombre_caso,
-                obj.estado,
-                obj.fecha_ingreso,
-                obj.veterinaria,
-                obj.diagnostico
-            ])
-            
-        wb.save(response)
-        return response
-
-class HogarDePasoViewSet(viewsets.ModelViewSet):
+class HogarDePasoViewSet(LecturaReplicaMixin, ExportacionMixin, viewsets.ModelViewSet):
     queryset = HogarDePaso.objects.all()
     serializer_class = HogarDePasoSerializer
     permission_classes = [permissions.IsAuthenticated]
     ordering = ['-id_hogar_de_paso']
+    nombre_exportacion = 'hogares'
+    columnas_exportacion = [
+        Columna('ID', 'id_hogar_de_paso'),
+        Columna('Nombre', 'nombre_hogar'),
+        Columna('Contacto', 'nombre_contacto'),
+        Columna('Teléfono', 'telefono'),
+        Columna('Ciudad', 'ciudad'),
+        Columna('Cupo Máx', 'cupo_maximo'),
+    ]
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar hogares de paso a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="hogares_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Nombre', 'Contacto', 'Teléfono', 'Ciudad', 'Cupo Máx'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
+    def filtrar_exportacion(self, queryset):
         # Filtro opcional por ciudad
-        ciudad = request.query_params.get('ciudad')
+        ciudad = self.request.query_params.get('ciudad')
         if ciudad:
             queryset = queryset.filter(ciudad__icontains=ciudad)
-            
-        for obj in queryset:
-            writer.writerow([
-                obj.id_hogar_de_paso,
-                obj.nombre_hogar,
-                obj.nombre_contacto,
-                obj.telefono,
-                obj.ciudad,
-                obj.cupo_maximo
-            ])
-            
-        return response
+        return queryset
+
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.apps.core'
+
+    def ready(self):
+        # Receptores de `datos_modificados` (datos derivados de donaciones/gastos)
+        from . import busqueda, cache, checks, rollups  # noqa: F401
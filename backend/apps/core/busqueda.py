@@ -0,0 +1,254 @@
+"""
+Búsqueda (`?search=`) sobre un documento precalculado por fila.
+
+La tabla `documentos_busqueda` guarda, por fuente y objeto, el texto de los
+`search_fields` de su ViewSet (leídos del ViewSet, incluidos los de FK como
+`id_donante__donante`) normalizado: en minúsculas y sin tildes. Se mantiene
+en cada escritura desde `datos_modificados`, también cuando cambia el
+registro relacionado (renombrar un donante reindexa sus donaciones).
+
+* Filtro: cada término debe aparecer en el texto (`texto LIKE '%term%'`), la
+  misma semántica que el `icontains` de DRF pero sobre una sola columna, sin
+  JOINs ni OR. En PostgreSQL la cubre un índice GIN `gin_trgm_ops`.
+* Orden: sin `?ordering=`, los resultados salen por relevancia. En PostgreSQL
+  `ts_rank` sobre la columna `vector` (tsvector generada, con su índice GIN)
+  más `similarity()` de pg_trgm; en SQLite, `rango_busqueda()`, una función
+  en Python registrada en la conexión.
+
+`python manage.py reindexar_busqueda` reconstruye los documentos (tras la
+primera migración) y `benchmark_busqueda` compara con `icontains`.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import cached_property
+
+from django.apps import apps
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import FloatField, Func, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import DocumentoBusqueda
+from .signals import datos_modificados
+
+SEPARADOR = ' | '
+CONFIGURACION_TS = 'simple'
+
+
+@dataclass(frozen=True)
+class FuenteBusqueda:
+    nombre: str
+    modelo: str
+    # ViewSet cuyos `search_fields` forman el documento
+    vista: str
+
+    @property
+    def model(self):
+        return apps.get_model(self.modelo)
+
+    @cached_property
+    def campos(self):
+        # Se leen del ViewSet al primer uso (las vistas importan este módulo)
+        return tuple(import_string(self.vista).search_fields)
+
+    def dependencias(self):
+        """{modelo relacionado: (fk, campos buscados en él)}, p.ej. Donante -> ('id_donante', {'donante', ...})."""
+        deps = {}
+        for campo in self.campos:
+            if '__' not in campo:
+                continue
+            fk, resto = campo.split('__', 1)
+            relacionado = self.model._meta.get_field(fk).related_model
+            deps.setdefault(relacionado, (fk, set()))[1].add(resto)
+        return deps
+
+
+FUENTES = {
+    'donaciones': FuenteBusqueda('donaciones', 'donaciones.Donacion', 'backend.apps.donaciones.views.DonacionViewSet'),
+    'donantes': FuenteBusqueda('donantes', 'donaciones.Donante', 'backend.apps.donaciones.views.DonanteViewSet'),
+    'gastos': FuenteBusqueda('gastos', 'finanzas.Gasto', 'backend.apps.finanzas.views.GastoViewSet'),
+    'casos': FuenteBusqueda('casos', 'casos.Caso', 'backend.apps.casos.views.CasoViewSet'),
+}
+
+
+def fuente_de_modelo(model):
+    etiqueta = model._meta.label
+    for fuente in FUENTES.values():
+        if fuente.modelo == etiqueta:
+            return fuente
+    return None
+
+
+def normalizar_texto(valor):
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def documento(valores):
+    return SEPARADOR.join(normalizar_texto(v) for v in valores if v not in (None, ''))
+
+
+# --- Mantenimiento ----------------------------------------------------------
+
+def indexar(fuente, pks, using='default', batch_size=1000):
+    """Reescribe los documentos de `pks` (los que ya no existen se borran)."""
+    pks = list(pks)
+    model = fuente.model
+    escritos = 0
+    for inicio in range(0, len(pks), batch_size):
+        lote = pks[inicio:inicio + batch_size]
+        filas = model._base_manager.using(using).filter(pk__in=lote).values_list('pk', *fuente.campos)
+        documentos = [
+            DocumentoBusqueda(fuente=fuente.nombre, objeto_id=pk, texto=documento(valores))
+            for pk, *valores in filas
+        ]
+        DocumentoBusqueda.objects.using(using).bulk_create(
+            documentos, update_conflicts=True, unique_fields=['fuente', 'objeto_id'], update_fields=['texto'],
+        )
+        existentes = {doc.objeto_id for doc in documentos}
+        borrados = set(lote) - existentes
+        if borrados:
+            DocumentoBusqueda.objects.using(using).filter(fuente=fuente.nombre, objeto_id__in=borrados).delete()
+        escritos += len(documentos)
+    return escritos
+
+
+def reconstruir(fuente, using='default', batch_size=2000):
+    """Reindexa toda la fuente recorriendo la tabla por pk. Retorna los documentos escritos."""
+    model = fuente.model
+    DocumentoBusqueda.objects.using(using).filter(fuente=fuente.nombre).exclude(
+        objeto_id__in=model._base_manager.using(using).values('pk')
+    ).delete()
+    escritos = 0
+    ultimo = None
+    while True:
+        qs = model._base_manager.using(using).order_by('pk')
+        if ultimo is not None:
+            qs = qs.filter(pk__gt=ultimo)
+        lote = list(qs.values_list('pk', flat=True)[:batch_size])
+        if not lote:
+            return escritos
+        escritos += indexar(fuente, lote, using, batch_size)
+        ultimo = lote[-1]
+
+
+def _cambiaron(campos, antes, despues):
+    """PKs de las filas cuyos `campos` cambiaron (o que se crearon/borraron)."""
+    previos = {fila['pk']: fila for fila in antes}
+    actuales = {fila['pk']: fila for fila in despues}
+    return {
+        pk for pk in previos.keys() | actuales.keys()
+        if pk not in previos or pk not in actuales
+        or any(previos[pk].get(campo) != actuales[pk].get(campo) for campo in campos)
+    }
+
+
+def _con_pk(model, filas):
+    attname = model._meta.pk.attname
+    return [{**fila, 'pk': fila[attname]} for fila in filas]
+
+
+@receiver(datos_modificados)
+def _actualizar_documentos(sender, antes, despues, using=None, **kwargs):
+    using = using or 'default'
+    antes, despues = _con_pk(sender, antes), _con_pk(sender, despues)
+    fuente = fuente_de_modelo(sender)
+    if fuente is not None:
+        campos = [sender._meta.get_field(campo).attname for campo in fuente.campos if '__' not in campo]
+        campos += [sender._meta.get_field(campo.split('__')[0]).attname for campo in fuente.campos if '__' in campo]
+        indexar(fuente, _cambiaron(campos, antes, despues), using)
+
+    for dependiente in FUENTES.values():
+        dependencia = dependiente.dependencias().get(sender)
+        if dependencia is None:
+            continue
+        fk, campos = dependencia
+        # Solo modificaciones: una fila nueva no tiene dependientes y los
+        # borrados se propagan por la cascada (cada fila dependiente emite)
+        pks = _cambiaron(campos, antes, despues) & {fila['pk'] for fila in antes} & {fila['pk'] for fila in despues}
+        if pks:
+            afectados = dependiente.model._base_manager.using(using).filter(**{f'{fk}__in': pks})
+            indexar(dependiente, afectados.values_list('pk', flat=True), using)
+
+
+# --- Consulta ---------------------------------------------------------------
+
+def _es_postgres(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def rango_busqueda(texto, consulta):
+    """Relevancia en Python (SQLite): palabra completa 1, prefijo 0.5, subcadena 0.25."""
+    if not texto or not consulta:
+        return 0.0
+    palabras = re.findall(r'\w+', texto)
+    terminos = consulta.split()
+    puntos = 0.0
+    for termino in terminos:
+        if termino in palabras:
+            puntos += 1
+        elif any(palabra.startswith(termino) for palabra in palabras):
+            puntos += 0.5
+        elif termino in texto:
+            puntos += 0.25
+    return puntos / len(terminos)
+
+
+@receiver(connection_created)
+def _registrar_funciones(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('rango_busqueda', 2, rango_busqueda, deterministic=True)
+
+
+def _rango(queryset, terminos):
+    consulta = ' '.join(terminos)
+    if not _es_postgres(queryset):
+        return Func('texto', Value(consulta), function='rango_busqueda', output_field=FloatField())
+    palabras = [p for termino in terminos for p in re.findall(r'\w+', termino)]
+    tsquery = ' & '.join(f'{p}:*' for p in palabras) or "''"
+    return RawSQL(
+        'ts_rank(vector, to_tsquery(%s, %s)) + similarity(texto, %s)',
+        [CONFIGURACION_TS, tsquery, consulta], output_field=FloatField(),
+    )
+
+
+def buscar(queryset, fuente, terminos):
+    """Filtra `queryset` por los términos y anota `rango_busqueda`."""
+    terminos = [normalizar_texto(t) for t in terminos if normalizar_texto(t)]
+    if not terminos:
+        return queryset
+    documentos = DocumentoBusqueda.objects.using(queryset.db).filter(fuente=fuente.nombre)
+    coinciden = documentos
+    for termino in terminos:
+        coinciden = coinciden.filter(texto__contains=termino)
+    rango = documentos.filter(objeto_id=OuterRef('pk')).annotate(rango=_rango(queryset, terminos)).values('rango')[:1]
+    return queryset.filter(pk__in=coinciden.values('objeto_id')).annotate(rango_busqueda=Subquery(rango))
+
+
+class BusquedaFilter(filters.SearchFilter):
+    """
+    SearchFilter que usa `documentos_busqueda` para los modelos registrados en
+    FUENTES; los demás siguen con el `icontains` de DRF.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fuente = fuente_de_modelo(queryset.model)
+        terminos = self.get_search_terms(request)
+        if fuente is None or not getattr(view, 'search_fields', None) or not terminos:
+            return super().filter_queryset(request, queryset, view)
+        return buscar(queryset, fuente, terminos)
+
+
+class OrdenFilter(filters.OrderingFilter):
+    """OrderingFilter que, con búsqueda y sin `?ordering=`, ordena por relevancia."""
+
+    def filter_queryset(self, request, queryset, view):
+        queryset = super().filter_queryset(request, queryset, view)
+        if 'rango_busqueda' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            queryset = queryset.order_by('-rango_busqueda', *queryset.query.order_by)
+        return queryset
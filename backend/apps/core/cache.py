@@ -0,0 +1,165 @@
+"""
+Cache de respuestas agregadas (Dashboard y acciones `kpis`).
+
+* Clave: endpoint + parámetros normalizados (fechas en ISO) + fecha de hoy +
+  versión de datos. Los rangos por defecto dependen del día actual, por eso
+  el día forma parte de la clave.
+* Invalidación: un contador `datos:version` en el cache se incrementa al hacer
+  commit de cualquier escritura sobre Donacion, Gasto, Caso, Donante o
+  Proveedor (señal `datos_modificados`). Las entradas viejas no se borran:
+  quedan inalcanzables y expiran por TTL.
+* Estampida: en un miss solo el proceso que obtiene el candado (`cache.add`)
+  recalcula; el resto espera la entrada hasta `DASHBOARD_CACHE_LOCK_WAIT` y,
+  si no aparece, calcula sin guardar.
+
+* Réplicas: lo calculado en una réplica (core/replicas.py) se guarda con otra
+  clave y TTL `REPLICA_CACHE_TIMEOUT`. Puede haberse calculado con datos de
+  antes de una escritura ya commiteada; quien lee de la primaria no lo ve.
+
+Usa el cache `DASHBOARD_CACHE_ALIAS` de `CACHES`. Con varios workers el backend
+debe ser compartido (file, db, redis); locmem solo invalida dentro del proceso,
+por eso con locmem la cache queda apagada por defecto (ver core/checks.py).
+"""
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import metricas, replicas
+from .signals import datos_modificados
+
+CLAVE_VERSION = 'datos:version'
+MODELOS_INVALIDAN = {
+    'donaciones.Donacion', 'finanzas.Gasto', 'casos.Caso', 'donaciones.Donante', 'finanzas.Proveedor',
+}
+
+
+def get_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# --- Versión de datos -----------------------------------------------------
+
+def version_datos():
+    cache = get_cache()
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Si la versión se pierde (reinicio, desalojo) se reinicia con el reloj
+        # para no reutilizar números de versión de entradas viejas.
+        cache.add(CLAVE_VERSION, int(time.time()), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def incrementar_version():
+    cache = get_cache()
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, int(time.time()), timeout=None)
+        return cache.get(CLAVE_VERSION)
+
+
+@receiver(datos_modificados)
+def _invalidar(sender, using=None, **kwargs):
+    if sender._meta.label in MODELOS_INVALIDAN:
+        # Solo datos confirmados: un rollback no invalida, y el recálculo no
+        # puede leer la versión nueva antes de que los datos sean visibles.
+        transaction.on_commit(incrementar_version, using=using)
+
+
+# --- Claves ---------------------------------------------------------------
+
+def _normalizar(nombre, valor):
+    if valor in (None, ''):
+        return '-'
+    if nombre.endswith('date'):
+        fecha = parse_date(valor) if isinstance(valor, str) else valor
+        return fecha.isoformat() if fecha else '-'
+    return str(valor).strip().lower()
+
+
+def clave(endpoint, params, nombres=('start_date', 'end_date'), version=None):
+    version = version_datos() if version is None else version
+    partes = [f'{nombre}={_normalizar(nombre, params.get(nombre))}' for nombre in nombres]
+    return f'resp:{endpoint}:v{version}:{timezone.localdate().isoformat()}:' + ':'.join(partes)
+
+
+# --- Lectura con protección de estampida ----------------------------------
+
+def obtener_o_calcular(clave_entrada, calcular, timeout=None):
+    """
+    Retorna (valor, estado) con estado 'hit', 'miss' o 'espera' (calculado sin
+    guardar porque otro proceso tenía el candado y no terminó a tiempo).
+    """
+    cache = get_cache()
+    timeout = _config('DASHBOARD_CACHE_TIMEOUT', 300) if timeout is None else timeout
+    valor = cache.get(clave_entrada)
+    if valor is not None:
+        return valor, 'hit'
+
+    candado = f'{clave_entrada}:candado'
+    if cache.add(candado, 1, timeout=_config('DASHBOARD_CACHE_LOCK_TIMEOUT', 30)):
+        try:
+            valor = calcular()
+            if valor is not None:
+                cache.set(clave_entrada, valor, timeout)
+            return valor, 'miss'
+        finally:
+            cache.delete(candado)
+
+    limite = time.monotonic() + _config('DASHBOARD_CACHE_LOCK_WAIT', 5)
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        valor = cache.get(clave_entrada)
+        if valor is not None:
+            return valor, 'hit'
+    return calcular(), 'espera'
+
+
+def cachear_respuesta(endpoint, params=('start_date', 'end_date')):
+    """
+    Decorador para métodos de vista `(self, request, ...)` que retornan un
+    Response: cachea `response.data` de las respuestas 200 (salvo las marcadas
+    con `response.no_cachear = True`, p.ej. respuestas parciales).
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            from rest_framework.response import Response
+
+            if not _config('DASHBOARD_CACHE_ENABLED', True):
+                return metodo(self, request, *args, **kwargs)
+
+            respuestas = {}
+
+            def calcular():
+                respuesta = metodo(self, request, *args, **kwargs)
+                respuestas['original'] = respuesta
+                if respuesta.status_code != 200 or getattr(respuesta, 'no_cachear', False):
+                    return None
+                return respuesta.data
+
+            clave_entrada, timeout = clave(endpoint, request.query_params, params), None
+            replica = replicas.actual()
+            if replica is not None:
+                clave_entrada = f'{clave_entrada}:{replica}'
+                timeout = min(_config('REPLICA_CACHE_TIMEOUT', 60), _config('DASHBOARD_CACHE_TIMEOUT', 300))
+            datos, estado = obtener_o_calcular(clave_entrada, calcular, timeout)
+            metricas.CACHE.inc(endpoint=endpoint, resultado=estado)
+            respuesta = respuestas.get('original')
+            if respuesta is None:
+                respuesta = Response(datos)
+            respuesta['X-Cache'] = estado.upper()
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,90 @@
+"""
+Carga anticipada de las relaciones que lee cada serializer.
+
+Un serializer declara en `Meta.relaciones` las FK que recorren sus campos de
+solo lectura (`source='id_donante.donante'`) y qué columnas usa de cada una:
+
+    class Meta:
+        model = Donacion
+        fields = '__all__'
+        relaciones = {'id_donante': ('donante',), 'id_caso': ('nombre_caso',)}
+
+`cargar(queryset, DonacionSerializer)` agrega `select_related('id_donante',
+'id_caso')` y un `only()` que trae todas las columnas del modelo pero solo
+esas de las tablas relacionadas. `CargaAnticipadaMixin` lo aplica en list y
+retrieve; las acciones anidadas (`balance`, `donaciones`, `gastos`) llaman a
+`cargar` con el serializer que usan.
+
+`verificar_consultas` (y `manage.py verificar_n_mas_1`) falla si serializar
+varias filas hace más consultas que serializar una.
+"""
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+def relaciones(serializer_class):
+    meta = getattr(serializer_class, 'Meta', None)
+    return dict(getattr(meta, 'relaciones', {}))
+
+
+def cargar(queryset, serializer_class):
+    """`queryset` con las relaciones de `serializer_class` en el mismo SELECT."""
+    declaradas = relaciones(serializer_class)
+    if not declaradas:
+        return queryset
+    propias = [campo.attname for campo in queryset.model._meta.concrete_fields]
+    relacionadas = [f'{fk}__{campo}' for fk, campos in declaradas.items() for campo in campos]
+    return queryset.select_related(*declaradas).only(*propias, *relacionadas)
+
+
+def _fuentes_punteadas(serializer):
+    """{campo: primer tramo} de los campos cuyo source recorre una relación."""
+    return {
+        nombre: campo.source.split('.')[0]
+        for nombre, campo in serializer.fields.items()
+        if campo.source and '.' in campo.source
+    }
+
+
+def verificar_consultas(serializer_class, queryset, filas=5, context=None):
+    """
+    Serializa 1 y `filas` registros de `queryset` (ya pasado por `cargar`) y
+    lanza AssertionError si la cantidad de consultas crece con las filas, o si
+    un campo lee una relación no declarada en `Meta.relaciones`.
+    Retorna (consultas con 1 fila, consultas con `filas`).
+    """
+    context = context or {}
+    sin_declarar = {
+        nombre: relacion for nombre, relacion in _fuentes_punteadas(serializer_class(context=context)).items()
+        if relacion not in relaciones(serializer_class)
+    }
+    if sin_declarar:
+        raise AssertionError(
+            f'{serializer_class.__name__}: campos que leen relaciones no declaradas en Meta.relaciones: '
+            + ', '.join(f'{nombre} ({relacion})' for nombre, relacion in sorted(sin_declarar.items()))
+        )
+
+    connection = connections[queryset.db]
+    conteos = []
+    for cantidad in (1, filas):
+        with CaptureQueriesContext(connection) as capturadas:
+            serializer_class(list(queryset[:cantidad]), many=True, context=context).data
+        conteos.append(len(capturadas))
+    if conteos[1] > conteos[0]:
+        extra = [consulta['sql'] for consulta in capturadas][conteos[0]:conteos[0] + 3]
+        raise AssertionError(
+            f'{serializer_class.__name__}: N+1, {conteos[0]} consultas con 1 fila y {conteos[1]} con {filas}. '
+            'Consultas extra:\n  ' + '\n  '.join(sql[:200] for sql in extra)
+        )
+    return tuple(conteos)
+
+
+class CargaAnticipadaMixin:
+    """Aplica `cargar()` con el serializer del ViewSet en list y retrieve."""
+    acciones_carga_anticipada = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.acciones_carga_anticipada:
+            queryset = cargar(queryset, self.get_serializer_class())
+        return queryset
@@ -0,0 +1,37 @@
+"""
+Checks de configuración (`manage.py check`, también al arrancar runserver y
+los comandos de gestión).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+def _cache_local():
+    return isinstance(caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')], LocMemCache)
+
+
+@register(Tags.caches)
+def cache_compartido(app_configs, **kwargs):
+    if getattr(settings, 'DASHBOARD_CACHE_ENABLED', True) and _cache_local():
+        return [Warning(
+            'La cache de respuestas usa LocMemCache: con varios workers cada uno '
+            'invalida solo su copia y los demás sirven datos viejos.',
+            hint='Configure un CACHE_BACKEND compartido (file, db, redis) o DASHBOARD_CACHE_ENABLED=False.',
+            id='core.W001',
+        )]
+    return []
+
+
+@register(Tags.caches, Tags.database)
+def replicas_con_cache_compartido(app_configs, **kwargs):
+    if getattr(settings, 'REPLICAS', []) and _cache_local():
+        return [Warning(
+            'Hay réplicas de lectura y el cache es LocMemCache: la marca de "escribió hace '
+            'poco" es por proceso y otro worker puede leer de la réplica lo que el usuario '
+            'acaba de escribir.',
+            hint='Configure un CACHE_BACKEND compartido (file, db, redis).',
+            id='core.W002',
+        )]
+    return []
@@ -0,0 +1,57 @@
+"""
+Conexiones a la base: descripción del modo de cada alias (DB_* en settings.py)
+y pre-calentamiento al arrancar un worker de gunicorn (gunicorn.conf.py), para
+que el primer request no pague la conexión TLS.
+"""
+import logging
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def modo(alias='default'):
+    """'pool', 'persistente' o 'por_request', más ' + pgbouncer' si corresponde."""
+    ajustes = connections[alias].settings_dict
+    if ajustes.get('OPTIONS', {}).get('pool'):
+        nombre = 'pool'
+    elif ajustes.get('CONN_MAX_AGE') != 0:
+        nombre = 'persistente'
+    else:
+        nombre = 'por_request'
+    if ajustes.get('DISABLE_SERVER_SIDE_CURSORS'):
+        nombre += ' + pgbouncer'
+    return nombre
+
+
+def precalentar(mantener=True):
+    """
+    Abre la conexión de cada alias (o su pool, con `min_size` conexiones) y
+    retorna {alias: milisegundos}. Con pool la conexión vuelve al pool; sin
+    pool queda abierta para el primer request solo con `mantener` (workers
+    de un hilo: con varios hilos cada uno abre la suya).
+    """
+    tiempos = {}
+    for alias in connections:
+        conexion = connections[alias]
+        inicio = time.perf_counter()
+        try:
+            conexion.ensure_connection()
+        except Exception as exc:
+            # Un worker sin base igual debe arrancar: el request mostrará el error
+            logger.warning('No se pudo pre-calentar la conexión %s: %s', alias, exc)
+            continue
+        tiempos[alias] = (time.perf_counter() - inicio) * 1000
+        if getattr(conexion, 'pool', None) is not None or not mantener:
+            conexion.close()
+    return tiempos
+
+
+def cerrar():
+    """Cierra las conexiones y los pools de este proceso."""
+    for alias in connections:
+        conexion = connections[alias]
+        conexion.close()
+        if hasattr(conexion, 'close_pool'):
+            conexion.close_pool()
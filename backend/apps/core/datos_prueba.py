@@ -0,0 +1,242 @@
+"""
+Generador de datos sintéticos para benchmarks y análisis de planes.
+
+Las proporciones salen de la operación real (PRODUCCION: ~15.000 donaciones,
+10.000 donantes, 270 casos) y `generar(donaciones)` las escala. Las
+distribuciones imitan la real:
+
+* Donaciones con estacionalidad (diciembre y la campaña de mitad de año, más
+  los días de quincena) y crecimiento interanual.
+* Donantes recurrentes: el peso de cada donante sigue una Pareto, así que unos
+  pocos concentran buena parte de las donaciones.
+* Montos de cola pesada (lognormal, redondeados a miles de pesos); las
+  empresas donan más.
+* Cada donación va a un caso que ya había ingresado en esa fecha, con más peso
+  para los recientes; cada gasto cae entre el ingreso y la salida de su caso.
+
+Se genera por columnas con NumPy y se carga
+con `importacion.cargar` (COPY en PostgreSQL, `bulk_create` en otros motores),
+que emite `datos_modificados`: rollups, `caso_finanzas` y búsqueda quedan al día.
+
+La `semilla` y la fecha de referencia `hasta` (por defecto HASTA, fija: no
+depende del día en que se genera) determinan los datos; la historia cubre
+los `anios` anteriores a `hasta`.
+"""
+from datetime import date
+
+from django.db import transaction
+
+from backend.apps.casos.models import Caso, HogarDePaso
+from backend.apps.donaciones.models import Donacion, Donante
+from backend.apps.finanzas.models import Gasto, Proveedor
+
+from . import importacion
+
+# Tamaño de la operación actual (escala 1 de `generate_dataset`)
+PRODUCCION = {
+    'donaciones': 15000,
+    'donantes': 10000,
+    'casos': 270,
+    'gastos': 5000,
+    'proveedores': 60,
+    'hogares': 4,
+}
+
+# (valores, probabilidades)
+ESTADOS_DONACION = (['APROBADA', 'PENDIENTE', 'RECHAZADA', 'FALLIDA'], [0.82, 0.08, 0.06, 0.04])
+ESTADOS_GASTO = (['PAGADO', 'PENDIENTE', 'ANULADO'], [0.8, 0.15, 0.05])
+CIERRES_CASO = (['ADOPTADO', 'CERRADO', 'FALLECIDO'], [0.6, 0.25, 0.15])
+MEDIOS = (['NEQUI', 'WOMPI', 'TRANSFERENCIA', 'TARJETA', 'EFECTIVO', 'PAYU'], [0.3, 0.22, 0.18, 0.15, 0.1, 0.05])
+PASARELAS = {'NEQUI', 'WOMPI', 'PAYU', 'TARJETA'}
+TIPOS_DONANTE = (['PERSONA_NATURAL', 'EMPRESA', 'FUNDACION', None], [0.85, 0.07, 0.03, 0.05])
+PAISES = (['Colombia', 'Perú', 'México', 'Chile', 'España', 'Estados Unidos'], [0.82, 0.04, 0.04, 0.03, 0.04, 0.03])
+CIUDADES = ['Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Bucaramanga', 'Pereira']
+CANALES = (['Instagram', 'Facebook', 'Referido', 'Web', 'Evento'], [0.35, 0.2, 0.2, 0.15, 0.1])
+CONCEPTOS_GASTO = (
+    ['Consulta', 'Cirugía', 'Medicamentos', 'Alimento', 'Transporte', 'Exámenes', 'Hospitalización'],
+    [0.22, 0.08, 0.2, 0.2, 0.12, 0.1, 0.08],
+)
+MEDIOS_GASTO = ['TRANSFERENCIA', 'EFECTIVO', 'TARJETA']
+VETERINARIAS = ['Clínica Veterinaria San Francisco', 'VetCare', 'Hospital Veterinario Central', 'Animal Salud']
+
+# Peso de cada mes (enero = 0): diciembre y la campaña de mitad de año
+ESTACIONALIDAD = [0.8, 0.75, 0.85, 0.9, 1.1, 1.25, 1.0, 0.9, 0.95, 1.0, 1.15, 1.9]
+CRECIMIENTO_ANUAL = 0.15
+
+# Último día de la historia generada por defecto
+HASTA = date(2025, 12, 31)
+
+
+def escalar(escala):
+    """Cantidades de cada tabla para `escala` veces la operación actual."""
+    return {tabla: max(int(round(cantidad * escala)), 2) for tabla, cantidad in PRODUCCION.items()}
+
+
+def _elegir(rng, opciones, n):
+    valores, probabilidades = opciones
+    indices = rng.choice(len(valores), size=n, p=probabilidades)
+    return [valores[i] for i in indices]
+
+
+def _fechas(pd, np, desde, dias):
+    return pd.to_datetime(np.datetime64(desde) + np.arange(dias + 1).astype('timedelta64[D]'))
+
+
+def _pesos_diarios(np, calendario):
+    """Peso de cada día: estacionalidad mensual, quincenas y crecimiento interanual."""
+    meses = calendario.month.to_numpy() - 1
+    dias_mes = calendario.day.to_numpy()
+    anios = np.arange(len(calendario)) / 365.25
+    quincena = np.where(np.isin(dias_mes, [1, 2, 15, 16, 30, 31]), 1.35, 1.0)
+    pesos = np.asarray(ESTACIONALIDAD)[meses] * quincena * (1 + CRECIMIENTO_ANUAL) ** anios
+    return pesos / pesos.sum()
+
+
+def _montos(rng, np, n, mediana, sigma, minimo, maximo):
+    """Lognormal redondeada a miles de pesos."""
+    montos = rng.lognormal(np.log(mediana), sigma, n)
+    return np.clip(np.round(montos / 1000) * 1000, minimo, maximo)
+
+
+def _cargar(pd, model, datos, using, tamano_bloque):
+    """Inserta las columnas de `datos` por bloques (ver importacion.cargar)."""
+    df = pd.DataFrame(datos)
+    cols = [importacion.ColumnaImportacion(model._meta.get_field(nombre), nombre) for nombre in df.columns]
+    for inicio in range(0, len(df), tamano_bloque):
+        importacion.cargar(model, df.iloc[inicio:inicio + tamano_bloque], cols, (), using)
+
+
+def _nuevos(model, using, previo, *campos):
+    """Filas insertadas después de `previo` (PK máxima antes de cargar), ordenadas por PK."""
+    return list(model._base_manager.using(using).filter(pk__gt=previo).order_by('pk').values_list('pk', *campos))
+
+
+def _pk_maxima(model, using):
+    ultimo = model._base_manager.using(using).order_by('-pk').values_list('pk', flat=True).first()
+    return ultimo or 0
+
+
+def generar(donaciones=10000, semilla=0, using='default', anios=3, batch_size=50000, cantidades=None, hasta=None):
+    """
+    Inserta `donaciones` donaciones con los donantes, casos, hogares,
+    proveedores y gastos proporcionales (o las `cantidades` de `escalar()`).
+    Retorna {tabla: filas creadas}.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if cantidades is None:
+        cantidades = escalar(donaciones / PRODUCCION['donaciones'])
+        cantidades['donaciones'] = donaciones
+    rng = np.random.default_rng(semilla)
+    hasta = hasta or HASTA
+    # 29 de febrero: el año de partida puede no tenerlo
+    desde = date(hasta.year - anios, hasta.month, min(hasta.day, 28) if hasta.month == 2 else hasta.day)
+    calendario = _fechas(pd, np, desde, (hasta - desde).days)
+    pesos_dia = _pesos_diarios(np, calendario)
+
+    with transaction.atomic(using=using):
+        # Hogares y proveedores
+        n = cantidades['hogares']
+        previo = _pk_maxima(HogarDePaso, using)
+        HogarDePaso.objects.using(using).bulk_create([
+            HogarDePaso(nombre_hogar=f'Hogar {i}', ciudad=ciudad, cupo_maximo=int(cupo))
+            for i, (ciudad, cupo) in enumerate(zip(rng.choice(CIUDADES, n), rng.integers(5, 30, n)))
+        ])
+        hogares = np.array([pk for pk, in _nuevos(HogarDePaso, using, previo)])
+
+        n = cantidades['proveedores']
+        previo = _pk_maxima(Proveedor, using)
+        indices = pd.Series(np.arange(n)).astype(str)
+        _cargar(pd, Proveedor, {
+            'nombre_proveedor': 'Proveedor ' + indices,
+            'nit': '900' + indices.str.zfill(6),
+            'tipo_proveedor': rng.choice(['Veterinaria', 'Farmacia', 'Alimentos', 'Transporte'], n),
+            'ciudad': rng.choice(CIUDADES, n),
+        }, using, batch_size)
+        proveedores = np.array([pk for pk, in _nuevos(Proveedor, using, previo)])
+
+        # Casos: ingresos repartidos en el periodo; los recientes siguen activos más a menudo
+        n = cantidades['casos']
+        previo = _pk_maxima(Caso, using)
+        ingreso = np.sort(rng.choice(len(calendario), n, p=pesos_dia))
+        estancia = rng.gamma(2.0, 45, n).astype(int) + 5
+        salida = ingreso + estancia
+        activo = (salida >= len(calendario)) | (rng.random(n) < 0.25)
+        cierre = np.array(_elegir(rng, CIERRES_CASO, n), dtype=object)
+        fecha_salida = pd.Series(calendario[np.minimum(salida, len(calendario) - 1)]).where(~activo)
+        _cargar(pd, Caso, {
+            'nombre_caso': 'Caso ' + pd.Series(np.arange(n)).astype(str),
+            'estado': np.where(activo, rng.choice(['ABIERTO', 'EN_TRATAMIENTO'], n, p=[0.35, 0.65]), cierre),
+            'fecha_ingreso': calendario[ingreso],
+            'fecha_salida': fecha_salida,
+            'veterinaria': rng.choice(VETERINARIAS, n),
+            'presupuesto_estimado': _montos(rng, np, n, 800000, 0.7, 50000, 20000000),
+            'id_hogar_de_paso': pd.Series(rng.choice(hogares, n)).where(rng.random(n) < 0.7).astype('Int64'),
+        }, using, batch_size)
+        # Ordenados por ingreso para buscar con searchsorted
+        casos = sorted(_nuevos(Caso, using, previo, 'fecha_ingreso', 'fecha_salida'), key=lambda caso: caso[1])
+        casos_pk = np.array([pk for pk, _, _ in casos])
+        casos_ingreso = np.array([(ing - desde).days for _, ing, _ in casos])
+        casos_fin = np.array([(sal - desde).days if sal else len(calendario) - 1 for _, _, sal in casos])
+
+        # Donantes: peso de Pareto -> pocos recurrentes concentran las donaciones
+        n = cantidades['donantes']
+        previo = _pk_maxima(Donante, using)
+        indices = pd.Series(np.arange(n)).astype(str)
+        tipos = _elegir(rng, TIPOS_DONANTE, n)
+        _cargar(pd, Donante, {
+            'donante': 'Donante ' + indices,
+            'tipo_id': np.where(np.array(tipos, dtype=object) == 'EMPRESA', 'NIT', 'CC'),
+            'identificacion': (10000000 + np.arange(n)).astype(str),
+            'correo': 'donante' + indices + '@ejemplo.org',
+            'ciudad': rng.choice(CIUDADES, n),
+            'tipo_donante': pd.Series(tipos, dtype='string'),
+            'pais': _elegir(rng, PAISES, n),
+            'canal_origen': _elegir(rng, CANALES, n),
+            'consentimiento': pd.Series(rng.random(n) < 0.9, dtype='boolean'),
+        }, using, batch_size)
+        donantes = _nuevos(Donante, using, previo, 'tipo_donante')
+        donantes_pk = np.array([pk for pk, _ in donantes])
+        donantes_empresa = np.array([tipo in ('EMPRESA', 'FUNDACION') for _, tipo in donantes])
+
+        # Donaciones
+        n = cantidades['donaciones']
+        pesos_donante = rng.pareto(1.1, len(donantes_pk)) + 1
+        donante = rng.choice(len(donantes_pk), n, p=pesos_donante / pesos_donante.sum())
+        dia = rng.choice(len(calendario), n, p=pesos_dia)
+        # Caso entre los ya ingresados ese día, sesgado hacia los recientes
+        ingresados = np.searchsorted(casos_ingreso, dia, side='right')
+        caso = ingresados - 1 - np.floor(ingresados * rng.random(n) ** 2).astype(int)
+        con_caso = (ingresados > 0) & (rng.random(n) < 0.8)
+        montos = _montos(rng, np, n, 40000, 1.1, 5000, 50000000)
+        montos = np.where(donantes_empresa[donante], montos * 8, montos)
+        medios = np.array(_elegir(rng, MEDIOS, n), dtype=object)
+        comprobantes = pd.Series(f'SIM-{semilla}-' + pd.Series(np.arange(n)).astype(str))
+        _cargar(pd, Donacion, {
+            'id_donante': donantes_pk[donante],
+            'id_caso': pd.Series(casos_pk[np.maximum(caso, 0)]).where(con_caso).astype('Int64'),
+            'fecha_donacion': calendario[dia],
+            'monto': np.minimum(montos, 9.9e9),
+            'medio_pago': medios,
+            'estado': _elegir(rng, ESTADOS_DONACION, n),
+            'comprobante': comprobantes.where(np.isin(medios, list(PASARELAS))),
+        }, using, batch_size)
+
+        # Gastos: dentro de la estancia del caso, más gastos en los casos largos
+        n = cantidades['gastos']
+        duracion = casos_fin - casos_ingreso + 1
+        caso = rng.choice(len(casos_pk), n, p=duracion / duracion.sum())
+        dia = casos_ingreso[caso] + np.floor(rng.random(n) * duracion[caso]).astype(int)
+        pesos_proveedor = 1 / np.arange(1, len(proveedores) + 1)
+        _cargar(pd, Gasto, {
+            'nombre_gasto': _elegir(rng, CONCEPTOS_GASTO, n),
+            'id_caso': casos_pk[caso],
+            'id_proveedor': rng.choice(proveedores, n, p=pesos_proveedor / pesos_proveedor.sum()),
+            'fecha_pago': calendario[dia],
+            'monto': _montos(rng, np, n, 120000, 1.0, 10000, 30000000),
+            'medio_pago': rng.choice(MEDIOS_GASTO, n),
+            'estado': _elegir(rng, ESTADOS_GASTO, n),
+        }, using, batch_size)
+
+    return cantidades
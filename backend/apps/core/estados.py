@@ -0,0 +1,131 @@
+"""
+Estados canónicos y registro único de buckets de estado.
+
+Cada modelo con `estado` guarda solo los valores de su enum (TextChoices):
+
+* `normalizar(modelo, valor)`: recorta, pasa a mayúsculas, cambia espacios por
+  `_` y traduce alias históricos ('Completada', 'exitosa', 'cancelado'...) al
+  valor canónico. Los valores desconocidos quedan en mayúsculas.
+* `filtro(modelo, bucket)`: Q de igualdad/IN sobre los valores canónicos de un
+  bucket (exito, rechazo, fallo, pagado, pendiente...), apto para índices, a
+  diferencia de `estado__iexact` o de listas con todas las variantes de
+  mayúsculas.
+
+Los serializers normalizan al escribir (`core.serializers.EstadoField`) y el
+`bulk_create` de `TrackedQuerySet` normaliza las instancias antes de insertar.
+Este módulo no importa modelos: `modelo` puede ser la clase o su etiqueta
+('donaciones.Donacion').
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+ALIAS = {
+    'donaciones.Donacion': {
+        'COMPLETADA': 'APROBADA',
+        'COMPLETADO': 'APROBADA',
+        'CONFIRMADA': 'APROBADA',
+        'CONFIRMADO': 'APROBADA',
+        'EXITOSA': 'APROBADA',
+        'EXITOSO': 'APROBADA',
+        'APROBADO': 'APROBADA',
+        'RECHAZADO': 'RECHAZADA',
+        'CANCELADA': 'RECHAZADA',
+        'CANCELADO': 'RECHAZADA',
+        'FALLIDO': 'FALLIDA',
+        'ERROR': 'FALLIDA',
+    },
+    'finanzas.Gasto': {
+        'PAGADA': 'PAGADO',
+        'APROBADA': 'PAGADO',
+        'APROBADO': 'PAGADO',
+        'ANULADA': 'ANULADO',
+        'CANCELADA': 'ANULADO',
+        'CANCELADO': 'ANULADO',
+    },
+    'casos.Caso': {
+        'ABIERTA': 'ABIERTO',
+        'CERRADA': 'CERRADO',
+        'TRATAMIENTO': 'EN_TRATAMIENTO',
+        'ADOPTADA': 'ADOPTADO',
+        'FALLECIDA': 'FALLECIDO',
+    },
+}
+
+BUCKETS = {
+    'donaciones.Donacion': {
+        'exito': ('APROBADA',),
+        'rechazo': ('RECHAZADA',),
+        'fallo': ('FALLIDA',),
+        'pendiente': ('PENDIENTE',),
+    },
+    'finanzas.Gasto': {
+        'pagado': ('PAGADO',),
+        'pendiente': ('PENDIENTE',),
+        'anulado': ('ANULADO',),
+    },
+}
+
+
+def _etiqueta(modelo):
+    return modelo if isinstance(modelo, str) else modelo._meta.label
+
+
+def normalizar(modelo, valor):
+    if valor is None:
+        return None
+    limpio = ' '.join(str(valor).split())
+    if not limpio:
+        return None
+    limpio = limpio.upper().replace(' ', '_')
+    return ALIAS.get(_etiqueta(modelo), {}).get(limpio, limpio)
+
+
+def estados(modelo, bucket):
+    """Valores canónicos del bucket, p.ej. estados(Donacion, 'exito') -> ('APROBADA',)."""
+    return BUCKETS[_etiqueta(modelo)][bucket]
+
+
+def filtro(modelo, bucket, campo='estado'):
+    """
+    Q sobre los estados del bucket. `campo` permite filtrar por relación,
+    p.ej. filtro(Donacion, 'exito', 'donaciones__estado') desde Donante.
+    """
+    valores = estados(modelo, bucket)
+    if len(valores) == 1:
+        return Q(**{campo: valores[0]})
+    return Q(**{f'{campo}__in': valores})
+
+
+def normalizar_instancias(model, objs):
+    """Normaliza `estado` en instancias aún no guardadas (bulk_create, importaciones)."""
+    if _etiqueta(model) not in ALIAS:
+        return
+    for obj in objs:
+        obj.estado = normalizar(model, obj.estado)
+
+
+
+def normalizar_tabla(model, etiqueta, batch_size=1000):
+    """
+    Reescribe en lotes (por pk) los estados no canónicos de `model`. Pensado
+    para migraciones de datos: `model` es el modelo histórico y `etiqueta` la
+    del modelo real ('donaciones.Donacion'). Retorna las filas modificadas.
+    """
+    canonicos = {valor for valor, _ in model._meta.get_field('estado').choices}
+    pendientes = model._base_manager.exclude(estado__in=canonicos).exclude(estado__isnull=True).order_by('pk')
+    ultimo = None
+    cambiadas = 0
+    while True:
+        lote_qs = pendientes.filter(pk__gt=ultimo) if ultimo is not None else pendientes
+        lote = list(lote_qs.values_list('pk', 'estado')[:batch_size])
+        if not lote:
+            return cambiadas
+        por_valor = defaultdict(list)
+        for pk, valor in lote:
+            nuevo = normalizar(etiqueta, valor)
+            if nuevo != valor:
+                por_valor[nuevo].append(pk)
+        for nuevo, pks in por_valor.items():
+            cambiadas += model._base_manager.filter(pk__in=pks).update(estado=nuevo)
+        ultimo = lote[-1][0]
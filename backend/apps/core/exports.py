@@ -0,0 +1,179 @@
+"""
+Exportaciones en streaming (CSV y Excel).
+
+Cada viewset declara sus columnas (`columnas_exportacion`) como proyecciones
+de `values_list()`, incluidas las de FK (`id_caso__nombre_caso`), así que una
+exportación es una sola consulta con JOINs. Las filas se leen con
+`iterator(chunk_size=...)` (cursor del lado del servidor en PostgreSQL).
+
+* CSV: se escribe a medida que el cliente consume `StreamingHttpResponse`.
+* Excel: hoja `write_only` de openpyxl (no guarda celdas en memoria) volcada
+  a un archivo temporal, que luego se envía por partes con `FileResponse`.
+
+En ambos casos la memoria del worker no crece con el tamaño del archivo.
+"""
+import csv
+import tempfile
+from typing import Callable, NamedTuple, Optional, Tuple, Union
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import action
+
+
+class Columna(NamedTuple):
+    titulo: str
+    # Lookup de values_list(), o varios si `formato` combina campos
+    campos: Union[str, Tuple[str, ...]]
+    # Recibe los valores de `campos` en orden y retorna la celda
+    formato: Optional[Callable] = None
+    # Valor de la celda cuando el campo es NULL (p.ej. FK vacía)
+    si_nulo: object = None
+
+    @property
+    def lookups(self):
+        return (self.campos,) if isinstance(self.campos, str) else self.campos
+
+    def celda(self, valores):
+        if self.formato is not None:
+            return self.formato(*valores)
+        valor = valores[0]
+        return self.si_nulo if valor is None else valor
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def filas(queryset, columnas, chunk_size=None):
+    """Genera las filas (listas de celdas) de `queryset` según `columnas`."""
+    lookups = list(dict.fromkeys(lookup for columna in columnas for lookup in columna.lookups))
+    posiciones = [[lookups.index(lookup) for lookup in columna.lookups] for columna in columnas]
+    for registro in queryset.values_list(*lookups).iterator(chunk_size=chunk_size or _chunk_size()):
+        yield [
+            columna.celda([registro[i] for i in indices])
+            for columna, indices in zip(columnas, posiciones)
+        ]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: retorna la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(queryset, columnas, chunk_size=None):
+    writer = csv.writer(_Eco())
+    yield writer.writerow([columna.titulo for columna in columnas])
+    for fila in filas(queryset, columnas, chunk_size):
+        yield writer.writerow(fila)
+
+
+def escribir_csv(archivo, queryset, columnas, chunk_size=None):
+    """Escribe el CSV en `archivo` (texto). Retorna las filas de datos escritas."""
+    cantidad = -1  # sin contar el encabezado
+    for linea in lineas_csv(queryset, columnas, chunk_size):
+        archivo.write(linea)
+        cantidad += 1
+    return cantidad
+
+
+def nombre_archivo(nombre, extension):
+    return f'{nombre}_{timezone.now().date()}.{extension}'
+
+
+def respuesta_csv(queryset, columnas, nombre):
+    response = StreamingHttpResponse(lineas_csv(queryset, columnas), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo(nombre, "csv")}"'
+    return response
+
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def escribir_excel(archivo, queryset, columnas, titulo, chunk_size=None):
+    """Escribe el .xlsx en `archivo` (binario). Retorna las filas de datos escritas."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(titulo)
+    ws.append([columna.titulo for columna in columnas])
+    cantidad = 0
+    for fila in filas(queryset, columnas, chunk_size):
+        ws.append(fila)
+        cantidad += 1
+    wb.save(archivo)
+    return cantidad
+
+
+def respuesta_excel(queryset, columnas, nombre, titulo=None):
+    # El .xlsx es un zip: se arma completo en disco y se envía por partes
+    archivo = tempfile.TemporaryFile()
+    try:
+        escribir_excel(archivo, queryset, columnas, titulo or nombre.capitalize())
+        archivo.seek(0)
+    except Exception:
+        archivo.close()
+        raise
+    # FileResponse cierra (y así borra) el temporal al terminar de enviarlo
+    return FileResponse(
+        archivo, as_attachment=True, filename=nombre_archivo(nombre, 'xlsx'), content_type=CONTENT_TYPE_XLSX,
+    )
+
+
+def es_asincrona(request):
+    return request.query_params.get('async', '').lower() in ('1', 'true')
+
+
+class ExportacionMixin:
+    """
+    Agrega las acciones `exportar_csv` y `exportar_excel` a un ViewSet. El
+    ViewSet define:
+
+        nombre_exportacion = 'donaciones'
+        columnas_exportacion = [Columna('ID', 'id_donacion'), ...]
+
+    y opcionalmente `filtrar_exportacion(queryset)` para filtros propios de la
+    exportación (se aplica después de `filter_queryset(get_queryset())`).
+
+    Con `?async=1` la exportación no se genera en el request: se encola un
+    `TrabajoExportacion` y se responde 202 con su id (ver core/trabajos.py).
+    """
+    nombre_exportacion = None
+    columnas_exportacion = ()
+
+    def filtrar_exportacion(self, queryset):
+        return queryset
+
+    def queryset_exportacion(self):
+        return self.filtrar_exportacion(self.filter_queryset(self.get_queryset()))
+
+    def _encolar_exportacion(self, formato):
+        from rest_framework import status
+        from rest_framework.response import Response
+
+        from .serializers import TrabajoExportacionSerializer
+        from .trabajos import LimiteExportaciones, encolar
+
+        try:
+            trabajo = encolar(self, formato)
+        except LimiteExportaciones as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        datos = TrabajoExportacionSerializer(trabajo, context=self.get_serializer_context()).data
+        return Response(datos, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'])
+    def exportar_csv(self, request):
+        """Exportar a CSV (streaming; con ?async=1 se encola)"""
+        if es_asincrona(request):
+            return self._encolar_exportacion('csv')
+        return respuesta_csv(self.queryset_exportacion(), self.columnas_exportacion, self.nombre_exportacion)
+
+    @action(detail=False, methods=['get'])
+    def exportar_excel(self, request):
+        """Exportar a Excel (.xlsx; con ?async=1 se encola)"""
+        if es_asincrona(request):
+            return self._encolar_exportacion('xlsx')
+        return respuesta_excel(self.queryset_exportacion(), self.columnas_exportacion, self.nombre_exportacion)
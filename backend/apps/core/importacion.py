@@ -0,0 +1,400 @@
+"""
+Importación masiva de CSV (`python manage.py importar_csv <entidad> <archivo>`).
+
+El archivo se lee por bloques de IMPORT_CHUNK_SIZE filas con pandas y cada
+bloque se procesa por columnas, sin recorrer filas en Python:
+
+* Tipos según el campo del modelo: fechas (`to_datetime`), montos
+  (`to_numeric`, redondeados a los decimales del campo), enteros, booleanos
+  (si/no, 1/0, true/false), textos recortados con su `max_length`.
+* `estado` pasa por `estados.normalizar` (alias incluidos); los demás campos
+  con `choices` aceptan el valor o la etiqueta sin importar mayúsculas.
+* FK por PK (`id_donante`) o por un campo del modelo relacionado
+  (`id_donante__identificacion`, `id_proveedor__nit`), contra mapas en memoria
+  cargados una vez por importación.
+* Las filas inválidas salen del bloque con el motivo (archivo de rechazos).
+
+Carga: en PostgreSQL cada bloque va por `COPY FROM STDIN` a una tabla
+temporal y de ahí a la tabla real con un `UPDATE` (filas cuya clave natural ya
+existe) y un `INSERT ... WHERE NOT EXISTS`. En otros motores, `bulk_create` y
+`bulk_update` del `TrackedQuerySet`. En ambos casos cada bloque es una
+transacción que emite `datos_modificados`, así que rollups, `caso_finanzas`,
+búsqueda y cache quedan al día.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Tuple
+
+from django.apps import apps
+from django.db import connections, models, transaction
+
+from . import estados
+from .lotes import _bloquear
+from .signals import datos_modificados
+
+VERDADEROS = {'1', 'true', 't', 'si', 'sí', 's', 'yes', 'y', 'verdadero', 'x'}
+FALSOS = {'0', 'false', 'f', 'no', 'n', 'falso'}
+
+
+@dataclass(frozen=True)
+class EntidadImportacion:
+    nombre: str
+    modelo: str
+    # Clave natural para el upsert: una fila del archivo cuya clave ya existe
+    # actualiza ese registro. Filas con algún campo de la clave vacío se insertan.
+    clave: Tuple[str, ...]
+
+    @property
+    def model(self):
+        return apps.get_model(self.modelo)
+
+
+ENTIDADES = {
+    'donantes': EntidadImportacion('donantes', 'donaciones.Donante', ('identificacion',)),
+    'proveedores': EntidadImportacion('proveedores', 'finanzas.Proveedor', ('nit',)),
+    'casos': EntidadImportacion('casos', 'casos.Caso', ('nombre_caso', 'fecha_ingreso')),
+    'donaciones': EntidadImportacion('donaciones', 'donaciones.Donacion', ('comprobante',)),
+    'gastos': EntidadImportacion('gastos', 'finanzas.Gasto', ('comprobante',)),
+}
+
+
+def campos_importables(model):
+    """{nombre: campo} de los campos que puede traer el CSV (sin PK ni fechas automáticas)."""
+    return {
+        campo.name: campo for campo in model._meta.concrete_fields
+        if not campo.primary_key and not getattr(campo, 'auto_now', False)
+        and not getattr(campo, 'auto_now_add', False)
+    }
+
+
+@dataclass(frozen=True)
+class ColumnaImportacion:
+    campo: models.Field
+    # Columna del CSV
+    origen: str
+    # Para FK: campo del modelo relacionado con el que se busca ('identificacion'); None = PK
+    referencia: str = None
+
+
+def columnas(model, encabezados):
+    """Retorna ([ColumnaImportacion], [encabezados ignorados])."""
+    campos = campos_importables(model)
+    resultado, usados = {}, set()
+    for encabezado in encabezados:
+        nombre, _, referencia = encabezado.strip().partition('__')
+        campo = campos.get(nombre)
+        if campo is None or (referencia and not campo.is_relation):
+            continue
+        if referencia:
+            try:
+                campo.related_model._meta.get_field(referencia)
+            except Exception:
+                continue
+        # Si vienen la PK y un campo de referencia de la misma FK, gana la PK
+        if nombre in resultado and (referencia or resultado[nombre].referencia is None):
+            continue
+        resultado[nombre] = ColumnaImportacion(campo, encabezado, referencia or None)
+        usados.add(encabezado)
+    ignorados = [encabezado for encabezado in encabezados if encabezado not in usados]
+    return list(resultado.values()), ignorados
+
+
+# --- Referencias (FK) -------------------------------------------------------
+
+class Referencias:
+    """Mapas en memoria de las tablas relacionadas, cargados una vez por importación."""
+
+    def __init__(self, using):
+        self.using = using
+        self._pks = {}
+        self._mapas = {}
+
+    def pks(self, model):
+        if model not in self._pks:
+            self._pks[model] = set(model._base_manager.using(self.using).values_list('pk', flat=True))
+        return self._pks[model]
+
+    def mapa(self, model, campo):
+        """{valor como texto: pk}; los valores repetidos en la tabla quedan como None (ambiguos)."""
+        if (model, campo) not in self._mapas:
+            mapa = {}
+            filas = model._base_manager.using(self.using).exclude(**{f'{campo}__isnull': True})
+            for valor, pk in filas.values_list(campo, 'pk').iterator(chunk_size=10000):
+                clave = str(valor).strip()
+                mapa[clave] = None if clave in mapa else pk
+            self._mapas[(model, campo)] = mapa
+        return self._mapas[(model, campo)]
+
+
+# --- Coerción por columnas --------------------------------------------------
+
+def _booleano(mascara):
+    return mascara.fillna(False).astype(bool)
+
+
+def _texto(serie):
+    valores = serie.astype('string').str.strip()
+    return valores.mask(valores == '')
+
+
+def _normalizar_choice(valores):
+    # Como estados.normalizar, sin alias: ' transferencia  bancaria' -> 'TRANSFERENCIA_BANCARIA'
+    return valores.str.upper().str.replace(r'\s+', '_', regex=True)
+
+
+def _coercer(pd, model, columna, serie, referencias, formato_fecha):
+    """Retorna (valores tipados, máscara de inválidos, motivo)."""
+    campo = columna.campo
+    valores = _texto(serie)
+    presentes = valores.notna()
+
+    if campo.is_relation:
+        relacionado = campo.related_model
+        if columna.referencia:
+            pks = valores.map(referencias.mapa(relacionado, columna.referencia))
+            return pks.astype('Int64'), _booleano(presentes & pks.isna()), f'{columna.origen}: no existe o es ambiguo'
+        numeros = pd.to_numeric(valores, errors='coerce')
+        validos = numeros.isin(list(referencias.pks(relacionado)))
+        return numeros.where(validos).astype('Int64'), _booleano(presentes & ~validos), f'{campo.name}: no existe'
+
+    if campo.choices:
+        if campo.name == 'estado':
+            unicos = valores.dropna().unique()
+            normalizados = valores.map({valor: estados.normalizar(model, valor) for valor in unicos})
+        else:
+            normalizados = _normalizar_choice(valores)
+        opciones = pd.Series([str(etiqueta) for _, etiqueta in campo.flatchoices], dtype='string')
+        equivalentes = dict(zip(_normalizar_choice(opciones), (valor for valor, _ in campo.flatchoices)))
+        equivalentes.update((valor, valor) for valor, _ in campo.flatchoices)
+        canonicos = normalizados.map(equivalentes)
+        return canonicos, _booleano(presentes & canonicos.isna()), f'{campo.name}: valor no válido'
+
+    if isinstance(campo, models.DateField):
+        fechas = pd.to_datetime(valores, errors='coerce', format=formato_fecha or 'ISO8601')
+        return fechas.dt.normalize(), _booleano(presentes & fechas.isna()), f'{campo.name}: fecha no válida'
+
+    if isinstance(campo, models.DecimalField):
+        numeros = pd.to_numeric(valores.str.replace(r'[\s$]', '', regex=True), errors='coerce')
+        limite = 10 ** (campo.max_digits - campo.decimal_places)
+        invalidos = presentes & (numeros.isna() | (numeros.abs() >= limite))
+        return numeros.round(campo.decimal_places), _booleano(invalidos), f'{campo.name}: número no válido'
+
+    if isinstance(campo, (models.IntegerField, models.FloatField)):
+        numeros = pd.to_numeric(valores, errors='coerce')
+        if isinstance(campo, models.FloatField):
+            return numeros, _booleano(presentes & numeros.isna()), f'{campo.name}: número no válido'
+        invalidos = presentes & (numeros.isna() | (numeros % 1 != 0))
+        return numeros.where(~invalidos).astype('Float64').astype('Int64'), _booleano(invalidos), \
+            f'{campo.name}: entero no válido'
+
+    if isinstance(campo, models.BooleanField):
+        minusculas = valores.str.lower()
+        booleanos = pd.Series(pd.NA, index=valores.index, dtype='boolean')
+        booleanos[_booleano(minusculas.isin(VERDADEROS))] = True
+        booleanos[_booleano(minusculas.isin(FALSOS))] = False
+        return booleanos, _booleano(presentes & booleanos.isna()), f'{campo.name}: booleano no válido'
+
+    if isinstance(campo, models.JSONField):
+        def leer(valor):
+            try:
+                return json.loads(valor)
+            except ValueError:
+                return _INVALIDO
+        leidos = valores.dropna().map(leer).reindex(valores.index)
+        invalidos = presentes & leidos.map(lambda valor: valor is _INVALIDO)
+        return leidos.where(~invalidos), _booleano(invalidos), f'{campo.name}: JSON no válido'
+
+    invalidos = presentes & (valores.str.len() > campo.max_length) if campo.max_length else presentes & False
+    return valores, _booleano(invalidos), f'{campo.name}: más de {campo.max_length} caracteres'
+
+
+_INVALIDO = object()
+
+
+def preparar(entidad, bloque, cols, referencias, clave=(), formato_fecha=None):
+    """
+    Tipifica y valida un bloque (DataFrame de textos). Retorna (válidos,
+    rechazados): `válidos` tiene una columna por campo (`campo.name`) con
+    tipos de pandas; `rechazados` es el bloque original de las filas
+    descartadas con la columna `error`.
+    """
+    import pandas as pd
+
+    model = entidad.model
+    errores = pd.Series('', index=bloque.index, dtype=object)
+    validos = pd.DataFrame(index=bloque.index)
+    for columna in cols:
+        valores, invalidos, motivo = _coercer(pd, model, columna, bloque[columna.origen], referencias, formato_fecha)
+        errores[invalidos] += motivo + '; '
+        validos[columna.campo.name] = valores
+
+    for columna in cols:
+        campo = columna.campo
+        if not campo.null and not campo.has_default():
+            faltantes = validos[campo.name].isna() & (errores == '')
+            errores[faltantes] += f'{campo.name}: obligatorio; '
+
+    if clave:
+        completos = validos[list(clave)].notna().all(axis=1) & (errores == '')
+        repetidos = completos & validos[completos.values].duplicated(subset=list(clave)).reindex(bloque.index, fill_value=False)
+        errores[repetidos] += 'clave repetida en el bloque; '
+
+    rechazados = errores != ''
+    salida = bloque[rechazados].copy()
+    salida['error'] = errores[rechazados].str.rstrip('; ')
+    return validos[~rechazados], salida
+
+
+# --- Carga ------------------------------------------------------------------
+
+def _python(serie, campo):
+    """Valores de la columna como objetos de Python (None en lugar de NA)."""
+    if isinstance(campo, models.DateField) and not campo.is_relation:
+        valores = serie.dt.date
+    elif isinstance(campo, models.DecimalField):
+        formato = f'{{:.{campo.decimal_places}f}}'
+        valores = serie.map(lambda numero: Decimal(formato.format(numero)), na_action='ignore')
+    else:
+        valores = serie
+    valores = valores.astype(object)
+    return valores.where(serie.notna(), None)
+
+
+def _texto_copy(serie, campo):
+    """Valores de la columna como texto para COPY (None = NULL)."""
+    if isinstance(campo, models.DateField) and not campo.is_relation:
+        valores = serie.dt.strftime('%Y-%m-%d')
+    elif isinstance(campo, models.DecimalField):
+        valores = serie.map(f'{{:.{campo.decimal_places}f}}'.format, na_action='ignore')
+    elif isinstance(campo, models.BooleanField):
+        valores = serie.map({True: 't', False: 'f'})
+    elif isinstance(campo, models.JSONField):
+        valores = serie.map(json.dumps, na_action='ignore')
+    else:
+        valores = serie.astype('string')
+    return valores.astype(object).where(serie.notna(), None)
+
+
+def cargar(model, validos, cols, clave, using):
+    """Inserta/actualiza las filas de `validos`. Retorna (insertados, actualizados)."""
+    if validos.empty:
+        return 0, 0
+    with transaction.atomic(using=using):
+        _bloquear(model, using)
+        if connections[using].vendor == 'postgresql':
+            return _cargar_copy(model, validos, cols, clave, using)
+        return _cargar_bulk(model, validos, cols, clave, using)
+
+
+def _cargar_bulk(model, validos, cols, clave, using, batch_size=1000):
+    campos = [columna.campo for columna in cols]
+    datos = {campo.attname: _python(validos[campo.name], campo).tolist() for campo in campos}
+    registros = [dict(zip(datos, fila)) for fila in zip(*datos.values())]
+    manager = model._default_manager.using(using)
+
+    existentes = {}
+    if clave:
+        attnames = [model._meta.get_field(nombre).attname for nombre in clave]
+        claves = {tuple(registro[a] for a in attnames) for registro in registros}
+        primeros = list({k[0] for k in claves if None not in k})
+        for inicio in range(0, len(primeros), batch_size):
+            filtro = {f'{attnames[0]}__in': primeros[inicio:inicio + batch_size]}
+            for obj in manager.filter(**filtro).order_by('pk'):
+                existentes.setdefault(tuple(getattr(obj, a) for a in attnames), obj)
+
+    nuevos, actualizados = [], []
+    for registro in registros:
+        obj = existentes.get(tuple(registro[a] for a in attnames)) if clave else None
+        if obj is None:
+            nuevos.append(model(**registro))
+        else:
+            for attname, valor in registro.items():
+                setattr(obj, attname, valor)
+            actualizados.append(obj)
+
+    if nuevos:
+        manager.bulk_create(nuevos, batch_size=batch_size)
+    if actualizados:
+        # bulk_update no pasa por pre_save: last_modified_at a mano (como en lotes.py)
+        nombres = [campo.name for campo in campos]
+        for campo in model._meta.concrete_fields:
+            if getattr(campo, 'auto_now', False):
+                for obj in actualizados:
+                    campo.pre_save(obj, add=False)
+                nombres.append(campo.name)
+        manager.bulk_update(actualizados, nombres, batch_size=batch_size)
+    return len(nuevos), len(actualizados)
+
+
+def _copy(cursor, sql, texto):
+    crudo = cursor.cursor
+    if hasattr(crudo, 'copy_expert'):  # psycopg2
+        crudo.copy_expert(sql, io.StringIO(texto))
+    else:  # psycopg 3
+        with crudo.copy(sql) as copy:
+            copy.write(texto)
+
+
+def _cargar_copy(model, validos, cols, clave, using):
+    connection = connections[using]
+    q = connection.ops.quote_name
+    tabla = q(model._meta.db_table)
+    pk = q(model._meta.pk.column)
+    campos = [columna.campo for columna in cols]
+    columnas_sql = ', '.join(q(campo.column) for campo in campos)
+    automaticos = [
+        q(campo.column) for campo in model._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+
+    buffer = io.StringIO()
+    texto = {campo.name: _texto_copy(validos[campo.name], campo) for campo in campos}
+    writer = csv.writer(buffer, lineterminator='\n')
+    for fila in zip(*texto.values()):
+        writer.writerow(['' if valor is None else valor for valor in fila])
+
+    coincide = ' AND '.join(
+        f'x.{q(model._meta.get_field(nombre).column)} = s.{q(model._meta.get_field(nombre).column)}'
+        for nombre in clave
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE importacion ON COMMIT DROP AS SELECT {columnas_sql} FROM {tabla} WITH NO DATA')
+        # En CSV un campo vacío sin comillas es NULL; los textos vacíos ya se pasaron a NULL
+        _copy(cursor, f'COPY importacion ({columnas_sql}) FROM STDIN WITH (FORMAT csv)', buffer.getvalue())
+
+        pks_actualizados = []
+        if clave:
+            cursor.execute(f'SELECT x.{pk} FROM {tabla} x JOIN importacion s ON {coincide}')
+            pks_actualizados = [fila[0] for fila in cursor.fetchall()]
+        antes = _snapshots(model, pks_actualizados, using)
+
+        if pks_actualizados:
+            asignaciones = ', '.join(f'{q(campo.column)} = s.{q(campo.column)}' for campo in campos)
+            asignaciones += ''.join(
+                f', {q(campo.column)} = now()' for campo in model._meta.concrete_fields
+                if getattr(campo, 'auto_now', False)
+            )
+            cursor.execute(f'UPDATE {tabla} x SET {asignaciones} FROM importacion s WHERE {coincide}')
+
+        destino = ', '.join([columnas_sql, *automaticos])
+        origen = ', '.join([', '.join(f's.{q(campo.column)}' for campo in campos), *['now()'] * len(automaticos)])
+        sin_existente = f' WHERE NOT EXISTS (SELECT 1 FROM {tabla} x WHERE {coincide})' if clave else ''
+        cursor.execute(f'INSERT INTO {tabla} ({destino}) SELECT {origen} FROM importacion s{sin_existente} RETURNING {pk}')
+        pks_nuevos = [fila[0] for fila in cursor.fetchall()]
+        # Si el bloque corre dentro de otra transacción, ON COMMIT no alcanza
+        cursor.execute('DROP TABLE importacion')
+
+    despues = _snapshots(model, pks_actualizados + pks_nuevos, using)
+    datos_modificados.send(sender=model, antes=antes, despues=despues, using=using)
+    return len(pks_nuevos), len(pks_actualizados)
+
+
+def _snapshots(model, pks, using, batch_size=10000):
+    campos = model.campos_rastreados()
+    filas = []
+    for inicio in range(0, len(pks), batch_size):
+        filas += model._base_manager.using(using).filter(pk__in=pks[inicio:inicio + batch_size]).values(*campos)
+    return filas
@@ -0,0 +1,104 @@
+"""
+Motor de KPIs con comparación de periodos en una sola consulta.
+
+Un `KPISpec` declara los buckets de estado (Q) y las métricas (suma, promedio,
+conteo, distintos...) de un modelo. `calcular()` filtra por el rango de fechas
+que cubre el periodo actual y el anterior, y resuelve cada métrica de ambos
+periodos con agregación condicional (`FILTER (WHERE ...)` / `CASE`), es decir,
+un único SELECT con un agregado por métrica y periodo.
+"""
+import calendar
+from datetime import date
+from typing import NamedTuple, Optional
+
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+class Metrica(NamedTuple):
+    funcion: str  # sum | avg | count | distinct | max | min
+    campo: Optional[str] = None
+    bucket: Optional[str] = None
+
+
+_FUNCIONES = {
+    'sum': lambda campo, filtro: Sum(campo, filter=filtro),
+    'avg': lambda campo, filtro: Avg(campo, filter=filtro),
+    'count': lambda campo, filtro: Count(campo or 'pk', filter=filtro),
+    'distinct': lambda campo, filtro: Count(campo, distinct=True, filter=filtro),
+    'max': lambda campo, filtro: Max(campo, filter=filtro),
+    'min': lambda campo, filtro: Min(campo, filter=filtro),
+}
+
+
+def restar_mes(dt):
+    """Misma fecha un mes antes (ajustada al último día del mes si no existe)."""
+    year = dt.year
+    month = dt.month
+    if month == 1:
+        year -= 1
+        month = 12
+    else:
+        month -= 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, min(dt.day, last_day))
+
+
+def calcular_variacion(actual, prev):
+    if not prev or float(prev) == 0:
+        return 100.0 if actual and float(actual) > 0 else 0.0
+    return ((float(actual) - float(prev)) / float(prev)) * 100.0
+
+
+def periodo_desde_params(params):
+    """(inicio, fin) desde ?start_date&end_date; por defecto el año en curso."""
+    start_date_str = params.get('start_date')
+    end_date_str = params.get('end_date')
+    if start_date_str and end_date_str:
+        return parse_date(start_date_str), parse_date(end_date_str)
+    fecha_fin = timezone.now().date()
+    return fecha_fin.replace(month=1, day=1), fecha_fin
+
+
+class KPISpec:
+    def __init__(self, campo_fecha, buckets, metricas):
+        self.campo_fecha = campo_fecha
+        self.buckets = buckets
+        self.metricas = metricas
+
+    def periodo_anterior(self, inicio, fin):
+        # Comparación mes contra mes (misma ventana desplazada un mes)
+        return restar_mes(inicio), restar_mes(fin)
+
+    def _filtro_periodo(self, inicio, fin):
+        return Q(**{f'{self.campo_fecha}__range': (inicio, fin)})
+
+    def agregados(self, periodos):
+        expresiones = {}
+        for sufijo, (inicio, fin) in periodos.items():
+            filtro_periodo = self._filtro_periodo(inicio, fin)
+            for nombre, metrica in self.metricas.items():
+                filtro = filtro_periodo
+                if metrica.bucket:
+                    filtro &= self.buckets[metrica.bucket]
+                expresiones[f'{nombre}__{sufijo}'] = _FUNCIONES[metrica.funcion](metrica.campo, filtro)
+        return expresiones
+
+    def calcular(self, queryset, inicio, fin, prev_inicio=None, prev_fin=None):
+        """
+        Retorna (actual, anterior): dicts {métrica: valor} de ambos periodos,
+        resueltos en una sola consulta. Sumas y conteos vacíos valen 0.
+        """
+        if prev_inicio is None or prev_fin is None:
+            prev_inicio, prev_fin = self.periodo_anterior(inicio, fin)
+        periodos = {'actual': (inicio, fin), 'anterior': (prev_inicio, prev_fin)}
+
+        rango = self._filtro_periodo(min(inicio, prev_inicio), max(fin, prev_fin))
+        datos = queryset.filter(rango).aggregate(**self.agregados(periodos))
+
+        resultado = {sufijo: {} for sufijo in periodos}
+        for clave, valor in datos.items():
+            nombre, sufijo = clave.rsplit('__', 1)
+            resultado[sufijo][nombre] = valor or 0
+        return resultado['actual'], resultado['anterior']
@@ -0,0 +1,202 @@
+"""
+Altas masivas (`POST /api/<recurso>/batch/`).
+
+El cuerpo es una lista de objetos con el mismo formato que el POST individual,
+o `{"items": [...], "atomico": true}`. Cada item se valida con el serializer
+del ViewSet, pero las FK (`PrimaryKeyRelatedField`) se resuelven con un solo
+`IN` por modelo relacionado para todo el lote en vez de una consulta por campo
+e item.
+
+* Por defecto los items inválidos se reportan (`errores`, con su índice) y el
+  resto se guarda: 201 si todo entró, 207 si solo una parte, 400 si ninguno.
+* Con `atomico` cualquier error, de validación o de la base (p.ej. de
+  integridad), rechaza el lote completo (400, nada se guarda).
+* Los items con `comprobante` son idempotentes: si ya existe una fila con ese
+  comprobante se actualiza en vez de crear otra, así que reenviar el mismo
+  archivo de la pasarela (WOMPI, PAYU, NEQUI) no duplica.
+
+Se inserta con `bulk_create` (y `bulk_update` para los existentes) en bloques
+de BATCH_CHUNK_SIZE, cada uno en su transacción; las señales de
+`TrackedQuerySet` mantienen rollups, finanzas por caso y búsqueda.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, connections, router, transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+
+class RelacionPrecargada(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que busca en objetos ya cargados en vez de consultar."""
+
+    def __init__(self, objetos, **kwargs):
+        self.objetos = objetos
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.objetos:
+            self.fail('does_not_exist', pk_value=data)
+        return self.objetos[pk]
+
+
+def precargar_relaciones(serializer, items):
+    """Reemplaza las FK de `serializer` por RelacionPrecargada con un IN por campo."""
+    for nombre, campo in list(serializer.fields.items()):
+        if not isinstance(campo, serializers.PrimaryKeyRelatedField) or campo.read_only:
+            continue
+        queryset = campo.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = set()
+        for item in items:
+            valor = item.get(nombre) if isinstance(item, dict) else None
+            if valor is None or isinstance(valor, bool):
+                continue
+            try:
+                pks.add(pk_field.to_python(valor))
+            except (TypeError, ValueError, DjangoValidationError):
+                pass  # El item lo reporta como tipo incorrecto
+        kwargs = dict(campo._kwargs, queryset=queryset)
+        serializer.fields[nombre] = RelacionPrecargada(queryset.in_bulk(pks), **kwargs)
+
+
+def _bloquear(model, using):
+    # Sin restricción única sobre `comprobante`: dos lotes simultáneos podrían
+    # crear el mismo. En PostgreSQL los lotes de un modelo se serializan.
+    if connections[using].vendor == 'postgresql':
+        with connections[using].cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'lote:{model._meta.db_table}'])
+
+
+class LoteMixin:
+    """
+    Agrega `POST batch/` a un ViewSet. El ViewSet puede definir
+    `clave_idempotencia` (por defecto 'comprobante'; None para desactivar).
+    """
+    clave_idempotencia = 'comprobante'
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """Crear (o actualizar por comprobante) muchos registros en una solicitud"""
+        datos = request.data
+        atomico = False
+        if isinstance(datos, dict):
+            atomico = bool(datos.get('atomico', False))
+            datos = datos.get('items')
+        if not isinstance(datos, list) or not datos:
+            return Response({'detail': 'Se espera una lista de items no vacía'}, status=status.HTTP_400_BAD_REQUEST)
+        maximo = getattr(settings, 'BATCH_MAX_ITEMS', 5000)
+        if len(datos) > maximo:
+            return Response({'detail': f'Máximo {maximo} items por lote'}, status=status.HTTP_400_BAD_REQUEST)
+
+        validos, errores = self._validar_lote(datos)
+        if errores and (atomico or not validos):
+            return Response(
+                {'creados': 0, 'actualizados': 0, 'resultados': [], 'errores': errores},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        model = self.get_queryset().model
+        using = router.db_for_write(model)
+        tamano = getattr(settings, 'BATCH_CHUNK_SIZE', 500)
+        bloques = [validos[i:i + tamano] for i in range(0, len(validos), tamano)]
+        resultados = []
+        if atomico:
+            try:
+                with transaction.atomic(using=using):
+                    for bloque in bloques:
+                        resultados += self._guardar_bloque(model, bloque, using)
+            except DatabaseError as exc:
+                # Nada se guardó: el error aplica a todos los items
+                errores = [{'indice': indice, 'errores': {'non_field_errors': [str(exc)]}} for indice, _ in validos]
+                resultados = []
+        else:
+            for bloque in bloques:
+                try:
+                    with transaction.atomic(using=using):
+                        resultados += self._guardar_bloque(model, bloque, using)
+                except DatabaseError as exc:
+                    errores += [{'indice': indice, 'errores': {'non_field_errors': [str(exc)]}} for indice, _ in bloque]
+
+        errores.sort(key=lambda error: error['indice'])
+        cuerpo = {
+            'creados': sum(1 for r in resultados if r['accion'] == 'creado'),
+            'actualizados': sum(1 for r in resultados if r['accion'] == 'actualizado'),
+            'resultados': resultados,
+            'errores': errores,
+        }
+        if not resultados:
+            codigo = status.HTTP_400_BAD_REQUEST
+        elif errores:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_201_CREATED
+        return Response(cuerpo, status=codigo)
+
+    def _validar_lote(self, items):
+        """Retorna ([(índice, datos validados)], [errores])."""
+        serializer = self.get_serializer()
+        precargar_relaciones(serializer, items)
+        clave = self.clave_idempotencia
+        vistas = {}
+        validos, errores = [], []
+        for indice, item in enumerate(items):
+            try:
+                datos = serializer.run_validation(item)
+            except serializers.ValidationError as exc:
+                errores.append({'indice': indice, 'errores': exc.detail})
+                continue
+            valor = datos.get(clave) if clave else None
+            if valor:
+                if valor in vistas:
+                    errores.append({'indice': indice, 'errores': {
+                        clave: [f'Repetido en el lote (item {vistas[valor]})'],
+                    }})
+                    continue
+                vistas[valor] = indice
+            validos.append((indice, datos))
+        return validos, errores
+
+    def _guardar_bloque(self, model, bloque, using):
+        _bloquear(model, using)
+        clave = self.clave_idempotencia
+        existentes = {}
+        if clave:
+            valores = [datos[clave] for _, datos in bloque if datos.get(clave)]
+            for obj in model._default_manager.using(using).filter(**{f'{clave}__in': valores}):
+                # Si ya hay varias filas con el mismo comprobante se actualiza la primera
+                existentes.setdefault(getattr(obj, clave), obj)
+
+        nuevos, actualizados, campos = [], [], set()
+        for indice, datos in bloque:
+            obj = existentes.get(datos.get(clave)) if clave else None
+            if obj is None:
+                nuevos.append((indice, model(**datos)))
+            else:
+                for campo, valor in datos.items():
+                    setattr(obj, campo, valor)
+                campos.update(datos)
+                actualizados.append((indice, obj))
+
+        if actualizados:
+            # bulk_update no pasa por pre_save: se actualiza last_modified_at a mano
+            for campo in model._meta.concrete_fields:
+                if getattr(campo, 'auto_now', False):
+                    for _, obj in actualizados:
+                        campo.pre_save(obj, add=False)
+                    campos.add(campo.name)
+
+        manager = model._default_manager.using(using)
+        if nuevos:
+            manager.bulk_create([obj for _, obj in nuevos])
+        if actualizados:
+            manager.bulk_update([obj for _, obj in actualizados], sorted(campos))
+        resultados = [{'indice': i, 'id': obj.pk, 'accion': 'creado'} for i, obj in nuevos]
+        resultados += [{'indice': i, 'id': obj.pk, 'accion': 'actualizado'} for i, obj in actualizados]
+        return sorted(resultados, key=lambda resultado: resultado['indice'])
@@ -0,0 +1,294 @@
+"""
+Benchmark de todos los endpoints GET de la API (`/api/...`) con el cliente de
+pruebas de DRF, en el mismo proceso: por ruta, latencia p50/p95, consultas
+SQL, tiempo en SQL y tamaño de la respuesta.
+
+Las rutas salen del resolver de URLs (sin los sufijos `.json`); las de detalle
+(`/api/casos/{pk}/balance/`) usan el registro del medio por pk. La
+autenticación de Supabase se reemplaza por un usuario fijo (staff, para las
+rutas de administración). Con --scale N se generan N veces los datos de
+producción (core/datos_prueba.py, reproducibles con --semilla y --hasta, que
+quedan en la línea base) en una transacción que se revierte al final;
+--scale 0 usa los datos existentes.
+
+La cache del dashboard y los KPIs se desactiva (se mide el cálculo, no el
+hit) salvo con --con-cache, y el dashboard corre en secuencia: sus hilos
+usarían otras conexiones, que no ven los datos generados ni se cuentan.
+
+    python manage.py benchmark_api --scale 1 --guardar benchmarks/base.json
+    python manage.py benchmark_api --scale 1 --comparar benchmarks/base.json
+    python manage.py benchmark_api --scale 0 --ruta donaciones --iteraciones 50
+
+Con --comparar termina con error si alguna ruta hace más consultas, cambia de
+status, o su p50/p95/tiempo SQL/tamaño crece más que --umbral (y, para los
+tiempos, más que --umbral-ms).
+"""
+import json
+import os
+import re
+import statistics
+import time
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.apps.core import datos_prueba
+from backend.apps.users.authentication import SupabaseAuthentication
+
+_GRUPO = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+# (campo, ¿es un tiempo?) que se comparan contra la línea base
+_METRICAS = [('p50_ms', True), ('p95_ms', True), ('sql_ms', True), ('bytes', False)]
+
+
+def rutas_get(prefijo='api/'):
+    """{plantilla: vista} de las rutas GET bajo `prefijo`, p.ej. '/api/casos/{pk}/balance/'."""
+    def recorrer(patrones, base):
+        for patron in patrones:
+            if isinstance(patron, URLResolver):
+                yield from recorrer(patron.url_patterns, base + str(patron.pattern))
+            else:
+                yield base + str(patron.pattern), patron
+
+    rutas = {}
+    for texto, patron in recorrer(get_resolver().url_patterns, ''):
+        if not texto.startswith(prefijo) or 'format' in patron.pattern.regex.groupindex:
+            continue
+        vista = patron.callback
+        acciones = getattr(vista, 'actions', None)
+        if acciones is not None and 'get' not in acciones:
+            continue
+        if acciones is None and not hasattr(getattr(vista, 'view_class', None), 'get'):
+            continue
+        plantilla = '/' + _GRUPO.sub(lambda m: '{%s}' % m.group(1), texto).replace('^', '').replace('$', '')
+        rutas.setdefault(plantilla, vista)
+    return rutas
+
+
+def _modelo(vista):
+    viewset = getattr(vista, 'cls', None)
+    queryset = getattr(viewset, 'queryset', None)
+    if queryset is not None:
+        return queryset.model
+    meta = getattr(getattr(viewset, 'serializer_class', None), 'Meta', None)
+    return getattr(meta, 'model', None)
+
+
+class _Consultas:
+    """`execute_wrapper` que cuenta las consultas y suma su tiempo."""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.cantidad += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+def comparar(base, actual, umbral, umbral_ms):
+    """Lista de (ruta, motivo) de las rutas de `actual` que empeoran respecto de `base`."""
+    regresiones = []
+    for ruta, medida in actual.items():
+        previa = base.get(ruta)
+        if previa is None:
+            continue
+        if medida['status'] != previa['status']:
+            regresiones.append((ruta, f"status {previa['status']} -> {medida['status']}"))
+        if medida['consultas'] > previa['consultas']:
+            regresiones.append((ruta, f"consultas {previa['consultas']} -> {medida['consultas']}"))
+        for campo, es_tiempo in _METRICAS:
+            antes, ahora = previa[campo], medida[campo]
+            if ahora <= antes * (1 + umbral) or (es_tiempo and ahora - antes <= umbral_ms):
+                continue
+            regresiones.append((ruta, f'{campo} {antes:g} -> {ahora:g} (+{(ahora / antes - 1) * 100 if antes else 100:.0f}%)'))
+    return regresiones
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y tamaño de cada endpoint GET de la API y compara con una línea base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help='Múltiplo del tamaño de producción a generar (0 = datos existentes)')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--hasta', type=date.fromisoformat, default=datos_prueba.HASTA,
+                            help='Último día de la historia generada, AAAA-MM-DD')
+        parser.add_argument('--iteraciones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2)
+        parser.add_argument('--ruta', action='append', help='Medir solo las rutas que contienen este texto')
+        parser.add_argument('--con-cache', action='store_true', help='Dejar activa la cache del dashboard y KPIs')
+        parser.add_argument('--guardar', metavar='JSON', help='Escribir los resultados como línea base')
+        parser.add_argument('--comparar', metavar='JSON', help='Comparar contra una línea base')
+        parser.add_argument('--umbral', type=float, default=0.2,
+                            help='Aumento relativo tolerado (0.2 = 20%%)')
+        parser.add_argument('--umbral-ms', type=float, default=5,
+                            help='Aumento absoluto tolerado en los tiempos, contra el ruido')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['iteraciones'] < 2:
+            raise CommandError('--iteraciones debe ser al menos 2')
+        base = None
+        if options['comparar']:
+            with open(options['comparar']) as f:
+                base = json.load(f)
+
+        using = options['database']
+        self.connection = connections[using]
+        rutas = rutas_get()
+        if options['ruta']:
+            rutas = {ruta: vista for ruta, vista in rutas.items() if any(texto in ruta for texto in options['ruta'])}
+        if not rutas:
+            raise CommandError('Ninguna ruta coincide')
+
+        try:
+            with transaction.atomic(using=using):
+                if options['scale']:
+                    self._generar(options, using)
+                resultados = self._medir_rutas(rutas, options, using)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        reporte = {
+            'escala': options['scale'],
+            'semilla': options['semilla'],
+            'hasta': options['hasta'].isoformat(),
+            'motor': self.connection.vendor,
+            'iteraciones': options['iteraciones'],
+            'con_cache': options['con_cache'],
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'rutas': resultados,
+        }
+        if options['guardar']:
+            directorio = os.path.dirname(os.path.abspath(options['guardar']))
+            os.makedirs(directorio, exist_ok=True)
+            with open(options['guardar'], 'w') as f:
+                json.dump(reporte, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Línea base en {options['guardar']}")
+        if base is not None:
+            self._comparar(base, reporte, options)
+
+    def _generar(self, options, using):
+        cantidades = datos_prueba.escalar(options['scale'])
+        inicio = time.perf_counter()
+        datos_prueba.generar(
+            cantidades['donaciones'], semilla=options['semilla'], using=using, cantidades=cantidades,
+            hasta=options['hasta'],
+        )
+        self.stdout.write(
+            'Datos sintéticos: ' + ', '.join(f'{tabla}={n}' for tabla, n in cantidades.items())
+            + f' ({time.perf_counter() - inicio:.1f}s)'
+        )
+        if self.connection.vendor == 'postgresql':
+            with self.connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def _medir_rutas(self, rutas, options, using):
+        # Staff para medir también /api/metricas/ y /api/perfilado/ (se revierte al final)
+        usuario, _ = get_user_model().objects.using(using).update_or_create(
+            username='benchmark_api', defaults={'is_staff': True},
+        )
+        cliente = APIClient()
+        resultados = {}
+
+        self.stdout.write(
+            f"\n{'ruta':<42} {'status':>6} {'p50':>9} {'p95':>9} {'consultas':>9} {'sql':>9} {'bytes':>10}"
+        )
+        with mock.patch.object(SupabaseAuthentication, 'authenticate', lambda auth, request: (usuario, None)), \
+                override_settings(DASHBOARD_CACHE_ENABLED=options['con_cache'], DASHBOARD_CONCURRENTE=False):
+            for plantilla, vista in sorted(rutas.items()):
+                url = self._url(plantilla, vista, using)
+                if url is None:
+                    self.stdout.write(f'{plantilla:<42} sin registros, se omite')
+                    continue
+                medida = self._medir(cliente, url, options['iteraciones'], options['calentamiento'])
+                resultados[plantilla] = medida
+                self.stdout.write(
+                    f"{plantilla:<42} {medida['status']:>6} {medida['p50_ms']:7.1f}ms {medida['p95_ms']:7.1f}ms "
+                    f"{medida['consultas']:>9} {medida['sql_ms']:7.1f}ms {medida['bytes']:>10}"
+                )
+        return resultados
+
+    def _url(self, plantilla, vista, using):
+        if '{pk}' not in plantilla:
+            return plantilla
+        model = _modelo(vista)
+        if model is None:
+            return None
+        pks = model._default_manager.using(using).order_by('pk').values_list('pk', flat=True)
+        total = pks.count()
+        if not total:
+            return None
+        return plantilla.format(pk=pks[total // 2])
+
+    def _pedir(self, cliente, url):
+        respuesta = cliente.get(url, HTTP_AUTHORIZATION='Bearer benchmark')
+        if respuesta.streaming:
+            tamano = sum(len(parte) for parte in respuesta.streaming_content)
+        else:
+            tamano = len(respuesta.content)
+        return respuesta.status_code, tamano
+
+    def _medir(self, cliente, url, iteraciones, calentamiento):
+        for _ in range(calentamiento):
+            self._pedir(cliente, url)
+
+        tiempos, tiempos_sql, consultas = [], [], []
+        for _ in range(iteraciones):
+            medidas = _Consultas()
+            with self.connection.execute_wrapper(medidas):
+                inicio = time.perf_counter()
+                status, tamano = self._pedir(cliente, url)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(medidas.cantidad)
+            tiempos_sql.append(medidas.segundos * 1000)
+
+        percentiles = statistics.quantiles(tiempos, n=100, method='inclusive')
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+            'consultas': max(consultas),
+            'sql_ms': round(statistics.median(tiempos_sql), 3),
+            'bytes': tamano,
+        }
+
+    def _comparar(self, base, reporte, options):
+        for campo in ('escala', 'semilla', 'hasta', 'motor', 'con_cache'):
+            if base.get(campo) != reporte[campo]:
+                self.stdout.write(self.style.WARNING(
+                    f'La línea base tiene {campo}={base.get(campo)} y esta corrida {reporte[campo]}: '
+                    'la comparación no es directa'
+                ))
+        faltantes = sorted(set(base['rutas']) - set(reporte['rutas']))
+        nuevas = sorted(set(reporte['rutas']) - set(base['rutas']))
+        if nuevas:
+            self.stdout.write(f"Rutas sin línea base: {', '.join(nuevas)}")
+        if faltantes and not options['ruta']:
+            self.stdout.write(f"Rutas de la línea base no medidas: {', '.join(faltantes)}")
+
+        regresiones = comparar(base['rutas'], reporte['rutas'], options['umbral'], options['umbral_ms'])
+        if regresiones:
+            self.stdout.write(self.style.ERROR(f'\n{len(regresiones)} regresiones:'))
+            for ruta, motivo in regresiones:
+                self.stdout.write(f'  {ruta:<42} {motivo}')
+            raise CommandError('Hay regresiones respecto de la línea base')
+        self.stdout.write(self.style.SUCCESS('\nSin regresiones respecto de la línea base'))
@@ -0,0 +1,87 @@
+"""
+Compara la latencia de `?search=` en donaciones: el `icontains` de DRF (OR
+de LIKE sobre los JOINs) contra los documentos de búsqueda (core/busqueda.py).
+Mide COUNT(*) + primera página, como el listado.
+
+Para cada tamaño genera esa cantidad de donaciones sintéticas
+(core/datos_prueba.py) en una transacción que se revierte al terminar.
+
+    python manage.py benchmark_busqueda
+    python manage.py benchmark_busqueda --tamanos 10000 100000 --repeticiones 5
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from backend.apps.core import datos_prueba
+from backend.apps.core.busqueda import BusquedaFilter, OrdenFilter
+from backend.apps.donaciones.views import DonacionViewSet
+
+BACKENDS = {
+    'icontains': (filters.SearchFilter, filters.OrderingFilter),
+    'documento': (BusquedaFilter, OrdenFilter),
+}
+
+# Términos según los datos de datos_prueba: nombre, identificación, correo, caso, medio y estado
+BUSQUEDAS = ['donante 123', '10000456', 'donante77@ejemplo', 'caso 12', 'nequi aprobada']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de ?search= con icontains y con documentos de búsqueda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Cantidades de donaciones a generar')
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--busqueda', action='append', help='Términos a buscar (por defecto BUSQUEDAS)')
+
+    def handle(self, *args, **options):
+        busquedas = options['busqueda'] or BUSQUEDAS
+        self.stdout.write(f"{'donaciones':>10} {'búsqueda':<20} {'filas':>7} {'icontains':>11} {'documento':>11} {'mejora':>7}")
+        for tamano in options['tamanos']:
+            try:
+                with transaction.atomic():
+                    inicio = time.perf_counter()
+                    datos_prueba.generar(tamano)
+                    if connection.vendor == 'postgresql':
+                        with connection.cursor() as cursor:
+                            cursor.execute('ANALYZE')
+                    self.stderr.write(f'{tamano} donaciones generadas en {time.perf_counter() - inicio:.1f}s')
+                    for termino in busquedas:
+                        self._comparar(tamano, termino, options['repeticiones'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _comparar(self, tamano, termino, repeticiones):
+        tiempos = {}
+        for nombre, backends in BACKENDS.items():
+            medidas = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                filas = self._buscar(termino, backends)
+                medidas.append((time.perf_counter() - inicio) * 1000)
+            tiempos[nombre] = statistics.median(medidas)
+        self.stdout.write(
+            f"{tamano:>10} {termino:<20} {filas:>7} {tiempos['icontains']:>9.1f}ms "
+            f"{tiempos['documento']:>9.1f}ms {tiempos['icontains'] / tiempos['documento']:>6.1f}x"
+        )
+
+    def _buscar(self, termino, backends):
+        request = Request(APIRequestFactory().get('/api/donaciones/', {'search': termino}))
+        vista = DonacionViewSet(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+        queryset = vista.get_queryset()
+        for backend in backends:
+            queryset = backend().filter_queryset(request, queryset, vista)
+        total = queryset.count()
+        list(queryset[:10])
+        return total
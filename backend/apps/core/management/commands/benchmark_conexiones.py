@@ -0,0 +1,165 @@
+"""
+Latencia por request según el manejo de conexiones a la base (DB_* en
+settings.py, core/conexiones.py):
+
+* por_request: CONN_MAX_AGE=0, una conexión nueva por request.
+* persistente: CONN_MAX_AGE>0, la conexión sobrevive entre requests.
+* persistente_health_checks: además verifica la conexión al reutilizarla.
+* pool: pool de psycopg 3 (requiere psycopg_pool).
+* pgbouncer: con --pgbouncer-url, por PgBouncer en modo transacción (sin
+  cursores del lado del servidor).
+
+Cada request simula el ciclo de WSGI: `request_started`, la vista y
+`request_finished`, que cierra la conexión o la conserva según el modo. Se
+mide contra la base de DATABASE_URL (o --database-url), que debe estar
+migrada; conviene un PostgreSQL local con `sslmode=require` para incluir el
+handshake TLS. En SQLite los modos casi no se diferencian.
+
+    python manage.py benchmark_conexiones --iteraciones 300
+    python manage.py benchmark_conexiones --pgbouncer-url postgres://u:p@localhost:6432/crm
+    python manage.py benchmark_conexiones --ruta /api/casos/kpis/ --modo por_request --modo pool
+"""
+import copy
+import importlib.util
+import statistics
+import time
+
+import dj_database_url
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import Resolver404, resolve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.core import conexiones
+
+MODOS = {
+    'por_request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistente': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'persistente_health_checks': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'pool': True},
+    'pgbouncer': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'DISABLE_SERVER_SIDE_CURSORS': True},
+}
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia por request con conexiones por request, persistentes, pool y PgBouncer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=200)
+        parser.add_argument('--calentamiento', type=int, default=5)
+        parser.add_argument('--ruta', action='append',
+                            help='Endpoint GET a pedir en cada request (por defecto /api/donaciones/)')
+        parser.add_argument('--modo', action='append', choices=list(MODOS),
+                            help='Modos a medir (por defecto todos los disponibles)')
+        parser.add_argument('--database-url', help='Base a medir (por defecto la de DATABASE_URL)')
+        parser.add_argument('--pgbouncer-url', help='URL de PgBouncer para el modo pgbouncer')
+        parser.add_argument('--pool-max-size', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if options['iteraciones'] < 2:
+            raise CommandError('--iteraciones debe ser al menos 2')
+        rutas = []
+        for url in options['ruta'] or ['/api/donaciones/']:
+            ruta = url.partition('?')[0]
+            try:
+                rutas.append((url, resolve(ruta)))
+            except Resolver404:
+                raise CommandError(f'{ruta} no es una ruta de la API')
+
+        original = copy.deepcopy(connections.settings['default'])
+        base = copy.deepcopy(original)
+        if options['database_url']:
+            base.update(self._destino(options['database_url']))
+        postgres = base['ENGINE'] == 'django.db.backends.postgresql'
+        if not postgres:
+            self.stdout.write(self.style.WARNING(
+                f"La base es {base['ENGINE'].rsplit('.', 1)[-1]}: sin conexión de red los modos casi no se diferencian"
+            ))
+
+        self.usuario = get_user_model()(username='benchmark_conexiones')
+        self.factory = APIRequestFactory()
+        abiertas = []
+        connection_created.connect(lambda sender, connection, **kw: abiertas.append(connection.alias), weak=False,
+                                   dispatch_uid='benchmark_conexiones')
+
+        self.stdout.write(
+            f"{'modo':<28} {'media':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'conexiones':>11}"
+        )
+        # Sin cache de respuestas: cada request debe llegar a la base
+        try:
+            with override_settings(DASHBOARD_CACHE_ENABLED=False):
+                self._medir(options, base, postgres, rutas, abiertas)
+        finally:
+            connection_created.disconnect(dispatch_uid='benchmark_conexiones')
+            self._usar(original)
+
+    def _medir(self, options, base, postgres, rutas, abiertas):
+        for nombre in options['modo'] or MODOS:
+            ajustes = self._ajustes(nombre, base, options, postgres)
+            if ajustes is None:
+                continue
+            self._usar(ajustes)
+            for _ in range(options['calentamiento']):
+                self._requests(rutas)
+            abiertas.clear()
+            tiempos = []
+            for _ in range(options['iteraciones']):
+                tiempos.extend(self._requests(rutas))
+            percentiles = statistics.quantiles(tiempos, n=100, method='inclusive')
+            self.stdout.write(
+                f'{nombre:<28} {statistics.mean(tiempos):7.2f}ms {percentiles[49]:7.2f}ms '
+                f'{percentiles[94]:7.2f}ms {percentiles[98]:7.2f}ms {len(abiertas):>11}'
+            )
+
+    def _destino(self, url):
+        parametros = dj_database_url.parse(url)
+        return {clave: parametros[clave] for clave in ('ENGINE', 'NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')
+                if clave in parametros}
+
+    def _ajustes(self, nombre, base, options, postgres):
+        cambios = dict(MODOS[nombre])
+        ajustes = copy.deepcopy(base)
+        opciones = ajustes['OPTIONS'] = dict(ajustes.get('OPTIONS', {}))
+        opciones.pop('pool', None)
+        ajustes['DISABLE_SERVER_SIDE_CURSORS'] = False
+
+        if cambios.pop('pool', False):
+            if not postgres or importlib.util.find_spec('psycopg_pool') is None:
+                self.stdout.write(f'{nombre:<28} se omite: requiere PostgreSQL con psycopg 3 y psycopg_pool')
+                return None
+            opciones['pool'] = {'min_size': 1, 'max_size': options['pool_max_size']}
+        if nombre == 'pgbouncer':
+            if not options['pgbouncer_url']:
+                self.stdout.write(f'{nombre:<28} se omite: falta --pgbouncer-url')
+                return None
+            ajustes.update(self._destino(options['pgbouncer_url']))
+            if importlib.util.find_spec('psycopg') is not None:
+                opciones.update(server_side_binding=False, prepare_threshold=None)
+        ajustes.update(cambios)
+        return ajustes
+
+    def _usar(self, ajustes):
+        conexiones.cerrar()
+        connections.settings['default'] = ajustes
+        del connections['default']
+
+    def _requests(self, rutas):
+        tiempos = []
+        for url, match in rutas:
+            request = self.factory.get(url)
+            force_authenticate(request, user=self.usuario)
+            inicio = time.perf_counter()
+            request_started.send(sender=self.__class__, environ=request.META)
+            respuesta = match.func(request, *match.args, **match.kwargs)
+            if hasattr(respuesta, 'render'):
+                respuesta.render()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code != 200:
+                raise CommandError(f'{url}: {respuesta.status_code}')
+            # Fuera de la medición: WSGI cierra la conexión después de enviar la respuesta
+            request_finished.send(sender=self.__class__)
+        return tiempos
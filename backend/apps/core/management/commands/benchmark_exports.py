@@ -0,0 +1,143 @@
+"""
+Benchmark de las exportaciones de donaciones: tiempo total y pico de memoria
+residente (RSS) del proceso para CSV en streaming y Excel write-only, y
+opcionalmente para un Workbook de openpyxl en memoria como referencia.
+
+Con --filas N se generan N donaciones sintéticas (core/datos_prueba.py) en
+una transacción que se revierte al terminar.
+
+    python manage.py benchmark_exports --filas 100000
+    python manage.py benchmark_exports --filas 100000 --comparar
+    python manage.py benchmark_exports --filas 0      # datos existentes
+"""
+import resource
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.core import datos_prueba
+from backend.apps.core.exports import filas
+from backend.apps.donaciones.models import Donacion
+from backend.apps.donaciones.views import DonacionViewSet
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for linea in status:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    # Sin /proc (macOS): máximo histórico del proceso, en bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+class _PicoRSS:
+    """Muestrea la RSS en un hilo mientras dura el bloque."""
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._fin = threading.Event()
+
+    def _muestrear(self):
+        while not self._fin.is_set():
+            self.pico = max(self.pico, _rss_mb())
+            time.sleep(self.intervalo)
+
+    def __enter__(self):
+        self.inicial = _rss_mb()
+        self.pico = self.inicial
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+        self.pico = max(self.pico, _rss_mb())
+        return False
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y pico de RSS de las exportaciones CSV/Excel de donaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100000,
+                            help='Donaciones sintéticas a generar (0 = usar los datos existentes)')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Incluir un Workbook de openpyxl en memoria como referencia')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['filas']:
+                    inicio = time.perf_counter()
+                    datos_prueba.generar(options['filas'])
+                    self.stdout.write(f"Generadas {options['filas']} donaciones en {time.perf_counter() - inicio:.1f}s")
+                self._medir(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _medir(self, options):
+        total = Donacion.objects.count()
+        self.stdout.write(f'Exportando {total} donaciones\n')
+        medidas = [('csv', self._csv), ('xlsx', self._xlsx)]
+        # La referencia va al final: la RSS que alcanza no se devuelve al sistema
+        if options['comparar']:
+            medidas.append(('xlsx en memoria', self._xlsx_en_memoria))
+
+        self.stdout.write(f"{'formato':<16} {'tiempo':>9} {'bytes':>12} {'RSS inicial':>12} {'RSS pico':>10} {'delta':>9}")
+        for nombre, medir in medidas:
+            with _PicoRSS() as rss:
+                inicio = time.perf_counter()
+                tamano = medir()
+                segundos = time.perf_counter() - inicio
+            self.stdout.write(
+                f'{nombre:<16} {segundos:8.2f}s {tamano:12d} {rss.inicial:10.1f}MB '
+                f'{rss.pico:8.1f}MB {rss.pico - rss.inicial:7.1f}MB'
+            )
+
+    def _respuesta(self, accion):
+        request = APIRequestFactory().get(f'/api/donaciones/{accion}/')
+        force_authenticate(request, user=get_user_model()(username='benchmark_exports'))
+        return DonacionViewSet.as_view({'get': accion})(request)
+
+    def _consumir(self, respuesta):
+        # Simula al cliente: lee las partes y las descarta. No se llama a
+        # respuesta.close(): emite request_finished, que cerraría la conexión
+        # y con ella la transacción de los datos generados.
+        tamano = 0
+        for parte in respuesta.streaming_content:
+            tamano += len(parte)
+        return tamano
+
+    def _csv(self):
+        return self._consumir(self._respuesta('exportar_csv'))
+
+    def _xlsx(self):
+        return self._consumir(self._respuesta('exportar_excel'))
+
+    def _xlsx_en_memoria(self):
+        import io
+        import openpyxl
+
+        columnas = DonacionViewSet.columnas_exportacion
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append([columna.titulo for columna in columnas])
+        for fila in filas(Donacion.objects.order_by('-fecha_donacion'), columnas):
+            ws.append(fila)
+        salida = io.BytesIO()
+        wb.save(salida)
+        return salida.tell()
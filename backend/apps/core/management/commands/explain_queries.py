@@ -0,0 +1,152 @@
+"""
+Ejecuta los endpoints de KPIs y el Dashboard, captura sus consultas y muestra
+el plan de cada una: `EXPLAIN (ANALYZE, BUFFERS)` en PostgreSQL y
+`EXPLAIN QUERY PLAN` en SQLite. Reporta las consultas que todavía recorren
+tablas completas (Seq Scan / SCAN sin índice).
+
+Con --generar N se insertan N donaciones sintéticas (y datos proporcionales,
+ver core/datos_prueba.py) dentro de una transacción que se revierte al final:
+la base queda intacta.
+
+    python manage.py explain_queries --generar 50000
+    python manage.py explain_queries --endpoint dashboard -v 2
+    python manage.py explain_queries --generar 50000 --fallar-si-seqscan
+"""
+import re
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.casos.views import CasoViewSet
+from backend.apps.core import datos_prueba
+from backend.apps.core.views import DashboardView
+from backend.apps.donaciones.views import DonacionViewSet, DonanteViewSet
+from backend.apps.finanzas.views import GastoViewSet
+
+ENDPOINTS = {
+    'dashboard': ('/api/dashboard/', DashboardView.as_view()),
+    'donaciones.kpis': ('/api/donaciones/kpis/', DonacionViewSet.as_view({'get': 'kpis'})),
+    'donantes.kpis': ('/api/donantes/kpis/', DonanteViewSet.as_view({'get': 'kpis'})),
+    'gastos.kpis': ('/api/gastos/kpis/', GastoViewSet.as_view({'get': 'kpis'})),
+    'casos.kpis': ('/api/casos/kpis/', CasoViewSet.as_view({'get': 'kpis'})),
+    'casos.activos': ('/api/casos/activos/', CasoViewSet.as_view({'get': 'activos'})),
+}
+
+_SEQ_SCAN_POSTGRES = re.compile(r'Seq Scan on (\w+)')
+# SQLite: "SCAN donaciones" es un recorrido completo; "SCAN t USING INDEX" recorre un índice
+_SEQ_SCAN_SQLITE = re.compile(r'^SCAN (\w+)\b(?! USING)')
+# Resultados intermedios de SQLite, no tablas
+_NO_TABLAS_SQLITE = {'subquery', 'CONSTANT'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Muestra el plan de las consultas de KPIs/Dashboard y reporta los recorridos secuenciales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Endpoints a analizar (por defecto todos)')
+        parser.add_argument('--generar', type=int, default=0, metavar='N',
+                            help='Generar N donaciones sintéticas (se revierten al terminar)')
+        parser.add_argument('--start-date', help='Rango a consultar (por defecto el año en curso)')
+        parser.add_argument('--end-date')
+        parser.add_argument('--fallar-si-seqscan', action='store_true',
+                            help='Terminar con error si alguna consulta hace Seq Scan')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        self.connection = connections[using]
+        if self.connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Motor no soportado: {self.connection.vendor}')
+
+        try:
+            with transaction.atomic(using=using):
+                if options['generar']:
+                    creados = datos_prueba.generar(options['generar'], using=using)
+                    self.stdout.write('Datos sintéticos: ' + ', '.join(f'{k}={v}' for k, v in creados.items()))
+                    self._actualizar_estadisticas()
+                con_seqscan = self._analizar(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if con_seqscan:
+            self.stdout.write(self.style.WARNING(f'\n{len(con_seqscan)} consultas con recorrido secuencial:'))
+            for endpoint, tablas, sql in con_seqscan:
+                self.stdout.write(f"  {endpoint:<16} {', '.join(sorted(tablas)):<30} {sql[:100]}")
+            if options['fallar_si_seqscan']:
+                raise CommandError('Hay consultas sin índice')
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNinguna consulta hace recorrido secuencial'))
+
+    def _actualizar_estadisticas(self):
+        # Sin estadísticas el planificador supone tablas pequeñas y elige Seq Scan
+        with self.connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _analizar(self, options):
+        hoy = timezone.localdate()
+        params = {
+            'start_date': options['start_date'] or hoy.replace(month=1, day=1).isoformat(),
+            'end_date': options['end_date'] or hoy.isoformat(),
+        }
+        factory = APIRequestFactory()
+        usuario = get_user_model()(username='explain_queries')
+        con_seqscan = []
+
+        # Sin cache (se quiere ver la consulta) y en secuencia (las consultas
+        # de otros hilos usan otra conexión y no se capturarían)
+        with override_settings(DASHBOARD_CACHE_ENABLED=False, DASHBOARD_CONCURRENTE=False):
+            for endpoint in options['endpoint'] or ENDPOINTS:
+                url, vista = ENDPOINTS[endpoint]
+                request = factory.get(url, params)
+                force_authenticate(request, user=usuario)
+                with CaptureQueriesContext(self.connection) as capturadas:
+                    respuesta = vista(request)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'\n{endpoint} ({respuesta.status_code}, {len(capturadas)} consultas)'
+                ))
+
+                vistas = set()
+                for consulta in capturadas:
+                    sql = consulta['sql']
+                    if not sql.lstrip().upper().startswith('SELECT') or sql in vistas:
+                        continue
+                    vistas.add(sql)
+                    plan, ms = self._explicar(sql)
+                    tablas = self._tablas_seqscan(plan)
+                    estado = self.style.WARNING('SEQ SCAN ' + ','.join(sorted(tablas))) if tablas else 'ok'
+                    self.stdout.write(f'  {ms:8.1f} ms  {estado:<30} {sql[:90]}')
+                    if options['verbosity'] > 1:
+                        for linea in plan:
+                            self.stdout.write(f'      {linea}')
+                    if tablas:
+                        con_seqscan.append((endpoint, tablas, sql))
+        return con_seqscan
+
+    def _explicar(self, sql):
+        """Retorna (líneas del plan, ms)."""
+        inicio = time.perf_counter()
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql)
+                plan = [fila[0] for fila in cursor.fetchall()]
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [fila[-1] for fila in cursor.fetchall()]
+        return plan, (time.perf_counter() - inicio) * 1000
+
+    def _tablas_seqscan(self, plan):
+        if self.connection.vendor == 'postgresql':
+            return {tabla for linea in plan for tabla in _SEQ_SCAN_POSTGRES.findall(linea)}
+        tablas = {m.group(1) for linea in plan if (m := _SEQ_SCAN_SQLITE.match(linea.strip()))}
+        return tablas - _NO_TABLAS_SQLITE
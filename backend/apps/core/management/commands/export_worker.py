@@ -0,0 +1,70 @@
+"""
+Worker de las exportaciones asíncronas (core/trabajos.py). Toma los trabajos
+pendientes de la base de datos, escribe los archivos en EXPORTS_ROOT,
+reencola los de workers caídos y borra los vencidos.
+
+    python manage.py export_worker
+    python manage.py export_worker --una-vez      # procesa lo pendiente y sale
+
+Se pueden correr varios en paralelo: el reclamo de cada trabajo es atómico.
+SIGTERM/SIGINT terminan el trabajo en curso antes de salir.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from backend.apps.core import trabajos
+
+
+class Command(BaseCommand):
+    help = 'Procesa las exportaciones encoladas con ?async=1'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar los trabajos pendientes y terminar')
+        parser.add_argument('--intervalo', type=float, default=2,
+                            help='Segundos de espera cuando no hay trabajos')
+        parser.add_argument('--limpieza-cada', type=float, default=300,
+                            help='Segundos entre limpiezas de archivos vencidos')
+
+    def handle(self, *args, **options):
+        self._detener = False
+        signal.signal(signal.SIGTERM, self._senal)
+        signal.signal(signal.SIGINT, self._senal)
+
+        ultima_limpieza = 0
+        while not self._detener:
+            # Un worker de larga vida no pasa por request_finished
+            close_old_connections()
+
+            recuperados = trabajos.recuperar_colgados()
+            if recuperados:
+                self.stdout.write(self.style.WARNING(f'{recuperados} trabajos colgados recuperados'))
+            if time.monotonic() - ultima_limpieza >= options['limpieza_cada']:
+                borrados = trabajos.limpiar_vencidos()
+                if borrados:
+                    self.stdout.write(f'{borrados} exportaciones vencidas borradas')
+                ultima_limpieza = time.monotonic()
+
+            trabajo = trabajos.reclamar()
+            if trabajo is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.perf_counter()
+            trabajos.procesar(trabajo)
+            segundos = time.perf_counter() - inicio
+            if trabajo.estado == trabajo.Estado.COMPLETADO:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{trabajo.pk} {trabajo.recurso}.{trabajo.formato}: {trabajo.filas} filas en {segundos:.1f}s'
+                ))
+            else:
+                self.stderr.write(f'{trabajo.pk} {trabajo.recurso}.{trabajo.formato}: {trabajo.error}')
+
+    def _senal(self, signum, frame):
+        self.stdout.write('Deteniendo al terminar el trabajo en curso...')
+        self._detener = True
@@ -0,0 +1,60 @@
+"""
+Genera un conjunto de datos sintético a escala de la operación real (ver
+core/datos_prueba.py): `--scale 10` son diez veces los donantes, casos,
+hogares, proveedores, donaciones y gastos de producción. Con la misma
+`--semilla`, el mismo `--hasta` y la misma base de partida los datos son
+idénticos, sin importar el día en que se generen.
+
+Los datos quedan en la base (no se revierten); úsese sobre una base de
+benchmarks, nunca sobre producción.
+
+    python manage.py generate_dataset --scale 10
+    python manage.py generate_dataset --scale 100 --semilla 7 --anios 5 --hasta 2026-06-30
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from backend.apps.core import datos_prueba
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos consistentes a N veces el tamaño de producción'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, required=True,
+                            help='Múltiplo del tamaño de producción (0.1, 1, 10, 100...)')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--anios', type=int, default=3, help='Años de historia hacia atrás desde --hasta')
+        parser.add_argument('--hasta', type=date.fromisoformat, default=datos_prueba.HASTA,
+                            help=f'Último día de la historia, AAAA-MM-DD (por defecto {datos_prueba.HASTA})')
+        parser.add_argument('--tamano-bloque', type=int, default=50000, help='Filas por bloque de carga')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0:
+            raise CommandError('--scale debe ser mayor que 0')
+        try:
+            import numpy  # noqa: F401
+            import pandas  # noqa: F401
+        except ImportError:
+            raise CommandError('generate_dataset requiere numpy y pandas')
+
+        using = options['database']
+        cantidades = datos_prueba.escalar(options['scale'])
+        self.stdout.write('A generar: ' + ', '.join(f'{tabla}={n}' for tabla, n in cantidades.items()))
+        inicio = time.perf_counter()
+        datos_prueba.generar(
+            cantidades['donaciones'], semilla=options['semilla'], using=using, anios=options['anios'],
+            batch_size=options['tamano_bloque'], cantidades=cantidades, hasta=options['hasta'],
+        )
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(cantidades.values())} filas en {duracion:.1f}s "
+            f"({cantidades['donaciones'] / duracion:,.0f} donaciones/s)"
+        ))
+        if connections[using].vendor == 'postgresql':
+            with connections[using].cursor() as cursor:
+                cursor.execute('ANALYZE')
@@ -0,0 +1,142 @@
+"""
+Importa un CSV de donantes, proveedores, casos, donaciones o gastos (ver
+core/importacion.py).
+
+Los encabezados son los nombres de los campos del modelo; las FK por PK
+(`id_donante`) o por un campo del relacionado (`id_donante__identificacion`).
+Las columnas desconocidas se ignoran con un aviso.
+
+* Rechazos: las filas inválidas se escriben en `<archivo>.rechazos.csv` (o
+  --rechazos) con su número de fila y el motivo; el resto del bloque se carga.
+* Checkpoint: después de confirmar cada bloque se guardan las filas
+  procesadas en `<archivo>.checkpoint.json`. Si la importación se interrumpe,
+  `--reanudar` continúa desde ahí; un bloque confirmado pero no registrado
+  se vuelve a aplicar, lo que con clave natural solo actualiza.
+* Upsert: las filas cuya clave natural ya existe (comprobante, identificación,
+  NIT, nombre + fecha de ingreso del caso) actualizan el registro; `--sin-upsert`
+  inserta siempre.
+
+    python manage.py importar_csv donaciones donaciones.csv
+    python manage.py importar_csv donaciones donaciones.csv --reanudar
+    python manage.py importar_csv donantes donantes.csv --tamano-bloque 20000 --formato-fecha %d/%m/%Y
+"""
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from backend.apps.core import importacion
+
+
+class Command(BaseCommand):
+    help = 'Importa un CSV por bloques (COPY en PostgreSQL) con rechazos, upsert y checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entidad', choices=sorted(importacion.ENTIDADES))
+        parser.add_argument('archivo')
+        parser.add_argument('--tamano-bloque', type=int, default=getattr(settings, 'IMPORT_CHUNK_SIZE', 50000))
+        parser.add_argument('--rechazos', help='Archivo de rechazos (por defecto <archivo>.rechazos.csv)')
+        parser.add_argument('--checkpoint', help='Archivo de checkpoint (por defecto <archivo>.checkpoint.json)')
+        parser.add_argument('--reanudar', action='store_true', help='Continuar desde el checkpoint')
+        parser.add_argument('--sin-upsert', action='store_true', help='Insertar siempre, sin buscar la clave natural')
+        parser.add_argument('--formato-fecha', help='Formato strftime de las fechas (por defecto ISO 8601)')
+        parser.add_argument('--separador', default=',')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise CommandError('importar_csv requiere pandas (pip install pandas)')
+
+        archivo = os.path.abspath(options['archivo'])
+        if not os.path.exists(archivo):
+            raise CommandError(f'No existe {archivo}')
+        entidad = importacion.ENTIDADES[options['entidad']]
+        model = entidad.model
+        using = options['database']
+        ruta_checkpoint = options['checkpoint'] or f'{archivo}.checkpoint.json'
+        ruta_rechazos = options['rechazos'] or f'{archivo}.rechazos.csv'
+
+        estado = {'entidad': entidad.nombre, 'tamano_archivo': os.path.getsize(archivo),
+                  'filas': 0, 'insertados': 0, 'actualizados': 0, 'rechazados': 0}
+        if os.path.exists(ruta_checkpoint):
+            if not options['reanudar']:
+                raise CommandError(f'Hay un checkpoint en {ruta_checkpoint}: use --reanudar o bórrelo')
+            with open(ruta_checkpoint) as f:
+                previo = json.load(f)
+            if (previo['entidad'], previo['tamano_archivo']) != (estado['entidad'], estado['tamano_archivo']):
+                raise CommandError('El checkpoint es de otro archivo o entidad')
+            estado = previo
+            self.stdout.write(f"Reanudando desde la fila {estado['filas']}")
+        elif not options['reanudar'] and os.path.exists(ruta_rechazos):
+            os.remove(ruta_rechazos)
+
+        lector_opciones = dict(sep=options['separador'], encoding=options['encoding'], dtype=str,
+                               keep_default_na=False, skipinitialspace=True)
+        encabezados = list(pd.read_csv(archivo, nrows=0, **lector_opciones).columns)
+        cols, ignorados = importacion.columnas(model, encabezados)
+        if not cols:
+            raise CommandError(f'Ninguna columna del archivo corresponde a {model.__name__}')
+        if ignorados:
+            self.stdout.write(self.style.WARNING(f"Columnas ignoradas: {', '.join(ignorados)}"))
+        presentes = {columna.campo.name for columna in cols}
+        clave = () if options['sin_upsert'] else entidad.clave
+        if clave and not set(clave) <= presentes:
+            self.stdout.write(self.style.WARNING(f"Sin upsert: el archivo no trae {', '.join(clave)}"))
+            clave = ()
+
+        referencias = importacion.Referencias(using)
+        metodo = 'COPY' if connections[using].vendor == 'postgresql' else 'bulk_create'
+        self.stdout.write(f'{entidad.nombre}: {len(cols)} columnas, carga por {metodo}')
+        bloques = pd.read_csv(
+            archivo, chunksize=options['tamano_bloque'],
+            skiprows=range(1, estado['filas'] + 1) if estado['filas'] else None, **lector_opciones,
+        )
+        inicio = time.perf_counter()
+        procesadas = 0
+        for bloque in bloques:
+            # Número de fila del archivo, sin contar el encabezado
+            bloque.index = range(estado['filas'] + 1, estado['filas'] + 1 + len(bloque))
+            validos, rechazados = importacion.preparar(
+                entidad, bloque, cols, referencias, clave, options['formato_fecha'],
+            )
+            insertados, actualizados = importacion.cargar(model, validos, cols, clave, using)
+            self._escribir_rechazos(ruta_rechazos, rechazados)
+
+            estado['filas'] += len(bloque)
+            estado['insertados'] += insertados
+            estado['actualizados'] += actualizados
+            estado['rechazados'] += len(rechazados)
+            self._guardar_checkpoint(ruta_checkpoint, estado)
+            procesadas += len(bloque)
+            self.stdout.write(
+                f"  fila {estado['filas']}: +{insertados} insertados, {actualizados} actualizados, "
+                f"{len(rechazados)} rechazados ({procesadas / (time.perf_counter() - inicio):,.0f} filas/s)"
+            )
+
+        if os.path.exists(ruta_checkpoint):
+            os.remove(ruta_checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"{estado['insertados']} insertados, {estado['actualizados']} actualizados, "
+            f"{estado['rechazados']} rechazados en {time.perf_counter() - inicio:.1f}s"
+        ))
+        if estado['rechazados']:
+            self.stdout.write(f'Rechazos en {ruta_rechazos}')
+
+    def _escribir_rechazos(self, ruta, rechazados):
+        if rechazados.empty:
+            return
+        nuevo = not os.path.exists(ruta)
+        rechazados.to_csv(ruta, mode='a', header=nuevo, index_label='fila', quoting=csv.QUOTE_MINIMAL)
+
+    def _guardar_checkpoint(self, ruta, estado):
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(estado, f)
+        os.replace(temporal, ruta)
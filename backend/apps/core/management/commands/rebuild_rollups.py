@@ -0,0 +1,43 @@
+"""
+Reconstruye los rollups mensuales desde las tablas de hechos o verifica que
+coincidan con ellas.
+
+    python manage.py rebuild_rollups
+    python manage.py rebuild_rollups --verificar
+    python manage.py rebuild_rollups --fuente donaciones
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.apps.core import rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye (o verifica) la tabla resumen_mensual de donaciones y gastos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fuente', choices=sorted(rollups.FUENTES), help='Solo esta fuente')
+        parser.add_argument('--verificar', action='store_true', help='Solo comparar, sin escribir')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        fuentes = [rollups.FUENTES[options['fuente']]] if options['fuente'] else list(rollups.FUENTES.values())
+        using = options['database']
+
+        if options['verificar']:
+            total_diferencias = 0
+            for fuente in fuentes:
+                diferencias = rollups.verificar(fuente, using)
+                total_diferencias += len(diferencias)
+                for clave, esperado, actual in diferencias[:20]:
+                    mes, estado, medio_pago = clave
+                    self.stdout.write(f"  {fuente.nombre} {mes:%Y-%m} {estado or '-'} {medio_pago or '-'}: "
+                                      f"esperado={esperado} actual={actual}")
+                self.stdout.write(f"{fuente.nombre}: {len(diferencias)} buckets inconsistentes")
+            if total_diferencias:
+                raise CommandError(f'{total_diferencias} buckets inconsistentes; ejecute rebuild_rollups')
+            self.stdout.write(self.style.SUCCESS('Rollups consistentes'))
+            return
+
+        for fuente in fuentes:
+            buckets = rollups.reconstruir(fuente, using)
+            self.stdout.write(self.style.SUCCESS(f"{fuente.nombre}: {buckets} buckets reconstruidos"))
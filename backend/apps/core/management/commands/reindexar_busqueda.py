@@ -0,0 +1,29 @@
+"""
+Reconstruye los documentos de búsqueda (`documentos_busqueda`) desde las
+tablas. Normalmente no hace falta: se mantienen en cada escritura.
+
+    python manage.py reindexar_busqueda
+    python manage.py reindexar_busqueda --fuente donaciones
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.apps.core import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla documentos_busqueda usada por ?search='
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fuente', choices=sorted(busqueda.FUENTES), help='Solo esta fuente')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        fuentes = [busqueda.FUENTES[options['fuente']]] if options['fuente'] else list(busqueda.FUENTES.values())
+        for fuente in fuentes:
+            inicio = time.perf_counter()
+            escritos = busqueda.reconstruir(fuente, options['database'], options['batch_size'])
+            self.stdout.write(f'{fuente.nombre}: {escritos} documentos en {time.perf_counter() - inicio:.1f}s')
+        self.stdout.write(self.style.SUCCESS('Documentos de búsqueda reconstruidos'))
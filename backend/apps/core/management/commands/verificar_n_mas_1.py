@@ -0,0 +1,139 @@
+"""
+Falla si algún listado hace consultas por fila (N+1).
+
+* Serializers: `verificar_consultas` (core/carga.py) con 1 y 20 filas; también
+  reporta campos que leen una FK no declarada en `Meta.relaciones`.
+* Listados: cada endpoint con `page_size=1` y `page_size=50` debe hacer las
+  mismas consultas.
+* Acciones anidadas (`donantes/<pk>/donaciones/`, `casos/<pk>/balance/`...):
+  el registro con menos filas relacionadas y el que tiene más, igual.
+
+Con --generar N se insertan N donaciones sintéticas (core/datos_prueba.py) en
+una transacción que se revierte al final.
+
+    python manage.py verificar_n_mas_1 --generar 2000
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.casos.models import Caso
+from backend.apps.casos.serializers import CasoSerializer
+from backend.apps.casos.views import CasoViewSet
+from backend.apps.core import datos_prueba
+from backend.apps.core.carga import cargar, verificar_consultas
+from backend.apps.donaciones.models import Donacion, Donante
+from backend.apps.donaciones.serializers import DonacionSerializer
+from backend.apps.donaciones.views import DonacionViewSet, DonanteViewSet
+from backend.apps.finanzas.models import Gasto, Proveedor
+from backend.apps.finanzas.serializers import GastoSerializer
+from backend.apps.finanzas.views import GastoViewSet, ProveedorViewSet
+
+SERIALIZERS = [
+    (DonacionSerializer, Donacion),
+    (GastoSerializer, Gasto),
+    (CasoSerializer, Caso),
+]
+
+LISTADOS = {
+    'donaciones': ('/api/donaciones/', DonacionViewSet.as_view({'get': 'list'})),
+    'gastos': ('/api/gastos/', GastoViewSet.as_view({'get': 'list'})),
+    'casos': ('/api/casos/', CasoViewSet.as_view({'get': 'list'})),
+}
+
+# nombre: (url, vista, modelo padre, relación que se lista)
+ANIDADOS = {
+    'donantes.donaciones': ('/api/donantes/{pk}/donaciones/', DonanteViewSet.as_view({'get': 'donaciones'}),
+                            Donante, 'donaciones'),
+    'proveedores.gastos': ('/api/proveedores/{pk}/gastos/', ProveedorViewSet.as_view({'get': 'gastos'}),
+                           Proveedor, 'gastos'),
+    'casos.balance': ('/api/casos/{pk}/balance/', CasoViewSet.as_view({'get': 'balance'}), Caso, 'donaciones'),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Falla si los listados de donaciones, gastos y casos hacen consultas por fila'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generar', type=int, default=0, metavar='N',
+                            help='Generar N donaciones sintéticas (se revierten al terminar)')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        self.connection = connections[using]
+        self.factory = APIRequestFactory()
+        self.usuario = get_user_model()(username='verificar_n_mas_1')
+        self.fallas = []
+        try:
+            with transaction.atomic(using=using):
+                if options['generar']:
+                    datos_prueba.generar(options['generar'], using=using)
+                self._serializers(using)
+                self._listados()
+                self._anidados(using)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if self.fallas:
+            for falla in self.fallas:
+                self.stdout.write(self.style.ERROR(falla))
+            raise CommandError(f'{len(self.fallas)} verificaciones con N+1')
+        self.stdout.write(self.style.SUCCESS('Sin N+1'))
+
+    def _reportar(self, nombre, conteos, detalle=''):
+        self.stdout.write(f'  {nombre:<22} {conteos[0]:>3} / {conteos[1]:>3} consultas {detalle}')
+
+    def _serializers(self, using):
+        self.stdout.write(self.style.MIGRATE_HEADING('Serializers (1 / 20 filas)'))
+        for serializer_class, model in SERIALIZERS:
+            queryset = cargar(model.objects.using(using).all(), serializer_class)
+            try:
+                conteos = verificar_consultas(serializer_class, queryset, filas=20)
+            except AssertionError as exc:
+                self.fallas.append(str(exc))
+                continue
+            self._reportar(serializer_class.__name__, conteos)
+
+    def _contar(self, vista, url, params=None, **kwargs):
+        request = self.factory.get(url, params or {})
+        force_authenticate(request, user=self.usuario)
+        with CaptureQueriesContext(self.connection) as capturadas:
+            respuesta = vista(request, **kwargs)
+            respuesta.render()
+        if respuesta.status_code != 200:
+            raise CommandError(f'{url}: {respuesta.status_code}')
+        return len(capturadas)
+
+    def _listados(self):
+        self.stdout.write(self.style.MIGRATE_HEADING('Listados (page_size 1 / 50)'))
+        for nombre, (url, vista) in LISTADOS.items():
+            conteos = [self._contar(vista, url, {'page_size': tamano}) for tamano in (1, 50)]
+            self._reportar(nombre, conteos)
+            if conteos[1] > conteos[0]:
+                self.fallas.append(f'{nombre}: {conteos[0]} consultas con 1 fila y {conteos[1]} con 50')
+
+    def _anidados(self, using):
+        self.stdout.write(self.style.MIGRATE_HEADING('Acciones anidadas (menos / más filas)'))
+        for nombre, (url, vista, model, relacion) in ANIDADOS.items():
+            padres = list(
+                model.objects.using(using).annotate(filas=Count(relacion)).filter(filas__gt=0)
+                .order_by('filas').values_list('pk', 'filas')
+            )
+            if len(padres) < 2 or padres[0][1] == padres[-1][1]:
+                self.stdout.write(f'  {nombre:<22} sin datos suficientes (use --generar)')
+                continue
+            conteos = [self._contar(vista, url.format(pk=pk), pk=pk) for pk, _ in (padres[0], padres[-1])]
+            self._reportar(nombre, conteos, f'({padres[0][1]} / {padres[-1][1]} filas)')
+            if conteos[1] > conteos[0]:
+                self.fallas.append(
+                    f'{nombre}: {conteos[0]} consultas con {padres[0][1]} filas y {conteos[1]} con {padres[-1][1]}'
+                )
@@ -0,0 +1,64 @@
+"""
+Precalienta el cache de respuestas del Dashboard y de los KPIs para los
+rangos más consultados (mes actual, año actual e histórico). Pensado para
+ejecutarse después de cada despliegue.
+
+    python manage.py warm_dashboard_cache
+    python manage.py warm_dashboard_cache --rango mes --rango anio
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from backend.apps.casos.views import CasoViewSet
+from backend.apps.core.views import DashboardView
+from backend.apps.donaciones.views import DonacionViewSet, DonanteViewSet
+from backend.apps.finanzas.views import GastoViewSet, ProveedorViewSet
+
+ENDPOINTS = {
+    'dashboard': ('/api/dashboard/', DashboardView.as_view()),
+    'donaciones.kpis': ('/api/donaciones/kpis/', DonacionViewSet.as_view({'get': 'kpis'})),
+    'gastos.kpis': ('/api/gastos/kpis/', GastoViewSet.as_view({'get': 'kpis'})),
+    'casos.kpis': ('/api/casos/kpis/', CasoViewSet.as_view({'get': 'kpis'})),
+    'donantes.kpis': ('/api/donantes/kpis/', DonanteViewSet.as_view({'get': 'kpis'})),
+    'proveedores.kpis': ('/api/proveedores/kpis/', ProveedorViewSet.as_view({'get': 'kpis'})),
+}
+
+
+def rangos():
+    hoy = timezone.localdate()
+    return {
+        'mes': {'start_date': hoy.replace(day=1).isoformat(), 'end_date': hoy.isoformat()},
+        'anio': {'start_date': hoy.replace(month=1, day=1).isoformat(), 'end_date': hoy.isoformat()},
+        'historico': {},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Precalienta el cache del Dashboard y de los endpoints kpis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rango', action='append', choices=['mes', 'anio', 'historico'],
+                            help='Rangos a calentar (por defecto todos)')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        # Usuario en memoria: solo satisface IsAuthenticated, no se guarda
+        usuario = get_user_model()(username='warm_dashboard_cache')
+        seleccion = options['rango'] or ['mes', 'anio', 'historico']
+
+        for nombre_rango, params in rangos().items():
+            if nombre_rango not in seleccion:
+                continue
+            for endpoint, (url, vista) in ENDPOINTS.items():
+                request = factory.get(url, params)
+                force_authenticate(request, user=usuario)
+                inicio = timezone.now()
+                respuesta = vista(request)
+                ms = (timezone.now() - inicio).total_seconds() * 1000
+                self.stdout.write(
+                    f"{nombre_rango:<10} {endpoint:<16} {respuesta.status_code} "
+                    f"{respuesta.get('X-Cache', '-'):<6} {ms:8.1f} ms"
+                )
+        self.stdout.write(self.style.SUCCESS('Cache precalentado'))
@@ -0,0 +1,322 @@
+"""
+Métricas del backend en formato de texto de Prometheus, sumadas entre los
+workers de gunicorn.
+
+* `crm_http_requests_total` y `crm_http_request_duration_seconds` (histograma
+  de buckets fijos) por vista (`donacion-kpis`, `caso-exportar-excel`...),
+  método y status; `crm_db_queries_total` por vista. Las registra
+  `MetricasMiddleware`; en las respuestas en streaming la duración llega
+  hasta que empieza el envío.
+* `crm_db_replica_reads_total` por destino (replica, primaria_escritura,
+  primaria_no_disponible) de las lecturas de analítica (core/replicas.py).
+* `crm_cache_total` por endpoint y resultado (hit, miss, espera) de
+  `cachear_respuesta`, y `crm_auth_total` por resultado de
+  SupabaseAuthentication (ok, cache, rechazado...).
+
+Cada proceso suma en su propio archivo `<METRICS_MULTIPROC_DIR>/<pid>.db`,
+mapeado en memoria: escribir es actualizar un double en su posición, sin
+bloquear a otros procesos. `exponer()` lee los archivos de todos los procesos
+(también los de workers ya terminados: los contadores no retroceden) y suma.
+El directorio se vacía al arrancar gunicorn (gunicorn.conf.py). Sin
+directorio los valores quedan en memoria del proceso (runserver, comandos).
+
+    from backend.apps.core import metricas
+    metricas.CACHE.inc(endpoint='dashboard', resultado='hit')
+    print(metricas.exponer())
+"""
+import contextlib
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_TAMANO_INICIAL = 1 << 16
+
+
+def _habilitado():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+# --- Almacenamiento -------------------------------------------------------
+
+def _entradas(datos):
+    """(clave, valor, posición del valor) de un archivo de valores.
+
+    Formato: un int32 con los bytes usados y, desde el byte 8, entradas
+    alineadas a 8 bytes: int32 largo de la clave, la clave en UTF-8, relleno
+    y un double.
+    """
+    usado = struct.unpack_from('i', datos, 0)[0]
+    posicion = 8
+    while posicion < usado:
+        largo = struct.unpack_from('i', datos, posicion)[0]
+        clave = bytes(datos[posicion + 4:posicion + 4 + largo]).decode('utf-8')
+        posicion += 4 + largo + (-(4 + largo)) % 8
+        yield clave, struct.unpack_from('d', datos, posicion)[0], posicion
+        posicion += 8
+
+
+class _ArchivoValores:
+    """{clave: float} de este proceso en un archivo mapeado en memoria."""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, 'a+b')
+        tamano = os.fstat(self._archivo.fileno()).st_size
+        if tamano == 0:
+            tamano = _TAMANO_INICIAL
+            self._archivo.truncate(tamano)
+        self._mapa = mmap.mmap(self._archivo.fileno(), tamano)
+        if struct.unpack_from('i', self._mapa, 0)[0] == 0:
+            struct.pack_into('i', self._mapa, 0, 8)
+        self._usado = struct.unpack_from('i', self._mapa, 0)[0]
+        self._posiciones = {clave: posicion for clave, _, posicion in _entradas(self._mapa)}
+
+    def _agregar(self, clave):
+        codificada = clave.encode('utf-8')
+        relleno = (-(4 + len(codificada))) % 8
+        tamano = 4 + len(codificada) + relleno + 8
+        while self._usado + tamano > len(self._mapa):
+            nuevo = len(self._mapa) * 2
+            self._archivo.truncate(nuevo)
+            self._mapa.close()
+            self._mapa = mmap.mmap(self._archivo.fileno(), nuevo)
+        inicio = self._usado
+        struct.pack_into('i', self._mapa, inicio, len(codificada))
+        self._mapa[inicio + 4:inicio + 4 + len(codificada)] = codificada
+        posicion = inicio + 4 + len(codificada) + relleno
+        struct.pack_into('d', self._mapa, posicion, 0.0)
+        # Los bytes usados se actualizan al final: quien lea nunca ve una entrada a medias
+        self._usado += tamano
+        struct.pack_into('i', self._mapa, 0, self._usado)
+        self._posiciones[clave] = posicion
+        return posicion
+
+    def sumar(self, clave, valor):
+        posicion = self._posiciones.get(clave)
+        if posicion is None:
+            posicion = self._agregar(clave)
+        actual = struct.unpack_from('d', self._mapa, posicion)[0]
+        struct.pack_into('d', self._mapa, posicion, actual + valor)
+
+
+class _Almacen:
+    """Valores del proceso: en un `_ArchivoValores` si hay directorio, si no en un dict."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._valores = {}
+        self._archivo = None
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            self._archivo = _ArchivoValores(os.path.join(directorio, f'{self.pid}.db'))
+
+    def sumar(self, clave, valor):
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.sumar(clave, valor)
+            else:
+                self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def recolectar(self):
+        """{clave: valor} sumado entre los archivos de todos los procesos."""
+        if self._archivo is None:
+            with self._lock:
+                return dict(self._valores)
+        total = {}
+        for ruta in glob.glob(os.path.join(self.directorio, '*.db')):
+            try:
+                with open(ruta, 'rb') as archivo:
+                    datos = archivo.read()
+            except FileNotFoundError:
+                continue
+            if len(datos) < 8:
+                continue
+            for clave, valor, _ in _entradas(datos):
+                total[clave] = total.get(clave, 0.0) + valor
+        return total
+
+
+_almacen = None
+_almacen_lock = threading.Lock()
+
+
+def almacen():
+    # Por proceso: después del fork de gunicorn (o con --preload) cada worker abre su archivo
+    global _almacen
+    if _almacen is None or _almacen.pid != os.getpid():
+        with _almacen_lock:
+            if _almacen is None or _almacen.pid != os.getpid():
+                _almacen = _Almacen(getattr(settings, 'METRICS_MULTIPROC_DIR', ''))
+    return _almacen
+
+
+# --- Métricas -------------------------------------------------------------
+
+_REGISTRO = {}
+
+
+def _clave(muestra, etiquetas):
+    return json.dumps([muestra, sorted(etiquetas.items())], ensure_ascii=False)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        _REGISTRO[nombre] = self
+
+    def _validar(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f'{self.nombre} espera las etiquetas {self.etiquetas}, no {tuple(etiquetas)}')
+        return {nombre: str(valor) for nombre, valor in etiquetas.items()}
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **etiquetas):
+        if not _habilitado():
+            return
+        almacen().sumar(_clave(self.nombre, self._validar(etiquetas)), valor)
+
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+
+    def observar(self, valor, **etiquetas):
+        if not _habilitado():
+            return
+        etiquetas = self._validar(etiquetas)
+        # Se guarda el conteo de cada bucket; exponer() los acumula
+        bucket = next(limite for limite in self.buckets if valor <= limite)
+        destino = almacen()
+        destino.sumar(_clave(f'{self.nombre}_bucket', {**etiquetas, 'le': _formato_le(bucket)}), 1)
+        destino.sumar(_clave(f'{self.nombre}_sum', etiquetas), valor)
+        destino.sumar(_clave(f'{self.nombre}_count', etiquetas), 1)
+
+
+HTTP_REQUESTS = Contador(
+    'crm_http_requests_total', 'Requests HTTP por vista, método y status', ('vista', 'metodo', 'status'),
+)
+HTTP_DURACION = Histograma(
+    'crm_http_request_duration_seconds', 'Duración de los requests HTTP por vista y método', ('vista', 'metodo'),
+)
+DB_CONSULTAS = Contador('crm_db_queries_total', 'Consultas SQL por vista', ('vista',))
+DB_LECTURAS = Contador('crm_db_replica_reads_total', 'Requests de analítica por base de lectura elegida',
+                       ('destino',))
+CACHE = Contador('crm_cache_total', 'Lecturas de la cache de respuestas por endpoint y resultado',
+                 ('endpoint', 'resultado'))
+AUTH = Contador('crm_auth_total', 'Resultados de la autenticación de Supabase', ('resultado',))
+
+
+# --- Exposición -----------------------------------------------------------
+
+def _formato_le(limite):
+    return '+Inf' if limite == float('inf') else repr(float(limite))
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _linea(muestra, etiquetas, valor):
+    if etiquetas:
+        texto = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas)
+        return f'{muestra}{{{texto}}} {valor!r}'
+    return f'{muestra} {valor!r}'
+
+
+def exponer():
+    """Todas las métricas registradas, sumadas entre procesos, en formato de texto de Prometheus."""
+    muestras = {}
+    for clave, valor in almacen().recolectar().items():
+        muestra, etiquetas = json.loads(clave)
+        muestras.setdefault(muestra, []).append((tuple(map(tuple, etiquetas)), valor))
+
+    lineas = []
+    for nombre, metrica in sorted(_REGISTRO.items()):
+        lineas.append(f'# HELP {nombre} {metrica.ayuda}')
+        lineas.append(f'# TYPE {nombre} {metrica.tipo}')
+        if metrica.tipo == 'counter':
+            for etiquetas, valor in sorted(muestras.get(nombre, [])):
+                lineas.append(_linea(nombre, etiquetas, valor))
+            continue
+
+        # Histograma: buckets acumulados por serie, con todos los límites presentes
+        series = {}
+        for etiquetas, valor in muestras.get(f'{nombre}_bucket', []):
+            propias = tuple(par for par in etiquetas if par[0] != 'le')
+            le = dict(etiquetas)['le']
+            series.setdefault(propias, {})[le] = valor
+        sumas = dict(muestras.get(f'{nombre}_sum', []))
+        conteos = dict(muestras.get(f'{nombre}_count', []))
+        for etiquetas in sorted(series):
+            acumulado = 0.0
+            for limite in metrica.buckets:
+                le = _formato_le(limite)
+                acumulado += series[etiquetas].get(le, 0.0)
+                lineas.append(_linea(f'{nombre}_bucket', etiquetas + (('le', le),), acumulado))
+            lineas.append(_linea(f'{nombre}_sum', etiquetas, sumas.get(etiquetas, 0.0)))
+            lineas.append(_linea(f'{nombre}_count', etiquetas, conteos.get(etiquetas, 0.0)))
+    return '\n'.join(lineas) + '\n'
+
+
+# --- Middleware -----------------------------------------------------------
+
+class _ContadorConsultas:
+    __slots__ = ('cantidad',)
+
+    def __init__(self):
+        self.cantidad = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.cantidad += 1
+        return execute(sql, params, many, context)
+
+
+class MetricasMiddleware:
+    """Cuenta requests, duración y consultas por vista (resolver de URLs)."""
+
+    def __init__(self, get_response):
+        if not _habilitado():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = _ContadorConsultas()
+        inicio = time.perf_counter()
+        with contextlib.ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(consultas))
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        vista = (match.view_name or match.route) if match is not None else 'sin_ruta'
+        HTTP_REQUESTS.inc(vista=vista, metodo=request.method, status=response.status_code)
+        HTTP_DURACION.observar(duracion, vista=vista, metodo=request.method)
+        if consultas.cantidad:
+            DB_CONSULTAS.inc(consultas.cantidad, vista=vista)
+        return response
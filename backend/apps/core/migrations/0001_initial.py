@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(max_length=20)),
+                ('mes', models.DateField()),
+                ('estado', models.CharField(blank=True, default='', max_length=50)),
+                ('medio_pago', models.CharField(blank=True, default='', max_length=100)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('monto_min', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('monto_max', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen mensual',
+                'verbose_name_plural': 'Resúmenes mensuales',
+                'db_table': 'resumen_mensual',
+                'constraints': [models.UniqueConstraint(fields=('fuente', 'mes', 'estado', 'medio_pago'), name='resumen_mensual_bucket_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# Alias históricos de estado por fuente (copia de core.estados.ALIAS al
+# momento de la migración)
+ALIAS = {
+    'donaciones': {
+        'COMPLETADA': 'APROBADA',
+        'COMPLETADO': 'APROBADA',
+        'CONFIRMADA': 'APROBADA',
+        'CONFIRMADO': 'APROBADA',
+        'EXITOSA': 'APROBADA',
+        'EXITOSO': 'APROBADA',
+        'APROBADO': 'APROBADA',
+        'RECHAZADO': 'RECHAZADA',
+        'CANCELADA': 'RECHAZADA',
+        'CANCELADO': 'RECHAZADA',
+        'FALLIDO': 'FALLIDA',
+        'ERROR': 'FALLIDA',
+    },
+    'gastos': {
+        'PAGADA': 'PAGADO',
+        'APROBADA': 'PAGADO',
+        'APROBADO': 'PAGADO',
+        'ANULADA': 'ANULADO',
+        'CANCELADA': 'ANULADO',
+        'CANCELADO': 'ANULADO',
+    },
+}
+
+
+def normalizar(fuente, valor):
+    limpio = ' '.join(str(valor).split())
+    if not limpio:
+        return None
+    limpio = limpio.upper().replace(' ', '_')
+    return ALIAS[fuente].get(limpio, limpio)
+
+
+def fusionar_buckets(apps, schema_editor):
+    """
+    Los buckets de resumen_mensual con estados no canónicos se fusionan en el
+    bucket canónico (suma, cantidad, mínimo y máximo se combinan sin releer
+    las tablas de hechos).
+    """
+    ResumenMensual = apps.get_model('core', 'ResumenMensual')
+    for fuente in ALIAS:
+        for fila in ResumenMensual.objects.filter(fuente=fuente).exclude(estado='').order_by('pk'):
+            nuevo = normalizar(fuente, fila.estado) or ''
+            if nuevo == fila.estado:
+                continue
+            destino = ResumenMensual.objects.filter(
+                fuente=fuente, mes=fila.mes, estado=nuevo, medio_pago=fila.medio_pago
+            ).first()
+            if destino is None:
+                fila.estado = nuevo
+                fila.save(update_fields=['estado'])
+                continue
+            destino.total += fila.total
+            destino.cantidad += fila.cantidad
+            minimos = [v for v in (destino.monto_min, fila.monto_min) if v is not None]
+            maximos = [v for v in (destino.monto_max, fila.monto_max) if v is not None]
+            destino.monto_min = min(minimos) if minimos else None
+            destino.monto_max = max(maximos) if maximos else None
+            destino.save(update_fields=['total', 'cantidad', 'monto_min', 'monto_max'])
+            fila.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_buckets, migrations.RunPython.noop),
+    ]
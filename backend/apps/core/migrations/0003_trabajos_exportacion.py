@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_resumen_estado_canonico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id_trabajo', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('recurso', models.CharField(help_text="nombre_exportacion del ViewSet ('donaciones')", max_length=50)),
+                ('vista', models.CharField(help_text='Ruta del ViewSet que arma el queryset', max_length=255)),
+                ('formato', models.CharField(max_length=10)),
+                ('parametros', models.JSONField(blank=True, default=dict, help_text='Query params de la solicitud')),
+                ('huella', models.CharField(help_text='Hash de usuario + vista + formato + parámetros', max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('archivo', models.CharField(blank=True, default='', help_text='Ruta relativa a EXPORTS_ROOT', max_length=255)),
+                ('filas', models.IntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('intentos', models.IntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('expira', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de exportación',
+                'verbose_name_plural': 'Trabajos de exportación',
+                'db_table': 'trabajos_exportacion',
+                'indexes': [models.Index(fields=['estado', 'creado'], name='trabajos_estado_creado_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['PENDIENTE', 'EN_PROCESO'])), fields=('huella',), name='trabajo_exportacion_activo_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Copia congelada de core.busqueda al momento de la migración: los campos de
+# cada fuente (los `search_fields` de su ViewSet) y cómo se arma el documento
+CONFIGURACION_TS = 'simple'
+SEPARADOR = ' | '
+FUENTES = {
+    'donaciones': (
+        ('donaciones', 'Donacion'),
+        ('id_donante__donante', 'id_donante__identificacion', 'id_donante__correo',
+         'id_caso__nombre_caso', 'medio_pago', 'estado'),
+    ),
+    'donantes': (('donaciones', 'Donante'), ('donante', 'identificacion', 'correo', 'ciudad')),
+    'gastos': (
+        ('finanzas', 'Gasto'),
+        ('nombre_gasto', 'id_proveedor__nombre_proveedor', 'id_proveedor__nit', 'id_caso__nombre_caso', 'estado'),
+    ),
+    'casos': (('casos', 'Caso'), ('nombre_caso', 'diagnostico')),
+}
+
+
+def normalizar_texto(valor):
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def documento(valores):
+    return SEPARADOR.join(normalizar_texto(v) for v in valores if v not in (None, ''))
+
+
+def indices_postgres(apps, schema_editor):
+    # tsvector generado y los índices GIN (ts_rank y LIKE '%...%' con pg_trgm)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        "ALTER TABLE documentos_busqueda ADD COLUMN vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{CONFIGURACION_TS}', texto)) STORED"
+    )
+    schema_editor.execute('CREATE INDEX documentos_busqueda_vector_idx ON documentos_busqueda USING gin (vector)')
+    schema_editor.execute(
+        'CREATE INDEX documentos_busqueda_trgm_idx ON documentos_busqueda USING gin (texto gin_trgm_ops)'
+    )
+
+
+def quitar_indices_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS documentos_busqueda_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS documentos_busqueda_vector_idx')
+    schema_editor.execute('ALTER TABLE documentos_busqueda DROP COLUMN IF EXISTS vector')
+
+
+def indexar_existentes(apps, schema_editor):
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    using = schema_editor.connection.alias
+    for fuente, (modelo, campos) in FUENTES.items():
+        filas = apps.get_model(*modelo)._base_manager.using(using).order_by('pk').values_list('pk', *campos)
+        lote = []
+        for pk, *valores in filas.iterator(chunk_size=2000):
+            lote.append(DocumentoBusqueda(fuente=fuente, objeto_id=pk, texto=documento(valores)))
+            if len(lote) == 2000:
+                DocumentoBusqueda.objects.using(using).bulk_create(lote)
+                lote = []
+        DocumentoBusqueda.objects.using(using).bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_trabajos_exportacion'),
+        ('casos', '0004_indices_consultas'),
+        ('donaciones', '0003_indices_consultas'),
+        ('finanzas', '0003_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('texto', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+                'db_table': 'documentos_busqueda',
+                'constraints': [models.UniqueConstraint(fields=('fuente', 'objeto_id'), name='documento_busqueda_unico')],
+            },
+        ),
+        migrations.RunPython(indices_postgres, quitar_indices_postgres),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+    ]
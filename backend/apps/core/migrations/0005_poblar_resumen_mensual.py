@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+# (fuente, modelo, campo de fecha), congelado al momento de la migración
+FUENTES = (
+    ('donaciones', ('donaciones', 'Donacion'), 'fecha_donacion'),
+    ('gastos', ('finanzas', 'Gasto'), 'fecha_pago'),
+)
+
+
+def poblar_resumen(apps, schema_editor):
+    """
+    resumen_mensual se crea vacío (0001) y solo se mantiene desde las señales:
+    se calcula desde las tablas de hechos (los estados ya son canónicos). Es
+    idempotente; equivale a `manage.py rebuild_rollups`.
+    """
+    ResumenMensual = apps.get_model('core', 'ResumenMensual')
+    using = schema_editor.connection.alias
+    for fuente, modelo, campo_fecha in FUENTES:
+        filas = (
+            apps.get_model(*modelo)._base_manager.using(using)
+            .filter(**{f'{campo_fecha}__isnull': False})
+            .annotate(mes=TruncMonth(campo_fecha))
+            .values('mes', 'estado', 'medio_pago')
+            .annotate(total=Sum('monto'), cantidad=Count('pk'), monto_min=Min('monto'), monto_max=Max('monto'))
+            .order_by()
+        )
+        buckets = {}
+        for fila in filas:
+            mes = fila['mes'].date() if hasattr(fila['mes'], 'date') else fila['mes']
+            clave = (mes, fila['estado'] or '', fila['medio_pago'] or '')
+            bucket = buckets.setdefault(clave, {'total': 0, 'cantidad': 0, 'monto_min': None, 'monto_max': None})
+            # NULL y '' caen en el mismo bucket
+            bucket['total'] += fila['total'] or 0
+            bucket['cantidad'] += fila['cantidad']
+            minimos = [v for v in (bucket['monto_min'], fila['monto_min']) if v is not None]
+            maximos = [v for v in (bucket['monto_max'], fila['monto_max']) if v is not None]
+            bucket['monto_min'] = min(minimos) if minimos else None
+            bucket['monto_max'] = max(maximos) if maximos else None
+
+        ResumenMensual.objects.using(using).filter(fuente=fuente).delete()
+        ResumenMensual.objects.using(using).bulk_create(
+            [
+                ResumenMensual(fuente=fuente, mes=mes, estado=estado, medio_pago=medio_pago, **datos)
+                for (mes, estado, medio_pago), datos in buckets.items()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_documentos_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_poblar_resumen_mensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoexportacion',
+            name='latido',
+            field=models.DateTimeField(blank=True, help_text='Última señal de vida del worker que lo procesa', null=True),
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+import uuid
+
+from django.conf import settings
+from django.db import connections, models, router, transaction
+
+from .estados import normalizar_instancias
+from .signals import datos_modificados, suprimir_senales_por_fila
 
 class TimeStampedModel(models.Model):
     """
@@ -10,3 +16,189 @@ class TimeStampedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class TrackedQuerySet(models.QuerySet):
+    """
+    QuerySet que emite `datos_modificados` también en los caminos masivos,
+    que en Django no disparan post_save/post_delete. `bulk_update` de Django
+    ejecuta `update()` por lote, así que queda cubierto por ese método.
+    """
+
+    def _snapshots(self, qs):
+        return list(qs.values(*self.model.campos_rastreados()))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        # Importaciones masivas: estados canónicos (ver core/estados.py)
+        normalizar_instancias(self.model, objs)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        despues = [obj.snapshot() for obj in objs]
+        for obj, snap in zip(objs, despues):
+            obj._valores_originales = snap
+        datos_modificados.send(sender=self.model, antes=[], despues=despues, using=self.db)
+        return objs
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            antes = self._snapshots(self.select_for_update() if self._soporta_bloqueo() else self)
+            pks = [fila[self.model._meta.pk.attname] for fila in antes]
+            filas = super().update(**kwargs)
+            despues = self._snapshots(self.model._base_manager.using(self.db).filter(pk__in=pks))
+            datos_modificados.send(sender=self.model, antes=antes, despues=despues, using=self.db)
+        return filas
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            antes = self._snapshots(self)
+            with suprimir_senales_por_fila(self.model):
+                resultado = super().delete()
+            datos_modificados.send(sender=self.model, antes=antes, despues=[], using=self.db)
+        return resultado
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def _soporta_bloqueo(self):
+        return connections[self.db].features.has_select_for_update
+
+
+class TrackedModel(TimeStampedModel):
+    """
+    Modelo base para tablas cuyos cambios alimentan datos derivados
+    (rollups, resúmenes por caso, cache de respuestas).
+    Ver `backend.apps.core.signals`.
+    """
+    objects = TrackedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    # Valores de la última lectura/escritura; permiten saber qué cambió en un save()
+    _valores_originales = None
+
+    @classmethod
+    def campos_rastreados(cls):
+        return [field.attname for field in cls._meta.concrete_fields]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields():
+            instance._valores_originales = instance.snapshot()
+        return instance
+
+    def snapshot(self):
+        return {attname: getattr(self, attname) for attname in self.campos_rastreados()}
+
+    # save/delete en una transacción: los datos derivados se actualizan junto con la fila
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            return super().delete(*args, **kwargs)
+
+
+class ResumenMensual(models.Model):
+    """
+    Rollup por (fuente, mes, estado, medio de pago) de donaciones y gastos.
+    Se mantiene incrementalmente desde `datos_modificados`; ver `core/rollups.py`.
+    Estado y medio de pago nulos se guardan como cadena vacía.
+    """
+    fuente = models.CharField(max_length=20)
+    mes = models.DateField()
+    estado = models.CharField(max_length=50, blank=True, default='')
+    medio_pago = models.CharField(max_length=100, blank=True, default='')
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    cantidad = models.IntegerField(default=0)
+    monto_min = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    monto_max = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        db_table = 'resumen_mensual'
+        verbose_name = 'Resumen mensual'
+        verbose_name_plural = 'Resúmenes mensuales'
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'mes', 'estado', 'medio_pago'], name='resumen_mensual_bucket_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fuente} {self.mes:%Y-%m} {self.estado or '-'} {self.medio_pago or '-'}"
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación asíncrona (`exportar_csv`/`exportar_excel` con `?async=1`).
+    La procesa `manage.py export_worker` y el archivo queda en EXPORTS_ROOT
+    hasta `expira`. Ver `core/trabajos.py`.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_PROCESO = 'EN_PROCESO', 'En proceso'
+        COMPLETADO = 'COMPLETADO', 'Completado'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    ACTIVOS = (Estado.PENDIENTE, Estado.EN_PROCESO)
+
+    id_trabajo = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='exportaciones')
+    recurso = models.CharField(max_length=50, help_text="nombre_exportacion del ViewSet ('donaciones')")
+    vista = models.CharField(max_length=255, help_text="Ruta del ViewSet que arma el queryset")
+    formato = models.CharField(max_length=10)
+    parametros = models.JSONField(default=dict, blank=True, help_text="Query params de la solicitud")
+    huella = models.CharField(max_length=64, help_text="Hash de usuario + vista + formato + parámetros")
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+    archivo = models.CharField(max_length=255, blank=True, default='', help_text="Ruta relativa a EXPORTS_ROOT")
+    filas = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    intentos = models.IntegerField(default=0)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    latido = models.DateTimeField(null=True, blank=True, help_text="Última señal de vida del worker que lo procesa")
+    terminado = models.DateTimeField(null=True, blank=True)
+    expira = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trabajos_exportacion'
+        verbose_name = 'Trabajo de exportación'
+        verbose_name_plural = 'Trabajos de exportación'
+        constraints = [
+            # Deduplicación: una sola exportación activa por huella
+            models.UniqueConstraint(
+                fields=['huella'], condition=models.Q(estado__in=['PENDIENTE', 'EN_PROCESO']),
+                name='trabajo_exportacion_activo_unico',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'creado'], name='trabajos_estado_creado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recurso}.{self.formato} {self.estado} ({self.id_trabajo})"
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Texto normalizado de los `search_fields` de una fila, para `?search=`.
+    Se mantiene desde `datos_modificados`; ver `core/busqueda.py`. En
+    PostgreSQL la tabla tiene además la columna generada `vector` (tsvector)
+    e índices GIN sobre ella y sobre `texto` (pg_trgm), fuera del modelo.
+    """
+    fuente = models.CharField(max_length=20)
+    objeto_id = models.BigIntegerField()
+    texto = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'documentos_busqueda'
+        verbose_name = 'Documento de búsqueda'
+        verbose_name_plural = 'Documentos de búsqueda'
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'objeto_id'], name='documento_busqueda_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fuente}:{self.objeto_id}"
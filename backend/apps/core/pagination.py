@@ -1,7 +1,273 @@
+"""
+Paginación de los listados.
 
+Por defecto es por número de página (`?page=3`), con `count` exacto, que es
+lo que usa el frontend. Dos parámetros la cambian por solicitud:
+
+* `?paginacion=cursor` (o cualquier `?cursor=`): paginación por keyset. El
+  cursor guarda los valores del último registro en el orden del ViewSet
+  (`ordering` u `?ordering=`) más la PK como desempate, y la página siguiente
+  es un `WHERE (fecha, pk) < (...)` sobre el índice en vez de un `OFFSET`, así
+  que la página 1000 cuesta lo mismo que la primera. Sin `count` por defecto.
+* `?conteo=exacto|estimado|ninguno`: `estimado` toma las filas que prevé el
+  planificador de PostgreSQL (`pg_class.reltuples` si no hay filtros, si no
+  `EXPLAIN`) en vez de un `COUNT(*)`; por debajo de
+  PAGINACION_CONTEO_EXACTO_HASTA se cuenta igual. La paginación por número
+  de página necesita un total, así que ahí `ninguno` equivale a `estimado`.
+"""
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+CONTEOS = ('exacto', 'estimado', 'ninguno')
+
+
+def estimar_total(queryset):
+    """Filas que estima el planificador; fuera de PostgreSQL, COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    query = queryset.query
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct and query.group_by is None:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [query.get_meta().db_table])
+            estimado = cursor.fetchone()[0]
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimado = int(plan[0]['Plan']['Plan Rows'])
+
+    # reltuples = -1: la tabla nunca se analizó. Con pocas filas contar es barato
+    if estimado < getattr(settings, 'PAGINACION_CONTEO_EXACTO_HASTA', 1000):
+        return queryset.count()
+    return estimado
+
+
+class PaginadorEstimado(Paginator):
+    @cached_property
+    def count(self):
+        return estimar_total(self.object_list)
+
+
+def _nulos_mayores(queryset):
+    # PostgreSQL ordena NULL como el mayor valor (ASC NULLS LAST); SQLite y
+    # MySQL como el menor. El keyset usa el orden nativo para aprovechar los índices.
+    return connections[queryset.db].vendor in ('postgresql', 'oracle')
+
+
+def _despues(campo, valor, mayor, nulos_mayores, nulable):
+    """Q de las filas que van después de `valor` (en orden ascendente si `mayor`)."""
+    if valor is None:
+        # NULL es un extremo: solo hay filas después si está al principio
+        return Q(**{f'{campo}__isnull': False}) if mayor != nulos_mayores else Q(pk__in=[])
+    condicion = Q(**{f'{campo}__{"gt" if mayor else "lt"}': valor})
+    if nulable and mayor == nulos_mayores:
+        condicion |= Q(**{f'{campo}__isnull': True})
+    return condicion
+
+
+def _igual(campo, valor):
+    return Q(**{f'{campo}__isnull': True}) if valor is None else Q(**{campo: valor})
+
+
+def _valor(obj, campo):
+    for parte in campo.split('__'):
+        obj = getattr(obj, parte, None)
+        if obj is None:
+            return None
+    return getattr(obj, 'pk', obj)
+
+
+def _a_json(valor):
+    # No DjangoJSONEncoder: trunca los datetime a milisegundos y el cursor
+    # quedaría entre dos registros
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    raise TypeError(f'Valor no serializable en el cursor: {type(valor).__name__}')
+
+
+class PaginacionKeyset:
+    """Paginación por cursor sobre el orden del queryset + PK."""
+
+    def __init__(self, paginacion, request, queryset):
+        self.paginacion = paginacion
+        self.request = request
+        self.orden = self._orden(queryset)
+        self.nulos_mayores = _nulos_mayores(queryset)
+        self.model = queryset.model
+
+    @staticmethod
+    def _orden(queryset):
+        query = queryset.query
+        campos = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+        pk = query.get_meta().pk.name
+        orden = [
+            campo for campo in campos
+            if isinstance(campo, str) and campo != '?' and campo.lstrip('-') not in ('pk', pk)
+        ]
+        descendente = orden[-1].startswith('-') if orden else True
+        return orden + ['-pk' if descendente else 'pk']
+
+    def _nulable(self, campo):
+        if campo == 'pk':
+            return False
+        try:
+            return self.model._meta.get_field(campo).null
+        except FieldDoesNotExist:
+            # Anotaciones y lookups con __
+            return True
+
+    # --- Cursor ------------------------------------------------------------
+
+    def _codificar(self, valores, reversa):
+        crudo = json.dumps({'o': self.orden, 'v': valores, 'r': reversa}, default=_a_json)
+        return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+    def _decodificar(self, cursor):
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            valores, reversa = datos['v'], bool(datos['r'])
+            valido = datos['o'] == self.orden and len(valores) == len(self.orden)
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            valido = False
+        if not valido:
+            raise NotFound('Cursor inválido')
+        return valores, reversa
+
+    # --- Consulta ----------------------------------------------------------
+
+    def _filtro(self, valores, reversa):
+        """
+        Retorna (filtro, cola). `filtro` es el keyset con un rango sobre el
+        primer campo (`fecha <= x`) para recorrer su índice. Si a continuación
+        vienen los NULL del primer campo, van aparte en `cola`: un `OR fecha IS
+        NULL` dentro del filtro impediría usar el rango.
+        """
+        primer_campo, primer_valor = self.orden[0].lstrip('-'), valores[0]
+        mayor = self.orden[0].startswith('-') == reversa
+        cola = None
+        if primer_valor is not None and self._nulable(primer_campo) and mayor == self.nulos_mayores:
+            cola = Q(**{f'{primer_campo}__isnull': True})
+
+        condicion = None
+        iguales = Q()
+        for campo, valor in zip(self.orden, valores):
+            nombre = campo.lstrip('-')
+            nulable = self._nulable(nombre) and not (cola is not None and nombre == primer_campo)
+            termino = iguales & _despues(nombre, valor, campo.startswith('-') == reversa, self.nulos_mayores, nulable)
+            condicion = termino if condicion is None else condicion | termino
+            iguales &= _igual(nombre, valor)
+
+        if primer_valor is not None:
+            condicion &= Q(**{f'{primer_campo}__{"gte" if mayor else "lte"}': primer_valor})
+        return condicion, cola
+
+    def paginar(self, queryset, page_size):
+        cursor = self.request.query_params.get(self.paginacion.cursor_query_param)
+        valores, reversa = self._decodificar(cursor) if cursor else (None, False)
+
+        orden = self.orden
+        if reversa:
+            orden = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+        pagina = queryset.order_by(*orden)
+        if valores is None:
+            registros = list(pagina[:page_size + 1])
+        else:
+            filtro, cola = self._filtro(valores, reversa)
+            registros = list(pagina.filter(filtro)[:page_size + 1])
+            if cola is not None and len(registros) <= page_size:
+                registros += pagina.filter(cola)[:page_size + 1 - len(registros)]
+
+        hay_mas = len(registros) > page_size
+        registros = registros[:page_size]
+        if reversa:
+            registros.reverse()
+            self.hay_siguiente, self.hay_anterior = True, hay_mas
+        else:
+            self.hay_siguiente, self.hay_anterior = hay_mas, cursor is not None
+        self.registros = registros
+        return registros
+
+    def _enlace(self, registro, reversa):
+        url = self.request.build_absolute_uri()
+        cursor = self._codificar([_valor(registro, campo.lstrip('-')) for campo in self.orden], reversa)
+        return replace_query_param(url, self.paginacion.cursor_query_param, cursor)
+
+    def siguiente(self):
+        if not (self.hay_siguiente and self.registros):
+            return None
+        return self._enlace(self.registros[-1], reversa=False)
+
+    def anterior(self):
+        if not (self.hay_anterior and self.registros):
+            return None
+        return self._enlace(self.registros[0], reversa=True)
+
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    modo_query_param = 'paginacion'
+    conteo_query_param = 'conteo'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.total = None
+        es_cursor = (request.query_params.get(self.modo_query_param) == 'cursor'
+                     or self.cursor_query_param in request.query_params)
+        self.conteo = request.query_params.get(self.conteo_query_param)
+        if self.conteo not in CONTEOS:
+            self.conteo = 'ninguno' if es_cursor else 'exacto'
+
+        if not es_cursor:
+            if self.conteo != 'exacto':
+                self.django_paginator_class = PaginadorEstimado
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        if self.conteo == 'exacto':
+            self.total = queryset.count()
+        elif self.conteo == 'estimado':
+            self.total = estimar_total(queryset)
+        self.keyset = PaginacionKeyset(self, request, queryset)
+        return self.keyset.paginar(queryset, page_size)
+
+    def get_paginated_response(self, data):
+        if self.keyset is None:
+            response = super().get_paginated_response(data)
+            if self.conteo != 'exacto':
+                response.data['conteo'] = 'estimado'
+            return response
+
+        datos = {}
+        if self.total is not None:
+            datos['count'] = self.total
+            datos['conteo'] = self.conteo
+        datos.update(next=self.keyset.siguiente(), previous=self.keyset.anterior(), results=data)
+        return Response(datos)
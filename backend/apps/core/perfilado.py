@@ -0,0 +1,278 @@
+"""
+Perfilado por request: en qué se va el tiempo de cada request (autenticación,
+vista, SQL, serialización, render).
+
+`PerfiladoMiddleware` va primero en MIDDLEWARE y solo se carga con
+`PROFILING_ENABLED`; perfila una fracción `PROFILING_SAMPLE_RATE` de los
+requests. De cada request perfilado:
+
+* Fases: `auth` (APIView.perform_authentication), `view` (la vista completa,
+  con su auth y su serializer), `serializer` (`.data` del serializer más
+  externo), `render` (renderer de DRF) y `total`. `db` suma las consultas de
+  la conexión del request (`execute_wrapper`) y se superpone con las demás.
+  Las consultas de otros hilos (secciones concurrentes del Dashboard) no se
+  cuentan.
+* Header `Server-Timing` (`PROFILING_SERVER_TIMING`), visible en las
+  devtools del navegador.
+* Evento JSON `perfilado.request` en el logger `backend.perfilado` para una
+  fracción `PROFILING_LOG_SAMPLE_RATE` de los requests perfilados.
+* Por endpoint, tiempos medios por fase y las `PROFILING_TOP_QUERIES`
+  consultas más lentas (SQL sin parámetros), en memoria del proceso:
+  `GET /api/perfilado/` (staff); `DELETE` lo reinicia.
+
+Auth y serializer se miden envolviendo `APIView.perform_authentication` y
+`BaseSerializer.data` al cargar el middleware; fuera de un request perfilado
+cuestan una lectura de ContextVar.
+"""
+import contextlib
+import contextvars
+import heapq
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('backend.perfilado')
+
+_actual = contextvars.ContextVar('perfil', default=None)
+_NULA = contextlib.nullcontext()
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+class Perfil:
+    """Tiempos de un request. También es el `execute_wrapper` de sus conexiones."""
+    __slots__ = ('fases', 'consultas', 'tiempo_db', 'lentas', 'top', 'serializando', 'inicio_vista')
+
+    def __init__(self, top=10):
+        self.fases = {}
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.lentas = []  # heap (segundos, sql) con las `top` más lentas
+        self.top = top
+        self.serializando = False
+        self.inicio_vista = None
+
+    def sumar(self, fase, segundos):
+        self.fases[fase] = self.fases.get(fase, 0.0) + segundos
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_db += duracion
+            if len(self.lentas) < self.top:
+                heapq.heappush(self.lentas, (duracion, sql))
+            elif duracion > self.lentas[0][0]:
+                heapq.heapreplace(self.lentas, (duracion, sql))
+
+    def server_timing(self):
+        partes = [f'{fase};dur={segundos * 1000:.2f}' for fase, segundos in self.fases.items()]
+        partes.append(f'db;dur={self.tiempo_db * 1000:.2f};desc="{self.consultas} consultas"')
+        return ', '.join(partes)
+
+
+class _Fase:
+    __slots__ = ('perfil', 'nombre', 'inicio')
+
+    def __init__(self, perfil, nombre):
+        self.perfil = perfil
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perfil.sumar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+def fase(nombre):
+    """Context manager que suma a `nombre` en el request perfilado en curso (no-op si no hay)."""
+    perfil = _actual.get()
+    if perfil is None:
+        return _NULA
+    return _Fase(perfil, nombre)
+
+
+# --- Instrumentación de DRF -----------------------------------------------
+
+_instalado = False
+
+
+def instalar():
+    """Envuelve la autenticación de APIView y `BaseSerializer.data` (una vez por proceso)."""
+    global _instalado
+    if _instalado:
+        return
+    from rest_framework.serializers import BaseSerializer
+    from rest_framework.views import APIView
+
+    data_original = BaseSerializer.data.fget
+    autenticar_original = APIView.perform_authentication
+
+    def data(self):
+        perfil = _actual.get()
+        # Solo el más externo: un `.data` dentro de otro ya está contado
+        if perfil is None or perfil.serializando:
+            return data_original(self)
+        perfil.serializando = True
+        inicio = time.perf_counter()
+        try:
+            return data_original(self)
+        finally:
+            perfil.serializando = False
+            perfil.sumar('serializer', time.perf_counter() - inicio)
+
+    def perform_authentication(self, request):
+        with fase('auth'):
+            return autenticar_original(self, request)
+
+    BaseSerializer.data = property(data)
+    APIView.perform_authentication = perform_authentication
+    _instalado = True
+
+
+# --- Agregado por endpoint ------------------------------------------------
+
+_endpoints = {}
+_lock = threading.Lock()
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} sin_ruta'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+def _acumular(endpoint, perfil):
+    with _lock:
+        datos = _endpoints.get(endpoint)
+        if datos is None:
+            datos = _endpoints[endpoint] = {'requests': 0, 'consultas': 0, 'fases': {}, 'lentas': {}}
+        datos['requests'] += 1
+        datos['consultas'] += perfil.consultas
+        fases = datos['fases']
+        for nombre, segundos in perfil.fases.items():
+            fases[nombre] = fases.get(nombre, 0.0) + segundos
+        fases['db'] = fases.get('db', 0.0) + perfil.tiempo_db
+
+        # {sql: [veces, total, máximo]}; se podan las de menor máximo
+        lentas = datos['lentas']
+        for duracion, sql in perfil.lentas:
+            entrada = lentas.get(sql)
+            if entrada is None:
+                entrada = lentas[sql] = [0, 0.0, 0.0]
+            entrada[0] += 1
+            entrada[1] += duracion
+            entrada[2] = max(entrada[2], duracion)
+        if len(lentas) > perfil.top * 4:
+            for sql in sorted(lentas, key=lambda s: lentas[s][2])[:len(lentas) - perfil.top * 2]:
+                del lentas[sql]
+
+
+def reporte():
+    """Por endpoint: requests perfilados, medias por fase y las consultas más lentas."""
+    top = _config('PROFILING_TOP_QUERIES', 10)
+    with _lock:
+        return {
+            endpoint: {
+                'requests': datos['requests'],
+                'consultas_media': round(datos['consultas'] / datos['requests'], 1),
+                'fases_media_ms': {
+                    nombre: round(segundos * 1000 / datos['requests'], 3)
+                    for nombre, segundos in sorted(datos['fases'].items())
+                },
+                'consultas_lentas': [
+                    {'sql': sql, 'veces': veces, 'media_ms': round(total * 1000 / veces, 3),
+                     'max_ms': round(maximo * 1000, 3)}
+                    for sql, (veces, total, maximo)
+                    in sorted(datos['lentas'].items(), key=lambda item: -item[1][2])[:top]
+                ],
+            }
+            for endpoint, datos in sorted(_endpoints.items())
+        }
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+# --- Middleware -----------------------------------------------------------
+
+class PerfiladoMiddleware:
+    def __init__(self, get_response):
+        if not _config('PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instalar()
+
+    def __call__(self, request):
+        muestreo = _config('PROFILING_SAMPLE_RATE', 1.0)
+        if muestreo < 1.0 and random.random() >= muestreo:
+            return self.get_response(request)
+
+        perfil = Perfil(top=_config('PROFILING_TOP_QUERIES', 10))
+        token = _actual.set(perfil)
+        inicio = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as pila:
+                for alias in connections:
+                    pila.enter_context(connections[alias].execute_wrapper(perfil))
+                response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        fin = time.perf_counter()
+        if perfil.inicio_vista is not None:
+            # Respuesta sin render diferido (streaming, archivos, HttpResponse)
+            perfil.sumar('view', fin - perfil.inicio_vista)
+        perfil.sumar('total', fin - inicio)
+
+        endpoint = _endpoint(request)
+        _acumular(endpoint, perfil)
+        if _config('PROFILING_SERVER_TIMING', True):
+            response['Server-Timing'] = perfil.server_timing()
+        if logger.isEnabledFor(logging.INFO) and random.random() < _config('PROFILING_LOG_SAMPLE_RATE', 0.01):
+            logger.info('perfilado.request', extra={
+                'endpoint': endpoint,
+                'path': request.path,
+                'status': response.status_code,
+                'consultas': perfil.consultas,
+                'db_ms': round(perfil.tiempo_db * 1000, 3),
+                **{f'{nombre}_ms': round(segundos * 1000, 3) for nombre, segundos in perfil.fases.items()},
+            })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        perfil = _actual.get()
+        if perfil is not None:
+            perfil.inicio_vista = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # Último en correr antes de `response.render()`: la vista terminó y
+        # empieza el render, que termina en el callback
+        perfil = _actual.get()
+        if perfil is None or perfil.inicio_vista is None:
+            return response
+        inicio_render = time.perf_counter()
+        perfil.sumar('view', inicio_render - perfil.inicio_vista)
+        perfil.inicio_vista = None
+
+        def fin_render(respuesta):
+            perfil.sumar('render', time.perf_counter() - inicio_render)
+
+        response.add_post_render_callback(fin_render)
+        return response
@@ -0,0 +1,28 @@
+"""
+Utilidades compartidas por los tests de las apps (`<app>/tests.py`).
+"""
+from unittest import mock
+
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from backend.apps.users.authentication import SupabaseAuthentication
+
+
+class ApiTestCase(APITestCase):
+    """
+    APITestCase con la autenticación de Supabase reemplazada por `self.usuario`
+    (staff si `usuario_staff`): los requests llevan o no el header, da igual.
+    """
+    usuario_staff = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='tests@crm.co', is_staff=cls.usuario_staff)
+
+    def setUp(self):
+        parche = mock.patch.object(
+            SupabaseAuthentication, 'authenticate', lambda auth, request: (self.usuario, None),
+        )
+        parche.start()
+        self.addCleanup(parche.stop)
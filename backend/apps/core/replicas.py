@@ -0,0 +1,267 @@
+"""
+Lecturas de analítica en réplicas (DATABASE_REPLICA_URLS en settings.py).
+
+Solo van a una réplica las lecturas que pueden tolerar segundos de atraso y
+son las más pesadas: el Dashboard, las acciones `kpis` y `top` y las
+exportaciones (también las de `?async=1`, que se generan en el worker; el
+encolado queda en la primaria). Todo lo demás, y toda escritura, usa
+`default`.
+
+* `LecturaReplicaMixin` (ViewSets y APIViews) elige la réplica después de
+  autenticar y la deja en una ContextVar que lee `RouterReplicas`: las
+  consultas de la vista, de sus serializers y de las secciones concurrentes
+  del Dashboard (que copian el contexto) van a la réplica. El queryset de
+  `get_queryset()` queda fijado con `.using()`, porque el CSV en streaming se
+  lee después de que la vista retorna.
+* Leer lo propio: `ReplicasMiddleware` marca en el cache al usuario que hace
+  un POST/PUT/PATCH/DELETE exitoso; durante `REPLICA_STICKY_SECONDS` sus
+  lecturas van a la primaria. Con varios workers el cache debe ser compartido
+  (como para la cache de respuestas, ver core/cache.py); con LocMemCache
+  `manage.py check` advierte (core.W002).
+* Caída o atraso: cada proceso revisa cada réplica cada
+  `REPLICA_CHECK_INTERVAL` segundos (en PostgreSQL, el atraso de replay de la
+  réplica). Si no responde o atrasa más de `REPLICA_MAX_LAG_SECONDS` se lee
+  de la primaria hasta la próxima revisión. Una réplica que cae en medio de
+  un request hace fallar ese request.
+
+Las respuestas cacheadas calculadas en una réplica usan otra clave y un TTL
+de `REPLICA_CACHE_TIMEOUT` (ver `cachear_respuesta`): quien acaba de escribir
+nunca recibe una respuesta calculada con datos anteriores a su escritura.
+"""
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import metricas
+
+logger = logging.getLogger(__name__)
+
+_actual = contextvars.ContextVar('replica_lectura', default=None)
+
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+# Segundos de atraso de una réplica de PostgreSQL; 0 si ya aplicó todo lo
+# recibido (sin escrituras en la primaria el último replay envejece igual)
+_CONSULTA_ATRASO = {
+    'postgresql': (
+        'SELECT CASE WHEN NOT pg_is_in_recovery() '
+        'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+    ),
+}
+# Otros motores (SQLite en desarrollo): solo que responda y tenga el esquema
+_CONSULTA_DISPONIBLE = 'SELECT 1 FROM django_migrations LIMIT 1'
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def replicas():
+    return _config('REPLICAS', [])
+
+
+def actual():
+    """Alias de la réplica elegida para el request en curso, o None (primaria)."""
+    return _actual.get()
+
+
+# --- Escrituras recientes -------------------------------------------------
+
+def _cache():
+    return caches[_config('DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def _clave_escritura(usuario):
+    return f'replicas:escritura:{usuario.pk}'
+
+
+def marcar_escritura(usuario):
+    if usuario is None or not usuario.is_authenticated:
+        return
+    _cache().set(_clave_escritura(usuario), 1, _config('REPLICA_STICKY_SECONDS', 15))
+
+
+def escribio_hace_poco(usuario):
+    if usuario is None or not usuario.is_authenticated:
+        return False
+    return _cache().get(_clave_escritura(usuario)) is not None
+
+
+# --- Estado de las réplicas -----------------------------------------------
+
+# {alias: (vence, disponible, atraso)} de este proceso
+_estados = {}
+_candados = {}
+
+
+def _medir_atraso(alias):
+    conexion = connections[alias]
+    with conexion.cursor() as cursor:
+        consulta = _CONSULTA_ATRASO.get(conexion.vendor)
+        if consulta is None:
+            cursor.execute(_CONSULTA_DISPONIBLE)
+            return 0.0
+        cursor.execute(consulta)
+        return float(cursor.fetchone()[0] or 0)
+
+
+def _revisar(alias):
+    maximo = _config('REPLICA_MAX_LAG_SECONDS', 5)
+    try:
+        atraso = _medir_atraso(alias)
+    except Exception as exc:
+        with contextlib.suppress(Exception):
+            connections[alias].close()
+        return False, None, str(exc)
+    if atraso > maximo:
+        return False, atraso, f'atraso de {atraso:.1f}s (máximo {maximo:g}s)'
+    return True, atraso, None
+
+
+def disponible(alias):
+    """
+    Si `alias` responde y su atraso está dentro del máximo. El resultado se
+    reutiliza `REPLICA_CHECK_INTERVAL` segundos; mientras un hilo revisa, los
+    demás usan el resultado anterior (una réplica caída no traba a todos).
+    """
+    estado = _estados.get(alias)
+    ahora = time.monotonic()
+    if estado is not None and estado[0] > ahora:
+        return estado[1]
+
+    candado = _candados.setdefault(alias, threading.Lock())
+    if not candado.acquire(blocking=False):
+        return estado[1] if estado is not None else False
+    try:
+        ok, atraso, motivo = _revisar(alias)
+        if estado is None or estado[1] != ok:
+            if ok:
+                logger.info('Réplica %s disponible (atraso %.1fs)', alias, atraso)
+            else:
+                logger.warning('Réplica %s no disponible, se lee de la primaria: %s', alias, motivo)
+        _estados[alias] = (time.monotonic() + _config('REPLICA_CHECK_INTERVAL', 5), ok, atraso)
+        return ok
+    finally:
+        candado.release()
+
+
+def elegir(usuario=None):
+    """Alias de una réplica disponible para las lecturas de `usuario`, o None (primaria)."""
+    candidatas = replicas()
+    if not candidatas:
+        return None
+    if escribio_hace_poco(usuario):
+        metricas.DB_LECTURAS.inc(destino='primaria_escritura')
+        return None
+    candidatas = [alias for alias in candidatas if disponible(alias)]
+    if not candidatas:
+        metricas.DB_LECTURAS.inc(destino='primaria_no_disponible')
+        return None
+    metricas.DB_LECTURAS.inc(destino='replica')
+    return random.choice(candidatas)
+
+
+# --- Ámbito de lectura ----------------------------------------------------
+
+@contextlib.contextmanager
+def ambito():
+    """Las réplicas elegidas con `usar()` dentro del bloque dejan de aplicar al salir."""
+    token = _actual.set(None)
+    try:
+        yield
+    finally:
+        _actual.reset(token)
+
+
+def usar(alias):
+    _actual.set(alias)
+
+
+@contextlib.contextmanager
+def lectura(usuario=None):
+    """Lecturas del bloque en una réplica (si hay una disponible); retorna el alias o None."""
+    with ambito():
+        alias = elegir(usuario)
+        usar(alias)
+        yield alias
+
+
+class RouterReplicas:
+    """Lecturas al alias de `actual()` (si hay); escrituras y migraciones a default."""
+
+    def db_for_read(self, model, **hints):
+        return _actual.get()
+
+    def db_for_write(self, model, **hints):
+        # Explícito: sin router Django escribiría una instancia leída de la
+        # réplica en la réplica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class LecturaReplicaMixin:
+    """
+    Lee de una réplica en las acciones `acciones_replica` (GET, salvo las
+    exportaciones encoladas con `?async=1`). Las APIViews sin acciones
+    redefinen `usa_replica()`.
+    """
+    acciones_replica = ('kpis', 'top', 'exportar_csv', 'exportar_excel')
+
+    def usa_replica(self, request):
+        from .exports import es_asincrona
+
+        return (
+            request.method == 'GET'
+            and getattr(self, 'action', None) in self.acciones_replica
+            and not es_asincrona(request)
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        with ambito():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        # Después de autenticar: el usuario (y su lectura) salen de la primaria
+        super().initial(request, *args, **kwargs)
+        if self.usa_replica(request):
+            usar(elegir(request.user))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alias = _actual.get()
+        return queryset.using(alias) if alias is not None else queryset
+
+
+class ReplicasMiddleware:
+    """Marca al usuario de cada escritura exitosa (ver `escribio_hace_poco`)."""
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in METODOS_SEGUROS and response.status_code < 400:
+            # DRF deja en el HttpRequest el usuario que autenticó
+            marcar_escritura(getattr(request, 'user', None))
+        return response
@@ -0,0 +1,307 @@
+"""
+Rollups mensuales de donaciones y gastos.
+
+La tabla `resumen_mensual` guarda, por fuente, mes, estado y medio de pago, la
+suma, cantidad, mínimo y máximo de `monto`. Se actualiza en cada escritura
+(señal `datos_modificados`):
+
+* Filas nuevas: UPDATE con deltas (total + x, cantidad + n, LEAST/GREATEST).
+* Filas modificadas o borradas: el bucket afectado se recalcula desde la tabla
+  de hechos (el mínimo/máximo no se puede "restar").
+
+Las series temporales (`serie_mensual`) leen los meses completos del rollup y
+solo consultan la tabla de hechos para los meses parciales de los extremos del
+rango. `manage.py rebuild_rollups` reconstruye todo y verifica consistencia.
+"""
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, TruncMonth
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from .models import ResumenMensual
+from .signals import datos_modificados
+
+
+@dataclass(frozen=True)
+class FuenteRollup:
+    nombre: str
+    modelo: str
+    campo_fecha: str
+    campo_monto: str = 'monto'
+
+    @property
+    def model(self):
+        return apps.get_model(self.modelo)
+
+
+FUENTES = {
+    'donaciones': FuenteRollup('donaciones', 'donaciones.Donacion', 'fecha_donacion'),
+    'gastos': FuenteRollup('gastos', 'finanzas.Gasto', 'fecha_pago'),
+}
+
+
+def fuente_de_modelo(model):
+    etiqueta = model._meta.label
+    for fuente in FUENTES.values():
+        if fuente.modelo == etiqueta:
+            return fuente
+    return None
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def fin_mes(fecha):
+    return fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+
+
+def _como_fecha(valor):
+    if isinstance(valor, str):
+        return parse_date(valor)
+    return valor
+
+
+def _como_decimal(valor):
+    if valor is None or isinstance(valor, Decimal):
+        return valor
+    return Decimal(str(valor))
+
+
+def _clave(fuente, fila):
+    fecha = _como_fecha(fila.get(fuente.campo_fecha))
+    if fecha is None:
+        return None
+    return (inicio_mes(fecha), fila.get('estado') or '', fila.get('medio_pago') or '')
+
+
+def _filtro_bucket(fuente, clave):
+    mes, estado, medio_pago = clave
+    filtro = Q(**{f'{fuente.campo_fecha}__gte': mes, f'{fuente.campo_fecha}__lte': fin_mes(mes)})
+    filtro &= Q(estado=estado) if estado else (Q(estado__isnull=True) | Q(estado=''))
+    filtro &= Q(medio_pago=medio_pago) if medio_pago else (Q(medio_pago__isnull=True) | Q(medio_pago=''))
+    return filtro
+
+
+def _agregados(fuente):
+    monto = fuente.campo_monto
+    return {
+        'total': Sum(monto),
+        'cantidad': Count('pk'),
+        'monto_min': Min(monto),
+        'monto_max': Max(monto),
+    }
+
+
+# --- Mantenimiento incremental --------------------------------------------
+
+class _Delta:
+    __slots__ = ('total', 'cantidad', 'minimo', 'maximo', 'quitados')
+
+    def __init__(self):
+        self.total = Decimal('0')
+        self.cantidad = 0
+        self.minimo = None
+        self.maximo = None
+        self.quitados = 0
+
+    def agregar(self, monto):
+        self.cantidad += 1
+        if monto is not None:
+            self.total += monto
+            self.minimo = monto if self.minimo is None else min(self.minimo, monto)
+            self.maximo = monto if self.maximo is None else max(self.maximo, monto)
+
+
+def _recalcular_bucket(fuente, clave, using):
+    mes, estado, medio_pago = clave
+    datos = fuente.model._base_manager.using(using).filter(_filtro_bucket(fuente, clave)).aggregate(**_agregados(fuente))
+    bucket = ResumenMensual.objects.using(using).filter(fuente=fuente.nombre, mes=mes, estado=estado, medio_pago=medio_pago)
+    if not datos['cantidad']:
+        bucket.delete()
+        return
+    datos['total'] = datos['total'] or 0
+    if not bucket.update(**datos):
+        ResumenMensual.objects.using(using).create(
+            fuente=fuente.nombre, mes=mes, estado=estado, medio_pago=medio_pago, **datos
+        )
+
+
+def _sumar_bucket(fuente, clave, delta, using):
+    mes, estado, medio_pago = clave
+    bucket = ResumenMensual.objects.using(using).filter(fuente=fuente.nombre, mes=mes, estado=estado, medio_pago=medio_pago)
+    cambios = {'total': F('total') + delta.total, 'cantidad': F('cantidad') + delta.cantidad}
+    if delta.minimo is not None:
+        cambios['monto_min'] = Least(Coalesce('monto_min', Value(delta.minimo)), Value(delta.minimo))
+        cambios['monto_max'] = Greatest(Coalesce('monto_max', Value(delta.maximo)), Value(delta.maximo))
+    if bucket.update(**cambios):
+        return
+    try:
+        with transaction.atomic(using=using):
+            ResumenMensual.objects.using(using).create(
+                fuente=fuente.nombre, mes=mes, estado=estado, medio_pago=medio_pago,
+                total=delta.total, cantidad=delta.cantidad, monto_min=delta.minimo, monto_max=delta.maximo,
+            )
+    except IntegrityError:
+        # Otro proceso creó el bucket entre el UPDATE y el INSERT
+        bucket.update(**cambios)
+
+
+def aplicar_cambios(fuente, antes, despues, using='default'):
+    pk = fuente.model._meta.pk.attname
+    monto = fuente.campo_monto
+    previos = {fila[pk]: fila for fila in antes if fila.get(pk) is not None}
+    deltas = defaultdict(_Delta)
+
+    for fila in despues:
+        previa = previos.pop(fila.get(pk), None) if fila.get(pk) is not None else None
+        clave = _clave(fuente, fila)
+        valor = _como_decimal(fila.get(monto))
+        if previa is not None:
+            clave_previa = _clave(fuente, previa)
+            if clave_previa == clave and _como_decimal(previa.get(monto)) == valor:
+                continue  # El cambio no afecta el rollup (p.ej. comprobante)
+            if clave_previa is not None:
+                deltas[clave_previa].quitados += 1
+        if clave is not None:
+            deltas[clave].agregar(valor)
+
+    for previa in previos.values():
+        clave_previa = _clave(fuente, previa)
+        if clave_previa is not None:
+            deltas[clave_previa].quitados += 1
+
+    for clave, delta in deltas.items():
+        if delta.quitados:
+            _recalcular_bucket(fuente, clave, using)
+        elif delta.cantidad:
+            _sumar_bucket(fuente, clave, delta, using)
+
+
+@receiver(datos_modificados)
+def _actualizar_rollups(sender, antes, despues, using=None, **kwargs):
+    fuente = fuente_de_modelo(sender)
+    if fuente is not None:
+        aplicar_cambios(fuente, antes, despues, using or 'default')
+
+
+# --- Reconstrucción y verificación ----------------------------------------
+
+def calcular_desde_hechos(fuente, using='default'):
+    """Agregados por bucket calculados directamente sobre la tabla de hechos."""
+    filas = (
+        fuente.model._base_manager.using(using)
+        .filter(**{f'{fuente.campo_fecha}__isnull': False})
+        .annotate(mes=TruncMonth(fuente.campo_fecha))
+        .values('mes', 'estado', 'medio_pago')
+        .annotate(**_agregados(fuente))
+        .order_by()
+    )
+    buckets = {}
+    for fila in filas:
+        mes = fila['mes'].date() if hasattr(fila['mes'], 'date') else fila['mes']
+        clave = (mes, fila['estado'] or '', fila['medio_pago'] or '')
+        previo = buckets.get(clave)
+        datos = {
+            'total': fila['total'] or Decimal('0'),
+            'cantidad': fila['cantidad'],
+            'monto_min': fila['monto_min'],
+            'monto_max': fila['monto_max'],
+        }
+        if previo:
+            # NULL y '' caen en el mismo bucket
+            datos = {
+                'total': previo['total'] + datos['total'],
+                'cantidad': previo['cantidad'] + datos['cantidad'],
+                'monto_min': min((v for v in (previo['monto_min'], datos['monto_min']) if v is not None), default=None),
+                'monto_max': max((v for v in (previo['monto_max'], datos['monto_max']) if v is not None), default=None),
+            }
+        buckets[clave] = datos
+    return buckets
+
+
+def reconstruir(fuente, using='default', batch_size=1000):
+    buckets = calcular_desde_hechos(fuente, using)
+    with transaction.atomic(using=using):
+        ResumenMensual.objects.using(using).filter(fuente=fuente.nombre).delete()
+        ResumenMensual.objects.using(using).bulk_create(
+            [
+                ResumenMensual(fuente=fuente.nombre, mes=mes, estado=estado, medio_pago=medio_pago, **datos)
+                for (mes, estado, medio_pago), datos in buckets.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(buckets)
+
+
+def verificar(fuente, using='default'):
+    """Lista de (clave, esperado, actual) para los buckets que no coinciden."""
+    esperados = calcular_desde_hechos(fuente, using)
+    actuales = {
+        (r.mes, r.estado, r.medio_pago): {
+            'total': r.total, 'cantidad': r.cantidad, 'monto_min': r.monto_min, 'monto_max': r.monto_max,
+        }
+        for r in ResumenMensual.objects.using(using).filter(fuente=fuente.nombre)
+    }
+    diferencias = []
+    for clave in sorted(set(esperados) | set(actuales)):
+        if esperados.get(clave) != actuales.get(clave):
+            diferencias.append((clave, esperados.get(clave), actuales.get(clave)))
+    return diferencias
+
+
+# --- Lectura --------------------------------------------------------------
+
+def serie_mensual(fuente, filtro_estado=None, desde=None, hasta=None, using=None):
+    """
+    Serie mensual [{'mes': date, 'total': Decimal, 'cantidad': int}] de la fuente,
+    equivalente a agrupar por TruncMonth las filas con fecha en [desde, hasta]
+    que cumplen `filtro_estado` (un Q sobre `estado`).
+    """
+    if isinstance(fuente, str):
+        fuente = FUENTES[fuente]
+    filtro_estado = filtro_estado or Q()
+    campo = fuente.campo_fecha
+    serie = {}
+
+    def sumar_hechos(inicio, fin):
+        datos = fuente.model.objects.using(using).filter(
+            filtro_estado, **{f'{campo}__gte': inicio, f'{campo}__lte': fin}
+        ).aggregate(total=Sum(fuente.campo_monto), cantidad=Count('pk'))
+        if datos['cantidad']:
+            serie[inicio_mes(inicio)] = {'total': datos['total'] or Decimal('0'), 'cantidad': datos['cantidad']}
+
+    # Meses completos: [primer_mes, ultimo_mes] se leen del rollup
+    primer_mes = ultimo_mes = None
+    if desde:
+        primer_mes = inicio_mes(desde)
+        if desde.day != 1:
+            sumar_hechos(desde, min(fin_mes(desde), hasta) if hasta else fin_mes(desde))
+            primer_mes = fin_mes(desde) + timedelta(days=1)
+    if hasta:
+        ultimo_mes = inicio_mes(hasta)
+        if hasta != fin_mes(hasta):
+            if not (desde and inicio_mes(desde) == inicio_mes(hasta) and desde.day != 1):
+                sumar_hechos(max(inicio_mes(hasta), desde) if desde else inicio_mes(hasta), hasta)
+            ultimo_mes = inicio_mes(hasta) - timedelta(days=1)
+            ultimo_mes = inicio_mes(ultimo_mes)
+
+    if primer_mes is None or ultimo_mes is None or primer_mes <= ultimo_mes:
+        rollup = ResumenMensual.objects.using(using).filter(filtro_estado, fuente=fuente.nombre)
+        if primer_mes:
+            rollup = rollup.filter(mes__gte=primer_mes)
+        if ultimo_mes:
+            rollup = rollup.filter(mes__lte=ultimo_mes)
+        for fila in rollup.values('mes').annotate(total_mes=Sum('total'), cantidad_mes=Sum('cantidad')).order_by():
+            if fila['cantidad_mes']:
+                serie[fila['mes']] = {'total': fila['total_mes'], 'cantidad': fila['cantidad_mes']}
+
+    return [dict(mes=mes, **serie[mes]) for mes in sorted(serie)]
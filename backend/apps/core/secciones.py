@@ -0,0 +1,109 @@
+"""
+Ejecución de secciones independientes de una vista (p.ej. el Dashboard).
+
+Cada sección es un callable sin argumentos que devuelve un valor ya evaluado
+(listas, números; no querysets perezosos). En modo secuencial se ejecutan una
+tras otra; en modo concurrente se reparten en un pool de hilos acotado y
+compartido por el proceso. Cada hilo usa su propia conexión a la base de
+datos (las conexiones de Django son por hilo) y la libera según CONN_MAX_AGE
+al terminar la tarea.
+
+Si una sección excede su timeout o lanza una excepción se usa su valor por
+defecto y se marca en `fallidas`: la vista responde parcialmente en lugar de
+fallar completa. El timeout cuenta desde que la sección se encola y no
+cancela una consulta ya en curso: el hilo queda ocupado hasta que termina.
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'DASHBOARD_MAX_WORKERS', 4),
+                    thread_name_prefix='secciones',
+                )
+    return _pool
+
+
+def _en_hilo(funcion):
+    close_old_connections()
+    try:
+        inicio = time.perf_counter()
+        valor = funcion()
+        return valor, time.perf_counter() - inicio
+    finally:
+        close_old_connections()
+
+
+class Resultado:
+    def __init__(self):
+        self.valores = {}
+        self.tiempos_ms = {}
+        self.fallidas = {}  # nombre -> 'timeout' | 'error'
+
+    @property
+    def parcial(self):
+        return bool(self.fallidas)
+
+    def meta(self, modo):
+        return {'modo': modo, 'tiempos_ms': self.tiempos_ms, 'fallidas': self.fallidas}
+
+
+def ejecutar(secciones, por_defecto, concurrente=None, timeout=None):
+    """
+    secciones: {nombre: callable}; por_defecto: {nombre: valor si falla}.
+    Retorna un `Resultado` con valores, tiempos por sección y secciones fallidas.
+    """
+    if concurrente is None:
+        concurrente = getattr(settings, 'DASHBOARD_CONCURRENTE', False)
+    if timeout is None:
+        timeout = getattr(settings, 'DASHBOARD_TIMEOUT_SECCION', 5.0)
+    resultado = Resultado()
+
+    if not concurrente:
+        for nombre, funcion in secciones.items():
+            inicio = time.perf_counter()
+            resultado.valores[nombre] = funcion()
+            resultado.tiempos_ms[nombre] = round((time.perf_counter() - inicio) * 1000, 2)
+        return resultado
+
+    pool = _get_pool()
+    futuros = {}
+    for nombre, funcion in secciones.items():
+        # Cada tarea corre en una copia del contexto del request (contextvars)
+        contexto = contextvars.copy_context()
+        futuros[nombre] = (time.monotonic(), pool.submit(contexto.run, _en_hilo, funcion))
+
+    for nombre, (enviado, futuro) in futuros.items():
+        restante = max(enviado + timeout - time.monotonic(), 0)
+        try:
+            valor, segundos = futuro.result(timeout=restante)
+        except FuturesTimeout:
+            futuro.cancel()
+            resultado.fallidas[nombre] = 'timeout'
+            resultado.valores[nombre] = por_defecto[nombre]
+            logger.warning('Sección %s excedió %.1fs', nombre, timeout)
+            continue
+        except Exception:
+            resultado.fallidas[nombre] = 'error'
+            resultado.valores[nombre] = por_defecto[nombre]
+            logger.exception('Error en la sección %s', nombre)
+            continue
+        resultado.valores[nombre] = valor
+        resultado.tiempos_ms[nombre] = round(segundos * 1000, 2)
+    return resultado
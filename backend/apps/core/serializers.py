@@ -0,0 +1,49 @@
+from rest_framework import serializers
+
+from .estados import normalizar
+from .models import TrabajoExportacion
+
+
+class EstadoField(serializers.ChoiceField):
+    """
+    ChoiceField del `estado` de `model` que acepta alias y variantes de
+    mayúsculas ('aprobada', 'Completada') y guarda el valor canónico.
+    """
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        campo = model._meta.get_field('estado')
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', campo.null)
+        kwargs.setdefault('allow_blank', campo.blank)
+        super().__init__(choices=campo.choices, **kwargs)
+
+    def to_internal_value(self, data):
+        if data == '' and self.allow_blank:
+            return None if self.allow_null else ''
+        return super().to_internal_value(normalizar(self.model, data))
+
+
+class TrabajoExportacionSerializer(serializers.ModelSerializer):
+    url_estado = serializers.SerializerMethodField()
+    url_descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoExportacion
+        fields = [
+            'id_trabajo', 'recurso', 'formato', 'parametros', 'estado', 'filas', 'error',
+            'creado', 'iniciado', 'terminado', 'expira', 'url_estado', 'url_descarga',
+        ]
+        read_only_fields = fields
+
+    def _url(self, nombre, obj):
+        from rest_framework.reverse import reverse
+        return reverse(nombre, args=[obj.pk], request=self.context.get('request'))
+
+    def get_url_estado(self, obj):
+        return self._url('exportacion-detail', obj)
+
+    def get_url_descarga(self, obj):
+        if obj.estado != TrabajoExportacion.Estado.COMPLETADO:
+            return None
+        return self._url('exportacion-descargar', obj)
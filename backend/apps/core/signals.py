@@ -0,0 +1,75 @@
+"""
+Señal única de cambios en tablas de hechos.
+
+`datos_modificados` se emite con el estado de las filas antes y después de
+cualquier escritura sobre un `TrackedModel`: save(), delete() (incluido el
+borrado en cascada), y los caminos masivos del `TrackedQuerySet`
+(bulk_create, bulk_update, update, delete). Los subsistemas derivados
+(rollups, resúmenes, caches) escuchan solo esta señal.
+
+    antes / despues: listas de dicts {attname: valor} de los campos concretos.
+"""
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+datos_modificados = Signal()
+
+_estado = threading.local()
+
+
+class suprimir_senales_por_fila:
+    """
+    Dentro de este bloque los post_delete por fila de `model` no emiten (se
+    emite en lote). Los modelos borrados en cascada siguen emitiendo por fila.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __enter__(self):
+        if not hasattr(_estado, 'suprimidos'):
+            _estado.suprimidos = []
+        _estado.suprimidos.append(self.model)
+
+    def __exit__(self, *exc):
+        _estado.suprimidos.remove(self.model)
+        return False
+
+
+def _suprimido(sender):
+    return sender in getattr(_estado, 'suprimidos', ())
+
+
+def _es_rastreado(sender):
+    from .models import TrackedModel
+    return isinstance(sender, type) and issubclass(sender, TrackedModel)
+
+
+@receiver(pre_save)
+def _capturar_original(sender, instance, raw=False, using=None, **kwargs):
+    if raw or not _es_rastreado(sender) or instance._state.adding or instance.pk is None:
+        return
+    if instance._valores_originales is None:
+        # Instancia construida a mano o con campos diferidos: se lee la fila actual
+        instance._valores_originales = sender._default_manager.using(using).filter(
+            pk=instance.pk
+        ).values(*sender.campos_rastreados()).first()
+
+
+@receiver(post_save)
+def _emitir_save(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw or not _es_rastreado(sender):
+        return
+    antes = [] if created or instance._valores_originales is None else [instance._valores_originales]
+    despues = [instance.snapshot()]
+    instance._valores_originales = despues[0]
+    datos_modificados.send(sender=sender, antes=antes, despues=despues, using=using)
+
+
+@receiver(post_delete)
+def _emitir_delete(sender, instance, using=None, **kwargs):
+    if _suprimido(sender) or not _es_rastreado(sender):
+        return
+    datos_modificados.send(sender=sender, antes=[instance.snapshot()], despues=[], using=using)
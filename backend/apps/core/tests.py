@@ -0,0 +1,370 @@
+import multiprocessing
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend.apps.donaciones.models import Donacion, Donante
+
+from . import cache, checks, metricas, replicas, rollups, trabajos
+from .models import ResumenMensual, TrabajoExportacion
+from .pruebas import ApiTestCase
+
+DONACIONES = rollups.FUENTES['donaciones']
+
+
+def bucket(mes, estado='APROBADA', medio_pago=''):
+    return ResumenMensual.objects.filter(fuente='donaciones', mes=mes, estado=estado, medio_pago=medio_pago).first()
+
+
+class RollupsIncrementalesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.donante = Donante.objects.create(donante='Donante', identificacion='900')
+
+    def donacion(self, fecha, monto, estado='APROBADA'):
+        return Donacion.objects.create(id_donante=self.donante, fecha_donacion=fecha, monto=Decimal(monto), estado=estado)
+
+    def assertConsistente(self):
+        self.assertEqual(rollups.verificar(DONACIONES), [])
+
+    def test_insercion_suma_al_bucket(self):
+        self.donacion(date(2024, 3, 5), 1000)
+        self.donacion(date(2024, 3, 20), 3000)
+        fila = bucket(date(2024, 3, 1))
+        self.assertEqual((fila.total, fila.cantidad, fila.monto_min, fila.monto_max), (4000, 2, 1000, 3000))
+        self.assertConsistente()
+
+    def test_update_mueve_la_fila_de_bucket(self):
+        donacion = self.donacion(date(2024, 3, 5), 1000)
+        self.donacion(date(2024, 3, 6), 500)
+        donacion.fecha_donacion = date(2024, 4, 5)
+        donacion.estado = 'RECHAZADA'
+        donacion.save()
+        marzo = bucket(date(2024, 3, 1))
+        self.assertEqual((marzo.total, marzo.cantidad, marzo.monto_max), (500, 1, 500))
+        self.assertEqual(bucket(date(2024, 4, 1), estado='RECHAZADA').total, 1000)
+        self.assertConsistente()
+
+    def test_delete_recalcula_y_borra_buckets_vacios(self):
+        donacion = self.donacion(date(2024, 3, 5), 1000)
+        self.donacion(date(2024, 5, 5), 2000)
+        donacion.delete()
+        self.assertIsNone(bucket(date(2024, 3, 1)))
+        Donacion.objects.filter(fecha_donacion__month=5).delete()
+        self.assertFalse(ResumenMensual.objects.filter(fuente='donaciones').exists())
+
+    def test_update_masivo(self):
+        for dia in range(1, 6):
+            self.donacion(date(2024, 3, dia), 100 * dia, estado='PENDIENTE')
+        Donacion.objects.filter(fecha_donacion__day__lte=3).update(estado='APROBADA')
+        self.assertEqual(bucket(date(2024, 3, 1)).cantidad, 3)
+        self.assertEqual(bucket(date(2024, 3, 1), estado='PENDIENTE').total, 900)
+        self.assertConsistente()
+
+
+class PoblarResumenMensualTests(TestCase):
+    def test_migracion_reconstruye_desde_los_hechos(self):
+        donante = Donante.objects.create(donante='Donante', identificacion='901')
+        for mes in (1, 1, 2):
+            Donacion.objects.create(id_donante=donante, fecha_donacion=date(2024, mes, 10), monto=Decimal(700), estado='APROBADA')
+        ResumenMensual.objects.all().delete()
+
+        migracion = import_module('backend.apps.core.migrations.0005_poblar_resumen_mensual')
+        migracion.poblar_resumen(apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(bucket(date(2024, 1, 1)).cantidad, 2)
+        self.assertEqual(rollups.verificar(DONACIONES), [])
+        self.assertEqual(rollups.verificar(rollups.FUENTES['gastos']), [])
+
+
+class CacheRespuestasPruebas:
+    """Invalidación por versión y candado de estampida; cada subclase fija el backend."""
+    backend = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directorio = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        cls.enterClassContext(override_settings(
+            CACHES={'default': {'BACKEND': cls.backend, 'LOCATION': directorio}},
+            DASHBOARD_CACHE_ENABLED=True, DASHBOARD_CACHE_LOCK_WAIT=0.3,
+        ))
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_escritura_confirmada_cambia_la_version(self):
+        clave = cache.clave('dashboard', {'start_date': '2024-01-01'})
+        cache.obtener_o_calcular(clave, lambda: {'total': 1})
+        donante = Donante.objects.create(donante='Donante', identificacion='902')
+        with self.captureOnCommitCallbacks(execute=True):
+            Donacion.objects.create(id_donante=donante, fecha_donacion=date(2024, 1, 5), monto=Decimal(10))
+        nueva = cache.clave('dashboard', {'start_date': '2024-01-01'})
+        self.assertNotEqual(clave, nueva)
+        self.assertEqual(cache.obtener_o_calcular(nueva, lambda: {'total': 2}), ({'total': 2}, 'miss'))
+
+    def test_sin_commit_no_invalida(self):
+        version = cache.version_datos()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Donante.objects.create(donante='Donante', identificacion='903')
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(cache.version_datos(), version)
+
+    def test_un_solo_calculo_en_estampida(self):
+        llamadas = []
+
+        def calcular():
+            llamadas.append(1)
+            time.sleep(0.1)
+            return {'total': 1}
+
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(cache.obtener_o_calcular('resp:prueba', calcular)))
+            for _ in range(5)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(sorted(estado for _, estado in resultados), ['hit'] * 4 + ['miss'])
+
+    def test_candado_ajeno_calcula_sin_guardar(self):
+        cache.get_cache().add('resp:prueba:candado', 1)
+        self.assertEqual(cache.obtener_o_calcular('resp:prueba', lambda: {'total': 1}), ({'total': 1}, 'espera'))
+        self.assertIsNone(cache.get_cache().get('resp:prueba'))
+
+
+class CacheLocMemTests(CacheRespuestasPruebas, TestCase):
+    backend = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+class CacheArchivoTests(CacheRespuestasPruebas, TestCase):
+    backend = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+class CheckCacheCompartidoTests(SimpleTestCase):
+    def test_advierte_con_locmem(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, DASHBOARD_CACHE_ENABLED=True):
+            self.assertEqual([e.id for e in checks.cache_compartido(None)], ['core.W001'])
+        with override_settings(CACHES=locmem, DASHBOARD_CACHE_ENABLED=False):
+            self.assertEqual(checks.cache_compartido(None), [])
+
+
+@override_settings(EXPORT_TIMEOUT_TRABAJO=300, EXPORT_LATIDO_SEGUNDOS=3600)
+class TrabajosColgadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='exportaciones@crm.co')
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.enterContext(override_settings(EXPORTS_ROOT=directorio))
+        TrabajoExportacion.objects.create(
+            usuario=self.usuario, recurso='donaciones', vista='backend.apps.donaciones.views.DonacionViewSet',
+            formato='csv', huella='h',
+        )
+
+    def envejecer(self, **campos):
+        hace = timezone.now() - timedelta(hours=1)
+        TrabajoExportacion.objects.update(**{campo: hace for campo in campos})
+
+    def test_worker_vivo_no_se_reencola(self):
+        trabajos.reclamar()
+        self.envejecer(iniciado=True)
+        self.assertEqual(trabajos.recuperar_colgados(), 0)
+
+    def test_sin_latido_se_reencola(self):
+        trabajos.reclamar()
+        self.envejecer(iniciado=True, latido=True)
+        self.assertEqual(trabajos.recuperar_colgados(), 1)
+        self.assertEqual(TrabajoExportacion.objects.get().estado, TrabajoExportacion.Estado.PENDIENTE)
+
+    def test_intento_reencolado_no_cierra_el_trabajo(self):
+        viejo = trabajos.reclamar()
+        self.envejecer(latido=True)
+        trabajos.recuperar_colgados()
+        nuevo = trabajos.reclamar()
+
+        trabajos.procesar(viejo)
+        actual = TrabajoExportacion.objects.get()
+        self.assertEqual((actual.estado, actual.intentos), (TrabajoExportacion.Estado.EN_PROCESO, 2))
+        self.assertFalse(trabajos.almacenamiento().exists(f'{actual.pk}.csv'))
+
+        trabajos.procesar(nuevo)
+        actual.refresh_from_db()
+        self.assertEqual(actual.estado, TrabajoExportacion.Estado.COMPLETADO)
+        self.assertTrue(trabajos.almacenamiento().exists(actual.archivo))
+
+
+def _incrementar_auth(veces):
+    for _ in range(veces):
+        metricas.AUTH.inc(resultado='prueba')
+
+
+LINEA_METRICA = re.compile(r'^[a-z_]+(\{([a-z_]+="[^"]*",?)+\})? -?[0-9.e+]+$|^# (HELP|TYPE) [a-z_]+ .+$')
+
+
+class MetricasTests(SimpleTestCase):
+    def setUp(self):
+        # Cada test con su propio directorio (y almacén) de métricas
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        self.enterContext(override_settings(METRICS_MULTIPROC_DIR=directorio, METRICS_ENABLED=True))
+        metricas._almacen = None
+        self.addCleanup(setattr, metricas, '_almacen', None)
+
+    def muestras(self, prefijo):
+        return [linea for linea in metricas.exponer().splitlines() if linea.startswith(prefijo)]
+
+    def test_suma_entre_procesos(self):
+        contexto = multiprocessing.get_context('fork')
+        procesos = [contexto.Process(target=_incrementar_auth, args=(1000,)) for _ in range(4)]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join()
+        self.assertEqual([p.exitcode for p in procesos], [0] * 4)
+        self.assertEqual(self.muestras('crm_auth_total{'), ['crm_auth_total{resultado="prueba"} 4000.0'])
+
+    def test_histograma_acumulado_en_formato_de_texto(self):
+        for valor in (0.003, 0.02, 0.02, 7):
+            metricas.HTTP_DURACION.observar(valor, vista='prueba', metodo='GET')
+        texto = metricas.exponer()
+        for linea in texto.splitlines():
+            self.assertRegex(linea, LINEA_METRICA)
+
+        buckets = [
+            (re.search(r'le="([^"]+)"', linea).group(1), float(linea.rsplit(' ', 1)[1]))
+            for linea in self.muestras('crm_http_request_duration_seconds_bucket{')
+        ]
+        self.assertEqual([le for le, _ in buckets], [metricas._formato_le(b) for b in metricas.BUCKETS])
+        valores = [valor for _, valor in buckets]
+        self.assertEqual(valores, sorted(valores))
+        self.assertEqual(dict(buckets)['0.005'], 1)
+        self.assertEqual(dict(buckets)['0.025'], 3)
+        self.assertEqual(dict(buckets)['+Inf'], 4)
+        self.assertEqual(self.muestras('crm_http_request_duration_seconds_count{'),
+                         ['crm_http_request_duration_seconds_count{metodo="GET",vista="prueba"} 4.0'])
+
+
+class MetricasVistaTests(ApiTestCase):
+    def test_solo_staff(self):
+        self.assertEqual(self.client.get('/api/metricas/').status_code, 403)
+
+
+class MetricasVistaStaffTests(ApiTestCase):
+    usuario_staff = True
+
+    def test_staff_recibe_texto_de_prometheus(self):
+        respuesta = self.client.get('/api/metricas/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], metricas.CONTENT_TYPE)
+        self.assertIn(b'# TYPE crm_http_requests_total counter', respuesta.content)
+
+
+class ReplicaPruebas:
+    """
+    Configura una réplica `replica` que comparte la conexión SQLite de default.
+    Es como un MIRROR de prueba, pero ve los datos sin commit del test. Sus
+    consultas se capturan aparte con CaptureQueriesContext(connections['replica']).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings['replica'] = dict(connections.settings['default'])
+        cls.addClassCleanup(connections.settings.pop, 'replica')
+        cls.enterClassContext(override_settings(
+            REPLICAS=['replica'], DATABASE_ROUTERS=['backend.apps.core.replicas.RouterReplicas'],
+            DASHBOARD_CACHE_ENABLED=False,
+        ))
+
+    def setUp(self):
+        super().setUp()
+        connections['default'].ensure_connection()
+        replica = connections['replica']
+        replica.connection = connections['default'].connection
+        self.addCleanup(self._soltar_replica, replica)
+        replicas._estados.clear()
+        self.addCleanup(replicas._estados.clear)
+
+    @staticmethod
+    def _soltar_replica(replica):
+        # Sin cerrar: la conexión es la de default
+        replica.connection = None
+        del connections['replica']
+
+    def consultas(self, url, params=None):
+        """(status, consultas en la primaria, consultas en la réplica) de un GET."""
+        with CaptureQueriesContext(connections['default']) as primaria, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            respuesta = self.client.get(url, params or {})
+            respuesta.getvalue()  # El CSV en streaming se lee al consumirlo
+        return respuesta.status_code, len(primaria), len(replica)
+
+
+class LecturaReplicaTests(ReplicaPruebas, ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        donante = Donante.objects.create(donante='Donante', identificacion='904')
+        for mes in range(1, 4):
+            Donacion.objects.create(id_donante=donante, fecha_donacion=date(2024, mes, 10), monto=Decimal(100), estado='APROBADA')
+
+    def test_analitica_lee_de_la_replica(self):
+        for url in ('/api/donaciones/kpis/', '/api/donantes/top/', '/api/donaciones/exportar_csv/',
+                    '/api/donaciones/exportar_excel/'):
+            with self.subTest(url=url):
+                estado, _, en_replica = self.consultas(url)
+                self.assertEqual(estado, 200)
+                self.assertGreater(en_replica, 0)
+
+    def test_listado_lee_de_la_primaria(self):
+        estado, en_primaria, en_replica = self.consultas('/api/donaciones/')
+        self.assertEqual((estado, en_replica), (200, 0))
+        self.assertGreater(en_primaria, 0)
+
+    def test_quien_escribio_lee_de_la_primaria(self):
+        respuesta = self.client.post('/api/donantes/', {'donante': 'Nuevo', 'identificacion': '905'})
+        self.assertEqual(respuesta.status_code, 201)
+        estado, en_primaria, en_replica = self.consultas('/api/donaciones/kpis/')
+        self.assertEqual((estado, en_replica), (200, 0))
+        self.assertGreater(en_primaria, 0)
+
+    def test_replica_no_disponible_lee_de_la_primaria(self):
+        with mock.patch.object(replicas, 'disponible', return_value=False):
+            estado, en_primaria, en_replica = self.consultas('/api/donaciones/kpis/')
+        self.assertEqual((estado, en_replica), (200, 0))
+        self.assertGreater(en_primaria, 0)
+
+    def test_escrituras_van_a_default(self):
+        self.assertEqual(replicas.RouterReplicas().db_for_write(Donacion), 'default')
+        self.assertFalse(replicas.RouterReplicas().allow_migrate('replica', 'donaciones'))
+
+
+class CheckReplicasTests(SimpleTestCase):
+    def test_advierte_con_locmem(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, REPLICAS=['replica']):
+            self.assertEqual([e.id for e in checks.replicas_con_cache_compartido(None)], ['core.W002'])
+        with override_settings(CACHES=locmem, REPLICAS=[]):
+            self.assertEqual(checks.replicas_con_cache_compartido(None), [])
@@ -0,0 +1,250 @@
+"""
+Exportaciones asíncronas con una cola en la base de datos.
+
+* `encolar(vista, formato)`: desde `exportar_csv`/`exportar_excel?async=1`.
+  Guarda la vista, el formato y los query params. Si el mismo usuario ya
+  tiene activa una exportación idéntica (misma huella) se reutiliza; una
+  restricción única parcial sobre `huella` cubre las solicitudes simultáneas.
+  Cada usuario puede tener a lo sumo EXPORT_MAX_ACTIVOS_POR_USUARIO trabajos
+  pendientes o en proceso.
+* `reclamar()`: el worker (`manage.py export_worker`) toma el pendiente más
+  antiguo cuyo usuario no tenga ya EXPORT_MAX_CONCURRENTES_POR_USUARIO en
+  proceso. El reclamo es un UPDATE condicional (`estado = PENDIENTE`): con
+  varios workers solo uno lo gana, sin depender de SKIP LOCKED.
+* `procesar(trabajo)`: reconstruye el queryset con el mismo ViewSet (filtros,
+  búsqueda y orden incluidos), lo lee de una réplica si hay (core/replicas.py)
+  y escribe el archivo en EXPORTS_ROOT. Mientras escribe, un hilo actualiza
+  `latido` cada EXPORT_LATIDO_SEGUNDOS.
+* `recuperar_colgados()` / `limpiar_vencidos()`: reencola los trabajos sin
+  latido por más de EXPORT_TIMEOUT_TRABAJO (worker caído) y borra archivos y
+  filas pasado EXPORT_TTL_HORAS.
+
+Cada intento escribe su propio `.parcial` y solo el intento vigente
+(`intentos`) puede cerrar el trabajo: si un worker que se creía caído
+termina después del reencolado, su resultado se descarta.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import replicas
+from .exports import escribir_csv, escribir_excel
+from .models import TrabajoExportacion
+
+logger = logging.getLogger(__name__)
+
+Estado = TrabajoExportacion.Estado
+FORMATOS = {'csv': 'exportar_csv', 'xlsx': 'exportar_excel'}
+
+
+class LimiteExportaciones(Exception):
+    pass
+
+
+def _config(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def almacenamiento():
+    return FileSystemStorage(location=_config('EXPORTS_ROOT', os.path.join(settings.BASE_DIR, 'exports')))
+
+
+def huella(usuario_id, vista, formato, parametros):
+    crudo = json.dumps([usuario_id, vista, formato, parametros], sort_keys=True)
+    return hashlib.sha256(crudo.encode()).hexdigest()
+
+
+def _activo(valor):
+    return TrabajoExportacion.objects.filter(huella=valor, estado__in=TrabajoExportacion.ACTIVOS).first()
+
+
+# --- Solicitud ------------------------------------------------------------
+
+def encolar(vista, formato):
+    """Retorna el trabajo (nuevo o el activo idéntico). Lanza LimiteExportaciones."""
+    request = vista.request
+    ruta_vista = f'{type(vista).__module__}.{type(vista).__qualname__}'
+    parametros = {clave: valores for clave, valores in request.query_params.lists() if clave != 'async'}
+    valor = huella(request.user.pk, ruta_vista, formato, parametros)
+
+    existente = _activo(valor)
+    if existente is not None:
+        return existente
+
+    limite = _config('EXPORT_MAX_ACTIVOS_POR_USUARIO', 3)
+    activos = TrabajoExportacion.objects.filter(usuario=request.user, estado__in=TrabajoExportacion.ACTIVOS).count()
+    if activos >= limite:
+        raise LimiteExportaciones(f'Ya tiene {activos} exportaciones en curso (máximo {limite})')
+
+    try:
+        with transaction.atomic():
+            return TrabajoExportacion.objects.create(
+                usuario=request.user,
+                recurso=vista.nombre_exportacion,
+                vista=ruta_vista,
+                formato=formato,
+                parametros=parametros,
+                huella=valor,
+            )
+    except IntegrityError:
+        # Otra solicitud idéntica se encoló entre la consulta y el INSERT
+        existente = _activo(valor)
+        if existente is None:
+            raise
+        return existente
+
+
+# --- Worker ---------------------------------------------------------------
+
+def reclamar():
+    """Marca EN_PROCESO y retorna el siguiente trabajo disponible, o None."""
+    limite = _config('EXPORT_MAX_CONCURRENTES_POR_USUARIO', 1)
+    ocupados = (
+        TrabajoExportacion.objects.filter(estado=Estado.EN_PROCESO)
+        .values('usuario').annotate(n=Count('pk')).filter(n__gte=limite).values('usuario')
+    )
+    candidatos = (
+        TrabajoExportacion.objects.filter(estado=Estado.PENDIENTE)
+        .exclude(usuario__in=ocupados).order_by('creado')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidatos:
+        ahora = timezone.now()
+        reclamado = TrabajoExportacion.objects.filter(pk=pk, estado=Estado.PENDIENTE).update(
+            estado=Estado.EN_PROCESO, iniciado=ahora, latido=ahora, intentos=F('intentos') + 1,
+        )
+        if reclamado:
+            return TrabajoExportacion.objects.select_related('usuario').get(pk=pk)
+    return None
+
+
+def _vista(trabajo):
+    """Instancia el ViewSet del trabajo con un request equivalente al original."""
+    clase = import_string(trabajo.vista)
+    request = Request(APIRequestFactory().get('/', trabajo.parametros))
+    request.user = trabajo.usuario
+    return clase(request=request, action=FORMATOS[trabajo.formato], format_kwarg=None, args=(), kwargs={})
+
+
+def _en_curso(trabajo):
+    """Filtro del intento actual: sigue EN_PROCESO y nadie lo reencoló."""
+    return TrabajoExportacion.objects.filter(pk=trabajo.pk, estado=Estado.EN_PROCESO, intentos=trabajo.intentos)
+
+
+class _Latido(threading.Thread):
+    """Actualiza `latido` del trabajo cada EXPORT_LATIDO_SEGUNDOS hasta `detener()`."""
+
+    def __init__(self, trabajo):
+        super().__init__(name=f'latido-{trabajo.pk}', daemon=True)
+        self.trabajo = trabajo
+        self._detener = threading.Event()
+
+    def run(self):
+        intervalo = _config('EXPORT_LATIDO_SEGUNDOS', 30)
+        try:
+            while not self._detener.wait(intervalo):
+                if not _en_curso(self.trabajo).update(latido=timezone.now()):
+                    return
+        except Exception:
+            logger.exception('No se pudo registrar el latido de la exportación %s', self.trabajo.pk)
+        finally:
+            connection.close()
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def procesar(trabajo):
+    storage = almacenamiento()
+    nombre = f'{trabajo.pk}.{trabajo.formato}'
+    ruta = storage.path(nombre)
+    parcial = f'{ruta}.{trabajo.intentos}.parcial'
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    latido = _Latido(trabajo)
+    latido.start()
+    try:
+        # Como la exportación en el request: lee de una réplica si hay
+        with replicas.lectura(trabajo.usuario):
+            vista = _vista(trabajo)
+            queryset = vista.queryset_exportacion()
+            if trabajo.formato == 'csv':
+                with open(parcial, 'w', encoding='utf-8', newline='') as archivo:
+                    filas = escribir_csv(archivo, queryset, vista.columnas_exportacion)
+            else:
+                with open(parcial, 'wb') as archivo:
+                    filas = escribir_excel(
+                        archivo, queryset, vista.columnas_exportacion, vista.nombre_exportacion.capitalize(),
+                    )
+        if not _en_curso(trabajo).exists():
+            # Reencolado mientras escribíamos: el archivo es del intento vigente
+            os.remove(parcial)
+            return trabajo
+        os.replace(parcial, ruta)
+    except Exception as exc:
+        logger.exception('Falló la exportación %s', trabajo.pk)
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        _terminar(trabajo, Estado.FALLIDO, error=str(exc)[:1000])
+        return trabajo
+    finally:
+        latido.detener()
+
+    _terminar(trabajo, Estado.COMPLETADO, archivo=nombre, filas=filas)
+    return trabajo
+
+
+def _terminar(trabajo, estado, **campos):
+    ahora = timezone.now()
+    campos.update(estado=estado, terminado=ahora, expira=ahora + timedelta(hours=_config('EXPORT_TTL_HORAS', 24)))
+    # Solo si sigue siendo nuestro (no lo reencoló recuperar_colgados)
+    _en_curso(trabajo).update(**campos)
+    for campo, valor in campos.items():
+        setattr(trabajo, campo, valor)
+
+
+def recuperar_colgados():
+    """
+    Trabajos EN_PROCESO sin latido por más de EXPORT_TIMEOUT_TRABAJO (su
+    worker murió): se reintentan o se dan por fallidos. Un trabajo largo con
+    su worker vivo no se toca.
+    """
+    limite = timezone.now() - timedelta(seconds=_config('EXPORT_TIMEOUT_TRABAJO', 300))
+    colgados = TrabajoExportacion.objects.filter(
+        Q(latido__lt=limite) | Q(latido__isnull=True, iniciado__lt=limite), estado=Estado.EN_PROCESO,
+    )
+    reintentos = colgados.filter(intentos__lt=_config('EXPORT_MAX_INTENTOS', 2)).update(estado=Estado.PENDIENTE)
+    ahora = timezone.now()
+    fallidos = colgados.update(
+        estado=Estado.FALLIDO, error='Tiempo de procesamiento agotado', terminado=ahora,
+        expira=ahora + timedelta(hours=_config('EXPORT_TTL_HORAS', 24)),
+    )
+    return reintentos + fallidos
+
+
+def limpiar_vencidos():
+    """Borra los archivos y las filas de trabajos terminados con `expira` vencido."""
+    storage = almacenamiento()
+    vencidos = TrabajoExportacion.objects.filter(
+        estado__in=[Estado.COMPLETADO, Estado.FALLIDO], expira__lt=timezone.now()
+    )
+    borrados = 0
+    for pk, archivo in vencidos.values_list('pk', 'archivo'):
+        if archivo and storage.exists(archivo):
+            storage.delete(archivo)
+        borrados += TrabajoExportacion.objects.filter(pk=pk).delete()[0]
+    return borrados
+
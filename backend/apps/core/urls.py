@@ -1,6 +1,13 @@
-from django.urls import path
-from .views import DashboardView
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import DashboardView, MetricasView, PerfiladoView, TrabajoExportacionViewSet
+
+router = DefaultRouter()
+router.register(r'exportaciones', TrabajoExportacionViewSet, basename='exportacion')
 
 urlpatterns = [
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('perfilado/', PerfiladoView.as_view(), name='perfilado'),
+    path('metricas/', MetricasView.as_view(), name='metricas'),
+    path('', include(router.urls)),
 ]
@@ -1,32 +1,53 @@
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
 from django.db.models import Sum, Count, Q, OuterRef, Subquery
 from backend.apps.donaciones.models import Donacion, Donante
 from backend.apps.finanzas.models import Gasto
 from backend.apps.casos.models import Caso
 from backend.apps.casos.serializers import CasoSerializer
+from backend.apps.casos.finanzas import anotar_finanzas
+from django.conf import settings
+from . import estados, metricas, perfilado
+from .cache import cachear_respuesta
+from .carga import cargar
+from .exports import CONTENT_TYPE_XLSX
+from .replicas import LecturaReplicaMixin
+from .models import TrabajoExportacion
+from .rollups import serie_mensual
+from .secciones import ejecutar as ejecutar_secciones
+from .serializers import TrabajoExportacionSerializer
+from .trabajos import almacenamiento
 
 from datetime import timedelta, datetime
 from django.utils.dateparse import parse_date
-from django.db.models.functions import TruncMonth, Coalesce
+from django.db.models.functions import Coalesce
 
-class DashboardView(APIView):
+class DashboardView(LecturaReplicaMixin, APIView):
     """
     Vista consolidada para el Dashboard principal.
     Soporta filtrado por fecha: ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
     """
+    def usa_replica(self, request):
+        return request.method == 'GET'
+
+    @cachear_respuesta('dashboard')
     def get(self, request):
         start_date_str = request.query_params.get('start_date')
         end_date_str = request.query_params.get('end_date')
 
-        # 1. Definir Estados Validos (Case-insensitive support logic via list expansion)
-        valid_statuses = ['APROBADA', 'Aprobada', 'aprobada', 'Completada', 'COMPLETADA', 'completada']
+        # 1. Estados válidos (valores canónicos, ver core/estados.py)
+        donacion_exitosa = estados.filtro(Donacion, 'exito')
+        gasto_pagado = estados.filtro(Gasto, 'pagado')
         
         # Filtros base
-        donacion_filters = Q(estado__in=valid_statuses)
-        rel_donacion_filters = Q(donaciones__estado__in=valid_statuses)
-        gasto_filters = Q(estado__iexact='PAGADO')
-        rel_gasto_filters = Q(gastos__estado__iexact='PAGADO')
+        donacion_filters = donacion_exitosa
+        rel_donacion_filters = estados.filtro(Donacion, 'exito', 'donaciones__estado')
+        gasto_filters = gasto_pagado
+        rel_gasto_filters = estados.filtro(Gasto, 'pagado', 'gastos__estado')
 
         # 2. Manejo de Fechas y Periodo Anterior
         start_date = parse_date(start_date_str) if start_date_str else None
@@ -61,21 +82,92 @@ class DashboardView(APIView):
             rel_donacion_filters &= Q(donaciones__fecha_donacion__lte=end_date)
             rel_gasto_filters &= Q(gastos__fecha_pago__lte=end_date)
 
-        # 3. Totales Actuales
-        total_donado = Donacion.objects.filter(donacion_filters).aggregate(Sum('monto'))['monto__sum'] or 0
-        total_gastado = Gasto.objects.filter(gasto_filters).aggregate(Sum('monto'))['monto__sum'] or 0
-        balance = total_donado - total_gastado
+        # 3-7. Secciones independientes: se ejecutan en secuencia o, con
+        # DASHBOARD_CONCURRENTE=True, en paralelo (ver core/secciones.py)
+        def totales():
+            donado = Donacion.objects.filter(donacion_filters).aggregate(Sum('monto'))['monto__sum'] or 0
+            gastado = Gasto.objects.filter(gasto_filters).aggregate(Sum('monto'))['monto__sum'] or 0
+            return donado, gastado
 
-        # 4. Totales Periodo Anterior (Solo si hay rango completo)
-        prev_total_donado = 0
-        prev_total_gastado = 0
-        
-        if prev_start_date and prev_end_date:
-            prev_donacion_filters = Q(estado__in=valid_statuses) & Q(fecha_donacion__gte=prev_start_date) & Q(fecha_donacion__lte=prev_end_date)
-            prev_gasto_filters = Q(estado__iexact='PAGADO') & Q(fecha_pago__gte=prev_start_date) & Q(fecha_pago__lte=prev_end_date)
+        # Totales Periodo Anterior (Solo si hay rango completo)
+        def totales_previos():
+            if not (prev_start_date and prev_end_date):
+                return 0, 0
+            prev_donacion_filters = donacion_exitosa & Q(fecha_donacion__gte=prev_start_date) & Q(fecha_donacion__lte=prev_end_date)
+            prev_gasto_filters = gasto_pagado & Q(fecha_pago__gte=prev_start_date) & Q(fecha_pago__lte=prev_end_date)
             
-            prev_total_donado = Donacion.objects.filter(prev_donacion_filters).aggregate(Sum('monto'))['monto__sum'] or 0
-            prev_total_gastado = Gasto.objects.filter(prev_gasto_filters).aggregate(Sum('monto'))['monto__sum'] or 0
+            prev_donado = Donacion.objects.filter(prev_donacion_filters).aggregate(Sum('monto'))['monto__sum'] or 0
+            prev_gastado = Gasto.objects.filter(prev_gasto_filters).aggregate(Sum('monto'))['monto__sum'] or 0
+            return prev_donado, prev_gastado
+
+        # 5. Top Países
+        def top_paises():
+            return list(Donante.objects.values('pais').annotate(
+                count=Count('id_donante'),
+                total_dinero=Sum('donaciones__monto', filter=rel_donacion_filters)
+            ).exclude(total_dinero__isnull=True).order_by('-total_dinero')[:5])
+
+        # 6. Casos Destacados (Solo casos abiertos)
+        # Sin filtro de fecha los totales son históricos y se leen del resumen caso_finanzas;
+        # con rango de fechas se suman con Subqueries sobre las tablas de hechos.
+        def casos_destacados():
+            from decimal import Decimal
+            from django.db.models import DecimalField
+
+            casos_activos = Caso.objects.filter(fecha_salida__isnull=True)
+            if start_date or end_date:
+                sq_recaudado = Donacion.objects.filter(
+                    donacion_filters,
+                    id_caso=OuterRef('pk')
+                ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
+
+                sq_gastado = Gasto.objects.filter(
+                    gasto_filters,
+                    id_caso=OuterRef('pk')
+                ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
+
+                casos_activos = casos_activos.annotate(
+                    total_recaudado=Coalesce(Subquery(sq_recaudado), Decimal('0'), output_field=DecimalField()),
+                    total_gastado=Coalesce(Subquery(sq_gastado), Decimal('0'), output_field=DecimalField())
+                )
+            else:
+                casos_activos = anotar_finanzas(casos_activos)
+            casos_activos = cargar(casos_activos, CasoSerializer)
+            casos_activos = casos_activos.filter(total_recaudado__gt=0).order_by('-total_recaudado')[:5]
+            return CasoSerializer(casos_activos, many=True).data
+
+        # 7. Balance Histórico (Serie Temporal)
+        # Se lee de los rollups mensuales (resumen_mensual); solo los meses
+        # parciales de los extremos del rango se calculan sobre la tabla de hechos.
+        secciones = {
+            'totales': totales,
+            'totales_previos': totales_previos,
+            'top_paises': top_paises,
+            'casos_destacados': casos_destacados,
+            'donaciones_timeline': lambda: serie_mensual(
+                'donaciones', donacion_exitosa, desde=start_date, hasta=end_date
+            ),
+            'gastos_timeline': lambda: serie_mensual(
+                'gastos', gasto_pagado, desde=start_date, hasta=end_date
+            ),
+            'casos_activos_count': lambda: Caso.objects.filter(fecha_salida__isnull=True).count(),
+        }
+        por_defecto = {
+            'totales': (0, 0),
+            'totales_previos': (0, 0),
+            'top_paises': [],
+            'casos_destacados': [],
+            'donaciones_timeline': [],
+            'gastos_timeline': [],
+            'casos_activos_count': 0,
+        }
+        concurrente = getattr(settings, 'DASHBOARD_CONCURRENTE', False)
+        resultado = ejecutar_secciones(secciones, por_defecto, concurrente=concurrente)
+        valores = resultado.valores
+
+        total_donado, total_gastado = valores['totales']
+        balance = total_donado - total_gastado
+        prev_total_donado, prev_total_gastado = valores['totales_previos']
 
         # Función helper para variación
         def calculate_trend(current, previous):
@@ -97,42 +189,8 @@ class DashboardView(APIView):
             "balance_neto": calculate_trend(balance, (prev_total_donado - prev_total_gastado))
         }
 
-        # 5. Top Países
-        top_paises = Donante.objects.values('pais').annotate(
-            count=Count('id_donante'),
-            total_dinero=Sum('donaciones__monto', filter=rel_donacion_filters)
-        ).exclude(total_dinero__isnull=True).order_by('-total_dinero')[:5]
-
-        # 6. Casos Destacados (Solo casos abiertos) using Subqueries to avoid multiple aggregation issues
-        from decimal import Decimal
-        
-        sq_recaudado = Donacion.objects.filter(
-            donacion_filters,
-            id_caso=OuterRef('pk')
-        ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
-
-        sq_gastado = Gasto.objects.filter(
-            gasto_filters,
-            id_caso=OuterRef('pk')
-        ).values('id_caso').annotate(sum=Sum('monto')).values('sum')
-
-        from django.db.models import DecimalField
-        
-        casos_activos = Caso.objects.filter(fecha_salida__isnull=True).annotate(
-            total_recaudado=Coalesce(Subquery(sq_recaudado), Decimal('0'), output_field=DecimalField()),
-            total_gastado=Coalesce(Subquery(sq_gastado), Decimal('0'), output_field=DecimalField())
-        ).filter(total_recaudado__gt=0).order_by('-total_recaudado')[:5]
-
-        # 7. Balance Histórico (Serie Temporal)
-        # Re-use filters but ensure we are grouping by month
-        
-        donaciones_timeline = Donacion.objects.filter(donacion_filters).annotate(
-            mes=TruncMonth('fecha_donacion')
-        ).values('mes').annotate(total=Sum('monto')).order_by('mes')
-
-        gastos_timeline = Gasto.objects.filter(gasto_filters).annotate(
-            mes=TruncMonth('fecha_pago')
-        ).values('mes').annotate(total=Sum('monto')).order_by('mes')
+        donaciones_timeline = valores['donaciones_timeline']
+        gastos_timeline = valores['gastos_timeline']
 
         # Merge timelines
         timeline_dict = {}
@@ -189,17 +247,86 @@ class DashboardView(APIView):
         # } for d in top_donantes_agg]
         top_donantes_data = []
 
-        return Response({
+        data = {
             "kpis": {
                 "total_donado": total_donado,
                 "total_gastado": total_gastado,
                 "balance_neto": balance,
-                "casos_activos_count": Caso.objects.filter(fecha_salida__isnull=True).count()
+                "casos_activos_count": valores['casos_activos_count']
             },
             "trends": trends,
-            "top_paises": top_paises,
-            "casos_destacados": CasoSerializer(casos_activos, many=True).data,
+            "top_paises": valores['top_paises'],
+            "casos_destacados": valores['casos_destacados'],
             "balance_historico": balance_historico,
             "gastos_por_categoria": list(gastos_por_categoria),
             "top_donantes": top_donantes_data
+        }
+        # Respuesta parcial: alguna sección falló o excedió su timeout (no se cachea)
+        if resultado.parcial:
+            data["parcial"] = True
+            data["secciones_fallidas"] = sorted(resultado.fallidas)
+        if settings.DEBUG:
+            data["meta"] = resultado.meta('concurrente' if concurrente else 'secuencial')
+        response = Response(data)
+        response.no_cachear = resultado.parcial
+        return response
+
+
+class TrabajoExportacionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Estado y descarga de las exportaciones asíncronas del usuario
+    (`exportar_csv?async=1`, `exportar_excel?async=1`).
+    """
+    serializer_class = TrabajoExportacionSerializer
+    filter_backends = []
+
+    def get_queryset(self):
+        return TrabajoExportacion.objects.filter(usuario=self.request.user).order_by('-creado')
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        trabajo = self.get_object()
+        if trabajo.estado != TrabajoExportacion.Estado.COMPLETADO:
+            return Response({'detail': f'La exportación está {trabajo.get_estado_display().lower()}'},
+                            status=status.HTTP_409_CONFLICT)
+        storage = almacenamiento()
+        if not trabajo.archivo or not storage.exists(trabajo.archivo):
+            return Response({'detail': 'El archivo de la exportación ya no está disponible'}, status=status.HTTP_410_GONE)
+        return FileResponse(
+            storage.open(trabajo.archivo, 'rb'),
+            as_attachment=True,
+            filename=f'{trabajo.recurso}_{timezone.localdate(trabajo.creado)}.{trabajo.formato}',
+            content_type='text/csv' if trabajo.formato == 'csv' else CONTENT_TYPE_XLSX,
+        )
+
+
+class PerfiladoView(APIView):
+    """
+    Reporte del perfilado por request (core/perfilado.py) de este proceso:
+    tiempos medios por fase y consultas más lentas de cada endpoint. DELETE
+    lo reinicia.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'habilitado': getattr(settings, 'PROFILING_ENABLED', False),
+            'muestreo': getattr(settings, 'PROFILING_SAMPLE_RATE', 1.0),
+            'endpoints': perfilado.reporte(),
         })
+
+    def delete(self, request):
+        perfilado.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricasView(APIView):
+    """
+    Métricas de todos los workers en formato de texto de Prometheus
+    (core/metricas.py). Prometheus puede autenticarse con basic auth de un
+    usuario staff.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metricas.exponer(), content_type=metricas.CONTENT_TYPE)
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:35
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Alias históricos de estado (copia de core.estados.ALIAS al momento de la migración)
+ALIAS = {
+    'COMPLETADA': 'APROBADA',
+    'COMPLETADO': 'APROBADA',
+    'CONFIRMADA': 'APROBADA',
+    'CONFIRMADO': 'APROBADA',
+    'EXITOSA': 'APROBADA',
+    'EXITOSO': 'APROBADA',
+    'APROBADO': 'APROBADA',
+    'RECHAZADO': 'RECHAZADA',
+    'CANCELADA': 'RECHAZADA',
+    'CANCELADO': 'RECHAZADA',
+    'FALLIDO': 'FALLIDA',
+    'ERROR': 'FALLIDA',
+}
+
+
+def normalizar(valor):
+    limpio = ' '.join(str(valor).split())
+    if not limpio:
+        return None
+    limpio = limpio.upper().replace(' ', '_')
+    return ALIAS.get(limpio, limpio)
+
+
+def normalizar_estados(apps, schema_editor):
+    # Copia congelada de core.estados.normalizar_tabla: reescribe por lotes
+    # (por pk) los estados no canónicos
+    Donacion = apps.get_model('donaciones', 'Donacion')
+    canonicos = {valor for valor, _ in Donacion._meta.get_field('estado').choices}
+    pendientes = Donacion._base_manager.exclude(estado__in=canonicos).exclude(estado__isnull=True).order_by('pk')
+    ultimo = None
+    while True:
+        lote_qs = pendientes.filter(pk__gt=ultimo) if ultimo is not None else pendientes
+        lote = list(lote_qs.values_list('pk', 'estado')[:1000])
+        if not lote:
+            return
+        por_valor = defaultdict(list)
+        for pk, valor in lote:
+            nuevo = normalizar(valor)
+            if nuevo != valor:
+                por_valor[nuevo].append(pk)
+        for nuevo, pks in por_valor.items():
+            Donacion._base_manager.filter(pk__in=pks).update(estado=nuevo)
+        ultimo = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donaciones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='donacion',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('APROBADA', 'Aprobada'), ('PENDIENTE', 'Pendiente'), ('RECHAZADA', 'Rechazada'), ('FALLIDA', 'Fallida')], max_length=50, null=True),
+        ),
+        migrations.RunPython(normalizar_estados, migrations.RunPython.noop),
+    ]
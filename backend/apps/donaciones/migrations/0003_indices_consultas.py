@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0004_indices_consultas'),
+        ('donaciones', '0002_estado_canonico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donacion',
+            index=models.Index(fields=['estado', 'fecha_donacion'], include=('monto',), name='donaciones_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donacion',
+            index=models.Index(fields=['fecha_donacion'], include=('estado', 'monto', 'id_donante'), name='donaciones_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donacion',
+            index=models.Index(fields=['id_caso', 'estado'], include=('monto', 'fecha_donacion'), name='donaciones_caso_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donacion',
+            index=models.Index(fields=['id_donante', 'estado'], include=('monto',), name='donaciones_donante_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donante',
+            index=models.Index(fields=['created_at'], name='donantes_created_idx'),
+        ),
+        # Con los índices compuestos creados, se quitan los índices simples de las FK (ya cubiertos)
+        migrations.AlterField(
+            model_name='donacion',
+            name='id_caso',
+            field=models.ForeignKey(blank=True, db_column='id_caso', db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='donaciones', to='casos.caso'),
+        ),
+        migrations.AlterField(
+            model_name='donacion',
+            name='id_donante',
+            field=models.ForeignKey(blank=True, db_column='id_donante', db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='donaciones', to='donaciones.donante'),
+        ),
+    ]
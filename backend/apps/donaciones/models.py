@@ -1,8 +1,8 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from backend.apps.core.models import TimeStampedModel
+from backend.apps.core.models import TrackedModel
 
-class Donante(TimeStampedModel):
+class Donante(TrackedModel):
     """
     Representa a un donante en el sistema CRM.
     """
@@ -37,13 +37,17 @@ class Donante(TimeStampedModel):
 
     class Meta:
         db_table = 'donantes'
+        indexes = [
+            # Listado por defecto (ordering -created_at) y cohortes por fecha de alta
+            models.Index(fields=['created_at'], name='donantes_created_idx'),
+        ]
         verbose_name = _('Donante')
         verbose_name_plural = _('Donantes')
 
     def __str__(self):
         return str(self.donante)
 
-class Donacion(TimeStampedModel):
+class Donacion(TrackedModel):
     """
     Registra una donación financiera recibida por la fundación.
     """
@@ -51,6 +55,7 @@ class Donacion(TimeStampedModel):
         APROBADA = 'APROBADA', _('Aprobada')
         PENDIENTE = 'PENDIENTE', _('Pendiente')
         RECHAZADA = 'RECHAZADA', _('Rechazada')
+        FALLIDA = 'FALLIDA', _('Fallida')
 
     class MedioPago(models.TextChoices):
         EFECTIVO = 'EFECTIVO', _('Efectivo')
@@ -63,9 +68,9 @@ class Donacion(TimeStampedModel):
 
     id_donacion = models.AutoField(primary_key=True)
     # FK interna
-    id_donante = models.ForeignKey(Donante, on_delete=models.CASCADE, db_column='id_donante', null=True, blank=True, related_name='donaciones')
+    id_donante = models.ForeignKey(Donante, on_delete=models.CASCADE, db_column='id_donante', null=True, blank=True, related_name='donaciones', db_index=False)
     # FK externa a Casos
-    id_caso = models.ForeignKey('casos.Caso', on_delete=models.CASCADE, db_column='id_caso', null=True, blank=True, related_name='donaciones')
+    id_caso = models.ForeignKey('casos.Caso', on_delete=models.CASCADE, db_column='id_caso', null=True, blank=True, related_name='donaciones', db_index=False)
     
     fecha_donacion = models.DateField(null=True, blank=True)
     monto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
@@ -75,6 +80,19 @@ class Donacion(TimeStampedModel):
 
     class Meta:
         db_table = 'donaciones'
+        # Los índices (id_caso, estado) e (id_donante, estado) cubren también
+        # las búsquedas por FK, por eso las FK no tienen índice propio.
+        # INCLUDE (solo PostgreSQL) permite index-only scans en las sumas.
+        indexes = [
+            # Dashboard: estado exitoso + rango de fechas
+            models.Index(fields=['estado', 'fecha_donacion'], include=['monto'], name='donaciones_estado_fecha_idx'),
+            # KPIs: solo rango de fechas, los estados van en FILTER (...)
+            models.Index(fields=['fecha_donacion'], include=['estado', 'monto', 'id_donante'], name='donaciones_fecha_idx'),
+            # caso_finanzas y subconsultas por caso
+            models.Index(fields=['id_caso', 'estado'], include=['monto', 'fecha_donacion'], name='donaciones_caso_estado_idx'),
+            # Totales y cohortes por donante
+            models.Index(fields=['id_donante', 'estado'], include=['monto'], name='donaciones_donante_estado_idx'),
+        ]
         verbose_name = _('Donación')
         verbose_name_plural = _('Donaciones')
 
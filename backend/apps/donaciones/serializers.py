@@ -1,7 +1,52 @@
 from rest_framework import serializers
+from django.db import models
 from django.db.models import Sum, Count, Avg, Max
 from .models import Donante, Donacion
 from backend.apps.casos.models import Caso
+from backend.apps.core import estados
+from backend.apps.core.serializers import EstadoField
+
+ESTADISTICAS_DONANTE = ('total_donado', 'cantidad_donaciones', 'promedio_donacion', 'ultima_donacion')
+
+
+def _agregados_estadisticas():
+    exito = estados.filtro(Donacion, 'exito')
+    return {
+        'total_donado': Sum('monto', filter=exito),
+        'cantidad_donaciones': Count('pk', filter=exito),
+        'promedio_donacion': Avg('monto', filter=exito),
+        'ultima_donacion': Max('fecha_donacion', filter=exito),
+    }
+
+
+def cargar_estadisticas(donantes):
+    """
+    Calcula en una consulta (GROUP BY id_donante sobre las donaciones de la
+    página) las estadísticas que muestra `DonanteSerializer` y las deja en
+    cada instancia. El queryset paginado queda sin JOIN: el COUNT del
+    paginador no agrupa toda la tabla.
+    """
+    pendientes = {d.pk: d for d in donantes if not hasattr(d, 'total_donado')}
+    if not pendientes:
+        return
+    using = next(iter(pendientes.values()))._state.db
+    filas = (
+        Donacion.objects.using(using).filter(id_donante__in=pendientes)
+        .values('id_donante').annotate(**_agregados_estadisticas()).order_by()
+    )
+    datos = {fila['id_donante']: fila for fila in filas}
+    for pk, donante in pendientes.items():
+        fila = datos.get(pk, {})
+        for campo in ESTADISTICAS_DONANTE:
+            setattr(donante, campo, fila.get(campo))
+
+
+class DonanteListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        donantes = list(data.all() if isinstance(data, models.Manager) else data)
+        cargar_estadisticas(donantes)
+        return super().to_representation(donantes)
+
 
 class DonanteSerializer(serializers.ModelSerializer):
     total_donado = serializers.SerializerMethodField()
@@ -12,29 +57,29 @@ class DonanteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Donante
         fields = '__all__'
+        list_serializer_class = DonanteListSerializer
 
-    def _get_donaciones_validas(self, obj):
-        estados_validos = [
-            'APROBADA', 'Aprobada', 'aprobada', 
-            'COMPLETADO', 'Completado', 'completado', 'Completada',
-            'CONFIRMADO', 'Confirmado', 'confirmado',
-            'EXITOSA', 'Exitosa', 'exitosa'
-        ]
-        return obj.donaciones.filter(estado__in=estados_validos)
+    def _estadistica(self, obj, nombre):
+        # Instancia suelta (retrieve, tras crear/actualizar): una sola consulta
+        # calcula las cuatro y se guardan en la instancia
+        if not hasattr(obj, nombre):
+            datos = Donacion.objects.filter(id_donante=obj.pk).aggregate(**_agregados_estadisticas())
+            for campo in ESTADISTICAS_DONANTE:
+                setattr(obj, campo, datos[campo])
+        return getattr(obj, nombre)
 
     def get_total_donado(self, obj):
-        total = self._get_donaciones_validas(obj).aggregate(Sum('monto'))['monto__sum']
-        return total or 0
+        return self._estadistica(obj, 'total_donado') or 0
 
     def get_cantidad_donaciones(self, obj):
-        return self._get_donaciones_validas(obj).count()
+        return self._estadistica(obj, 'cantidad_donaciones') or 0
 
     def get_promedio_donacion(self, obj):
-        promedio = self._get_donaciones_validas(obj).aggregate(Avg('monto'))['monto__avg']
+        promedio = self._estadistica(obj, 'promedio_donacion')
         return round(promedio, 2) if promedio else 0
 
     def get_ultima_donacion(self, obj):
-        return self._get_donaciones_validas(obj).aggregate(Max('fecha_donacion'))['fecha_donacion__max']
+        return self._estadistica(obj, 'ultima_donacion')
 
 class DonacionSerializer(serializers.ModelSerializer):
     # Campos obligatorios para la API (aunque sean opcionales en BD)
@@ -45,9 +90,14 @@ class DonacionSerializer(serializers.ModelSerializer):
     donante_nombre = serializers.ReadOnlyField(source='id_donante.donante')
     caso_nombre = serializers.ReadOnlyField(source='id_caso.nombre_caso')
 
+    # Acepta alias ('aprobada', 'Completada'...) y guarda el estado canónico
+    estado = EstadoField(Donacion)
+
     class Meta:
         model = Donacion
         fields = '__all__'
+        # FK que leen los campos de solo lectura (ver core/carga.py)
+        relaciones = {'id_donante': ('donante',), 'id_caso': ('nombre_caso',)}
 
     def validate_monto(self, value):
         if value <= 0:
@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from backend.apps.casos.models import Caso
+from backend.apps.core.carga import cargar, verificar_consultas
+from backend.apps.core.pruebas import ApiTestCase
+from backend.apps.core.rollups import serie_mensual
+
+from .models import Donacion, Donante
+from .serializers import DonacionSerializer
+from .views import KPIS_DONACIONES
+
+INICIO, FIN = date(2024, 1, 15), date(2024, 6, 20)
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=False)
+class KPIsDonacionesTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        donantes = [Donante.objects.create(donante=f'Donante {i}', identificacion=str(100 + i)) for i in range(3)]
+        for i in range(12):
+            Donacion.objects.create(
+                id_donante=donantes[i % 3], fecha_donacion=date(2024, 1 + i % 6, 10 + i), monto=Decimal(1000 * (i + 1)),
+                estado=('APROBADA', 'RECHAZADA', 'PENDIENTE')[i % 3],
+            )
+
+    def test_metricas_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            actual, anterior = KPIS_DONACIONES.calcular(Donacion.objects.all(), INICIO, FIN)
+        self.assertGreater(actual['cantidad_exitosas'], 0)
+
+    def test_endpoint_metricas_mas_serie(self):
+        # La serie mensual (rollups y bordes de mes) se cuenta aparte
+        with CaptureQueriesContext(connection) as serie:
+            serie_mensual('donaciones', KPIS_DONACIONES.buckets['exito'], desde=INICIO, hasta=FIN)
+        with self.assertNumQueries(1 + len(serie)):
+            respuesta = self.client.get('/api/donaciones/kpis/', {'start_date': INICIO, 'end_date': FIN})
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class ListadoDonantesTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(25):
+            donante = Donante.objects.create(donante=f'Donante {i}', identificacion=str(500 + i))
+            for j in range(i % 4):
+                Donacion.objects.create(
+                    id_donante=donante, fecha_donacion=date(2024, 1 + j, 5), monto=Decimal(1000 * (j + 1)),
+                    estado='APROBADA',
+                )
+
+    def test_consultas_constantes_por_pagina(self):
+        # Conteo + página + estadísticas de la página: sin N+1 por donante
+        for page_size in (2, 20):
+            with self.subTest(page_size=page_size), self.assertNumQueries(3):
+                respuesta = self.client.get('/api/donantes/', {'page_size': page_size})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(len(respuesta.data['results']), page_size)
+
+    def test_conteo_sin_join_ni_group_by(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get('/api/donantes/', {'page_size': 5})
+        conteo = next(c['sql'] for c in consultas if 'COUNT(' in c['sql'] and 'donantes' in c['sql'])
+        self.assertNotIn('JOIN', conteo)
+        self.assertNotIn('GROUP BY', conteo)
+
+    def test_estadisticas_de_la_pagina(self):
+        respuesta = self.client.get('/api/donantes/', {'page_size': 100})
+        por_nombre = {fila['donante']: fila for fila in respuesta.data['results']}
+        self.assertEqual(por_nombre['Donante 3']['cantidad_donaciones'], 3)
+        self.assertEqual(por_nombre['Donante 3']['total_donado'], Decimal(6000))
+        self.assertEqual(por_nombre['Donante 4']['cantidad_donaciones'], 0)
+        detalle = self.client.get(f"/api/donantes/{por_nombre['Donante 3']['id_donante']}/")
+        self.assertEqual(detalle.data['total_donado'], Decimal(6000))
+
+
+class DonacionSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Un donante y un caso distintos por fila: una FK sin cargar se nota
+        for i in range(5):
+            Donacion.objects.create(
+                id_donante=Donante.objects.create(donante=f'Donante {i}', identificacion=str(700 + i)),
+                id_caso=Caso.objects.create(nombre_caso=f'Caso {i}'),
+                fecha_donacion=date(2024, 2, 1 + i), monto=Decimal(1000), estado='APROBADA',
+            )
+
+    def test_sin_n_mas_1(self):
+        verificar_consultas(DonacionSerializer, cargar(Donacion.objects.all(), DonacionSerializer), filas=5)
@@ -4,15 +4,52 @@ from rest_framework.response import Response
 from django.db.models import Sum
 from .models import Donante, Donacion
 from .serializers import DonanteSerializer, DonacionSerializer
-
-class DonanteViewSet(viewsets.ModelViewSet):
+from backend.apps.core import estados
+from backend.apps.core.kpis import KPISpec, Metrica
+from backend.apps.core.cache import cachear_respuesta
+from backend.apps.core.carga import CargaAnticipadaMixin, cargar
+from backend.apps.core.exports import Columna, ExportacionMixin
+from backend.apps.core.lotes import LoteMixin
+from backend.apps.core.replicas import LecturaReplicaMixin
+
+# KPIs de donaciones: buckets por estado y métricas por periodo (ver core/kpis.py)
+KPIS_DONACIONES = KPISpec(
+    campo_fecha='fecha_donacion',
+    buckets={
+        'exito': estados.filtro(Donacion, 'exito'),
+        'rechazo': estados.filtro(Donacion, 'rechazo'),
+        'fallo': estados.filtro(Donacion, 'fallo'),
+    },
+    metricas={
+        'total_recaudado': Metrica('sum', 'monto', 'exito'),
+        'promedio_donacion': Metrica('avg', 'monto', 'exito'),
+        'cantidad_exitosas': Metrica('count', bucket='exito'),
+        'cantidad_rechazadas': Metrica('count', bucket='rechazo'),
+        'cantidad_fallidas': Metrica('count', bucket='fallo'),
+        'donantes_unicos': Metrica('distinct', 'id_donante', 'exito'),
+    },
+)
+
+class DonanteViewSet(LecturaReplicaMixin, ExportacionMixin, viewsets.ModelViewSet):
     queryset = Donante.objects.all()
     serializer_class = DonanteSerializer
     search_fields = ['donante', 'identificacion', 'correo', 'ciudad']
     filterset_fields = ['tipo_id', 'tipo_donante', 'ciudad']
     ordering = ['-created_at']
+    nombre_exportacion = 'donantes'
+    columnas_exportacion = [
+        Columna('ID', 'id_donante'),
+        Columna('Nombre', 'donante'),
+        Columna('Identificación', ('tipo_id', 'identificacion'), lambda tipo, numero: f"{tipo} {numero}"),
+        Columna('Correo', 'correo'),
+        Columna('Teléfono', 'telefono'),
+        Columna('Tipo', 'tipo_donante'),
+        Columna('Ciudad', 'ciudad'),
+    ]
 
     def get_queryset(self):
+        # Las estadísticas de donaciones se calculan por página (ver
+        # DonanteListSerializer): el queryset paginado no lleva JOIN
         queryset = super().get_queryset()
         # Support both naming conventions
         start_date = self.request.query_params.get('start_date') or self.request.query_params.get('fecha_desde')
@@ -35,10 +72,11 @@ class DonanteViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cachear_respuesta('donantes.kpis', params=('start_date', 'end_date'))
     def kpis(self, request):
         """KPIs de donantes (Cohorte Analysis)"""
         from django.utils import timezone
-        from django.db.models import Sum, Max, Count, Q
+        from django.db.models import Sum, Max, Count
         
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -51,12 +89,7 @@ class DonanteViewSet(viewsets.ModelViewSet):
             qs_donantes = qs_donantes.filter(created_at__date__lte=end_date)
 
         # Estados válidos para cálculos financieros
-        estados_validos = [
-            'APROBADA', 'Aprobada', 'aprobada', 
-            'COMPLETADO', 'Completado', 'completado', 'Completada',
-            'CONFIRMADO', 'Confirmado', 'confirmado',
-            'EXITOSA', 'Exitosa', 'exitosa'
-        ]
+        donacion_exitosa = estados.filtro(Donacion, 'exito')
 
         # 1. Básicos de la Cohorte
         total_donantes = qs_donantes.count()
@@ -65,7 +98,7 @@ class DonanteViewSet(viewsets.ModelViewSet):
         
         # Recurrentes en esta cohorte (Donantes creados en X fecha que se volvieron recurrentes)
         recurrentes = qs_donantes.annotate(
-            num_validas=Count('donaciones', filter=Q(donaciones__estado__in=estados_validos))
+            num_validas=Count('donaciones', filter=estados.filtro(Donacion, 'exito', 'donaciones__estado'))
         ).filter(num_validas__gt=1).count()
 
         # Nuevos este mes (Si hay filtro, mostramos total del filtro como 'Nuevos en Periodo')
@@ -85,16 +118,16 @@ class DonanteViewSet(viewsets.ModelViewSet):
         donantes_ids = qs_donantes.values_list('id_donante', flat=True)
         
         total_recaudado_cohorte = Donacion.objects.filter(
-            id_donante__in=donantes_ids,
-            estado__in=estados_validos
+            donacion_exitosa,
+            id_donante__in=donantes_ids
         ).aggregate(Sum('monto'))['monto__sum'] or 0
         
         ltv_promedio = total_recaudado_cohorte / total_donantes if total_donantes > 0 else 0
 
         # Mayor donación realizada por alguien de esta cohorte
         mayor_donacion = Donacion.objects.filter(
-            id_donante__in=donantes_ids,
-            estado__in=estados_validos
+            donacion_exitosa,
+            id_donante__in=donantes_ids
         ).aggregate(Max('monto'))['monto__max'] or 0
 
         return Response({
@@ -109,70 +142,11 @@ class DonanteViewSet(viewsets.ModelViewSet):
     def donaciones(self, request, pk=None):
         """Historial de donaciones de un donante específico"""
         donante = self.get_object()
-        donaciones = donante.donaciones.all().order_by('-fecha_donacion')
+        donaciones = cargar(donante.donaciones.all(), DonacionSerializer).order_by('-fecha_donacion')
         serializer = DonacionSerializer(donaciones, many=True)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar donantes a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="donantes_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Nombre', 'Identificación', 'Correo', 'Teléfono', 'Tipo', 'Ciudad'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        for obj in queryset:
-            writer.writerow([
-                obj.id_donante,
-                obj.donante,
-                f"{obj.tipo_id} {obj.identificacion}",
-                obj.correo,
-                obj.telefono,
-                obj.tipo_donante,
-                obj.ciudad
-            ])
-        return response
-
-    @action(detail=False, methods=['get'])
-    def exportar_excel(self, request):
-        """Exportar donantes a Excel (.xlsx)"""
-        import openpyxl
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="donantes_{timezone.now().date()}.xlsx"'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Donantes"
-        
-        ws.append(['ID', 'Nombre', 'Identificación', 'Correo', 'Teléfono', 'Tipo', 'Ciudad'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        for obj in queryset:
-            ws.append([
-                obj.id_donante,
-                obj.donante,
-                f"{obj.tipo_id} {obj.identificacion}",
-                obj.correo,
-                obj.telefono,
-                obj.tipo_donante,
-                obj.ciudad
-            ])
-            
-        wb.save(response)
-        return response
-
-class DonacionViewSet(viewsets.ModelViewSet):
+class DonacionViewSet(LecturaReplicaMixin, CargaAnticipadaMixin, ExportacionMixin, LoteMixin, viewsets.ModelViewSet):
     queryset = Donacion.objects.all()
     serializer_class = DonacionSerializer
     filterset_fields = ['estado', 'medio_pago', 'fecha_donacion']
@@ -186,6 +160,16 @@ class DonacionViewSet(viewsets.ModelViewSet):
     ]
     ordering_fields = ['monto', 'fecha_donacion']
     ordering = ['-fecha_donacion']
+    nombre_exportacion = 'donaciones'
+    columnas_exportacion = [
+        Columna('ID', 'id_donacion'),
+        Columna('Donante', 'id_donante__donante', si_nulo='Anónimo'),
+        Columna('Caso', 'id_caso__nombre_caso', si_nulo='-'),
+        Columna('Monto', 'monto'),
+        Columna('Fecha', 'fecha_donacion'),
+        Columna('Estado', 'estado'),
+        Columna('Medio Pago', 'medio_pago'),
+    ]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -197,193 +181,61 @@ class DonacionViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+    def filtrar_exportacion(self, queryset):
+        # Filtros de fecha manuales
+        fecha_desde = self.request.query_params.get('fecha_desde')
+        fecha_hasta = self.request.query_params.get('fecha_hasta')
+        if fecha_desde:
+            queryset = queryset.filter(fecha_donacion__gte=fecha_desde)
+        if fecha_hasta:
+            queryset = queryset.filter(fecha_donacion__lte=fecha_hasta)
+        return queryset
+
     @action(detail=False, methods=['get'])
+    @cachear_respuesta('donaciones.kpis')
     def kpis(self, request):
         """Retorna indicadores clave + Gráfico de serie temporal"""
-        from django.db.models import Avg, Sum, Count
-        from django.db.models.functions import TruncMonth
-        from datetime import timedelta, date
-        from django.utils.dateparse import parse_date
-        from django.utils import timezone
-        import calendar
-
-        # Helpers
-        def subtract_month(dt):
-            year = dt.year
-            month = dt.month
-            if month == 1:
-                year -= 1
-                month = 12
-            else:
-                month -= 1
-            
-            # Ajustar al último día del mes si es necesario
-            last_day = calendar.monthrange(year, month)[1]
-            day = min(dt.day, last_day)
-            return date(year, month, day)
-
-        # 1. Filtros de Fecha
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        
-        if start_date_str and end_date_str:
-            fecha_inicio = parse_date(start_date_str)
-            fecha_fin = parse_date(end_date_str)
-        else:
-            fecha_fin = timezone.now().date()
-            fecha_inicio = fecha_fin.replace(month=1, day=1) # Por defecto año actual
+        from backend.apps.core.kpis import calcular_variacion, periodo_desde_params
+        from backend.apps.core.rollups import serie_mensual
 
-        # Calcular periodo anterior (Month over Month)
-        prev_fecha_inicio = subtract_month(fecha_inicio)
-        prev_fecha_fin = subtract_month(fecha_fin)
+        # 1. Filtros de Fecha (por defecto año actual) y periodo anterior (Month over Month)
+        fecha_inicio, fecha_fin = periodo_desde_params(request.query_params)
 
-        # Base Querysets
-        base_queryset = Donacion.objects.filter(fecha_donacion__range=[fecha_inicio, fecha_fin])
-        base_prev_queryset = Donacion.objects.filter(fecha_donacion__range=[prev_fecha_inicio, prev_fecha_fin])
+        # 2. Métricas de ambos periodos en una sola consulta
+        actual, anterior = KPIS_DONACIONES.calcular(Donacion.objects.all(), fecha_inicio, fecha_fin)
 
-        # Definición de estados
-        estados_exito = ['APROBADA', 'Aprobada', 'aprobada', 'COMPLETADA', 'Completada', 'completada']
-        estados_rechazo = ['RECHAZADA', 'Rechazada', 'rechazada', 'CANCELADA', 'Cancelada', 'cancelada']
-        estados_fallidos = ['FALLIDA', 'Fallida', 'fallida', 'ERROR', 'Error', 'error']
+        total_intentos = actual['cantidad_exitosas'] + actual['cantidad_rechazadas'] + actual['cantidad_fallidas']
+        total_intentos_prev = anterior['cantidad_exitosas'] + anterior['cantidad_rechazadas'] + anterior['cantidad_fallidas']
 
-        # --- A. Periodo ACTUAL ---
-        qs_exitosas = base_queryset.filter(estado__in=estados_exito)
-        qs_rechazadas = base_queryset.filter(estado__in=estados_rechazo)
-        qs_fallidas = base_queryset.filter(estado__in=estados_fallidos)
+        def variacion(metrica):
+            return round(calcular_variacion(actual[metrica], anterior[metrica]), 1)
 
-        total_recaudado = qs_exitosas.aggregate(sum=Sum('monto'))['sum'] or 0
-        promedio_donacion = qs_exitosas.aggregate(avg=Avg('monto'))['avg'] or 0
-        cantidad_exitosas = qs_exitosas.count()
-        cantidad_rechazadas = qs_rechazadas.count()
-        cantidad_fallidas = qs_fallidas.count()
-        donantes_unicos = qs_exitosas.values('id_donante').distinct().count()
-
-        # --- B. Periodo ANTERIOR ---
-        qs_exitosas_prev = base_prev_queryset.filter(estado__in=estados_exito)
-        qs_rechazadas_prev = base_prev_queryset.filter(estado__in=estados_rechazo)
-        qs_fallidas_prev = base_prev_queryset.filter(estado__in=estados_fallidos)
-
-        total_recaudado_prev = qs_exitosas_prev.aggregate(sum=Sum('monto'))['sum'] or 0
-        promedio_donacion_prev = qs_exitosas_prev.aggregate(avg=Avg('monto'))['avg'] or 0
-        cantidad_exitosas_prev = qs_exitosas_prev.count()
-        cantidad_rechazadas_prev = qs_rechazadas_prev.count()
-        cantidad_fallidas_prev = qs_fallidas_prev.count()
-        donantes_unicos_prev = qs_exitosas_prev.values('id_donante').distinct().count()
-
-        # --- C. Variaciones ---
-        def calc_var(actual, prev):
-            if not prev or float(prev) == 0: 
-                return 100.0 if actual and float(actual) > 0 else 0.0
-            return ((float(actual) - float(prev)) / float(prev)) * 100.0
-
-        overview_data = qs_exitosas.annotate(mes=TruncMonth('fecha_donacion')).values('mes').annotate(
-            total=Sum('monto'), cantidad=Count('id_donacion')
-        ).order_by('mes')
+        # Serie mensual desde los rollups (resumen_mensual)
+        overview_data = serie_mensual(
+            'donaciones', KPIS_DONACIONES.buckets['exito'], desde=fecha_inicio, hasta=fecha_fin
+        )
 
         grafico = [
-            {"fecha": item['mes'].strftime('%Y-%m') if item['mes'] else 'S/F', "monto": item['total'], "cantidad": item['cantidad']}
-            for item in overview_data if item['mes']
+            {"fecha": item['mes'].strftime('%Y-%m'), "monto": item['total'], "cantidad": item['cantidad']}
+            for item in overview_data
         ]
 
         return Response({
-            "total_recaudado": float(total_recaudado),
-            "promedio_donacion": float(promedio_donacion),
-            "cantidad_donaciones": cantidad_exitosas,
-            "cantidad_exitosas": cantidad_exitosas,
-            "cantidad_rechazadas": cantidad_rechazadas,
-            "cantidad_fallidas": cantidad_fallidas,
-            "donantes_unicos": donantes_unicos,
+            "total_recaudado": float(actual['total_recaudado']),
+            "promedio_donacion": float(actual['promedio_donacion']),
+            "cantidad_donaciones": actual['cantidad_exitosas'],
+            "cantidad_exitosas": actual['cantidad_exitosas'],
+            "cantidad_rechazadas": actual['cantidad_rechazadas'],
+            "cantidad_fallidas": actual['cantidad_fallidas'],
+            "donantes_unicos": actual['donantes_unicos'],
             
-            "variacion_recaudo": round(calc_var(total_recaudado, total_recaudado_prev), 1),
-            "variacion_promedio": round(calc_var(promedio_donacion, promedio_donacion_prev), 1),
-            "variacion_exitosas": round(calc_var(cantidad_exitosas, cantidad_exitosas_prev), 1),
-            "variacion_rechazadas": round(calc_var(cantidad_rechazadas, cantidad_rechazadas_prev), 1),
-            "variacion_fallidas": round(calc_var(cantidad_fallidas, cantidad_fallidas_prev), 1),
-            "variacion_donantes_unicos": round(calc_var(donantes_unicos, donantes_unicos_prev), 1),
-            "variacion_total_intentos": round(calc_var(
-                cantidad_exitosas + cantidad_rechazadas + cantidad_fallidas,
-                cantidad_exitosas_prev + cantidad_rechazadas_prev + cantidad_fallidas_prev
-            ), 1),
+            "variacion_recaudo": variacion('total_recaudado'),
+            "variacion_promedio": variacion('promedio_donacion'),
+            "variacion_exitosas": variacion('cantidad_exitosas'),
+            "variacion_rechazadas": variacion('cantidad_rechazadas'),
+            "variacion_fallidas": variacion('cantidad_fallidas'),
+            "variacion_donantes_unicos": variacion('donantes_unicos'),
+            "variacion_total_intentos": round(calcular_variacion(total_intentos, total_intentos_prev), 1),
             "chart_data": grafico
         })
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar donaciones a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="donaciones_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Donante', 'Caso', 'Monto', 'Fecha', 'Estado', 'Medio Pago'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Filtros de fecha manuales
-        fecha_desde = request.query_params.get('fecha_desde')
-        fecha_hasta = request.query_params.get('fecha_hasta')
-        
-        if fecha_desde:
-            queryset = queryset.filter(fecha_donacion__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_donacion__lte=fecha_hasta)
-            
-        for obj in queryset:
-            writer.writerow([
-                obj.id_donacion,
-                obj.id_donante.donante if obj.id_donante else 'Anónimo',
-                obj.id_caso.nombre_caso if obj.id_caso else '-',
-                obj.monto,
-                obj.fecha_donacion,
-                obj.estado,
-                obj.medio_pago
-            ])
-            
-        return response
-
-    @action(detail=False, methods=['get'])
-    def exportar_excel(self, request):
-        """Exportar donaciones a Excel (.xlsx)"""
-        import openpyxl
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="donaciones_{timezone.now().date()}.xlsx"'
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Donaciones"
-        
-        # Headers
-        headers = ['ID', 'Donante', 'Caso', 'Monto', 'Fecha', 'Estado', 'Medio Pago']
-        ws.append(headers)
-        
-        # Get data (filtra por start_date/end_date si estan en params gracias a get_queryset overridden)
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Soporte legacy para fecha_desde/fecha_hasta si se usan especificamente
-        fecha_desde = request.query_params.get('fecha_desde')
-        fecha_hasta = request.query_params.get('fecha_hasta')
-        
-        if fecha_desde:
-            queryset = queryset.filter(fecha_donacion__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_donacion__lte=fecha_hasta)
-            
-        for obj in queryset:
-            ws.append([
-                obj.id_donacion,
-                obj.id_donante.donante if obj.id_donante else 'Anónimo',
-                obj.id_caso.nombre_caso if obj.id_caso else '-',
-                obj.monto,
-                obj.fecha_donacion,
-                obj.estado,
-                obj.medio_pago
-            ])
-            
-        wb.save(response)
-        return response
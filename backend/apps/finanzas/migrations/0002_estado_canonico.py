@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+# Alias históricos de estado (copia de core.estados.ALIAS al momento de la migración)
+ALIAS = {
+    'PAGADA': 'PAGADO',
+    'APROBADA': 'PAGADO',
+    'APROBADO': 'PAGADO',
+    'ANULADA': 'ANULADO',
+    'CANCELADA': 'ANULADO',
+    'CANCELADO': 'ANULADO',
+}
+
+
+def normalizar(valor):
+    limpio = ' '.join(str(valor).split())
+    if not limpio:
+        return None
+    limpio = limpio.upper().replace(' ', '_')
+    return ALIAS.get(limpio, limpio)
+
+
+def normalizar_estados(apps, schema_editor):
+    # Copia congelada de core.estados.normalizar_tabla: reescribe por lotes
+    # (por pk) los estados no canónicos
+    Gasto = apps.get_model('finanzas', 'Gasto')
+    canonicos = {valor for valor, _ in Gasto._meta.get_field('estado').choices}
+    pendientes = Gasto._base_manager.exclude(estado__in=canonicos).exclude(estado__isnull=True).order_by('pk')
+    ultimo = None
+    while True:
+        lote_qs = pendientes.filter(pk__gt=ultimo) if ultimo is not None else pendientes
+        lote = list(lote_qs.values_list('pk', 'estado')[:1000])
+        if not lote:
+            return
+        por_valor = defaultdict(list)
+        for pk, valor in lote:
+            nuevo = normalizar(valor)
+            if nuevo != valor:
+                por_valor[nuevo].append(pk)
+        for nuevo, pks in por_valor.items():
+            Gasto._base_manager.filter(pk__in=pks).update(estado=nuevo)
+        ultimo = lote[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finanzas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_estados, migrations.RunPython.noop),
+    ]
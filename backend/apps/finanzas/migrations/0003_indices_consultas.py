@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('casos', '0004_indices_consultas'),
+        ('finanzas', '0002_estado_canonico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['estado', 'fecha_pago'], include=('monto',), name='gastos_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['fecha_pago'], include=('estado', 'monto'), name='gastos_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gasto',
+            index=models.Index(fields=['id_caso', 'estado'], include=('monto', 'fecha_pago'), name='gastos_caso_estado_idx'),
+        ),
+        # Con los índices compuestos creados, se quitan los índices simples de las FK (ya cubiertos)
+        migrations.AlterField(
+            model_name='gasto',
+            name='id_caso',
+            field=models.ForeignKey(blank=True, db_column='id_caso', db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gastos', to='casos.caso'),
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from backend.apps.core.models import TimeStampedModel
+from backend.apps.core.models import TrackedModel
 
-class Proveedor(TimeStampedModel):
+class Proveedor(TrackedModel):
     """
     Representa un proveedor de bienes o servicios para la fundación.
     """
@@ -23,7 +23,7 @@ class Proveedor(TimeStampedModel):
     def __str__(self):
         return str(self.nombre_proveedor)
 
-class Gasto(TimeStampedModel):
+class Gasto(TrackedModel):
     """
     Registra un egreso o gasto realizado por la fundación.
     """
@@ -37,7 +37,7 @@ class Gasto(TimeStampedModel):
     fecha_pago = models.DateField(null=True, blank=True)
     
     # FK externa a Casos
-    id_caso = models.ForeignKey('casos.Caso', on_delete=models.CASCADE, db_column='id_caso', null=True, blank=True, related_name='gastos')
+    id_caso = models.ForeignKey('casos.Caso', on_delete=models.CASCADE, db_column='id_caso', null=True, blank=True, related_name='gastos', db_index=False)
     
     medio_pago = models.CharField(max_length=100, null=True, blank=True)
     monto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
@@ -49,6 +49,16 @@ class Gasto(TimeStampedModel):
 
     class Meta:
         db_table = 'gastos'
+        # (id_caso, estado) cubre también las búsquedas por la FK id_caso.
+        # INCLUDE (solo PostgreSQL) permite index-only scans en las sumas.
+        indexes = [
+            # Dashboard: gastos pagados + rango de fechas
+            models.Index(fields=['estado', 'fecha_pago'], include=['monto'], name='gastos_estado_fecha_idx'),
+            # KPIs: solo rango de fechas, los estados van en FILTER (...)
+            models.Index(fields=['fecha_pago'], include=['estado', 'monto'], name='gastos_fecha_idx'),
+            # caso_finanzas y subconsultas por caso
+            models.Index(fields=['id_caso', 'estado'], include=['monto', 'fecha_pago'], name='gastos_caso_estado_idx'),
+        ]
         verbose_name = _('Gasto')
         verbose_name_plural = _('Gastos')
 
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Proveedor, Gasto
 from backend.apps.casos.models import Caso
+from backend.apps.core.serializers import EstadoField
 
 class ProveedorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,9 +17,14 @@ class GastoSerializer(serializers.ModelSerializer):
     proveedor_nombre = serializers.ReadOnlyField(source='id_proveedor.nombre_proveedor')
     caso_nombre = serializers.ReadOnlyField(source='id_caso.nombre_caso')
 
+    # Acepta alias ('pagado', 'Pagada'...) y guarda el estado canónico
+    estado = EstadoField(Gasto)
+
     class Meta:
         model = Gasto
         fields = '__all__'
+        # FK que leen los campos de solo lectura (ver core/carga.py)
+        relaciones = {'id_proveedor': ('nombre_proveedor',), 'id_caso': ('nombre_caso',)}
 
     def validate_fecha_pago(self, value):
         from django.utils import timezone
@@ -0,0 +1,57 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from backend.apps.casos.models import Caso
+from backend.apps.core.carga import cargar, verificar_consultas
+from backend.apps.core.pruebas import ApiTestCase
+from backend.apps.core.rollups import serie_mensual
+
+from .models import Gasto, Proveedor
+from .serializers import GastoSerializer
+from .views import KPIS_GASTOS
+
+INICIO, FIN = date(2024, 1, 15), date(2024, 6, 20)
+
+
+@override_settings(DASHBOARD_CACHE_ENABLED=False)
+class KPIsGastosTests(ApiTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for i in range(12):
+            Gasto.objects.create(
+                nombre_gasto=f'Gasto {i}', fecha_pago=date(2024, 1 + i % 6, 10 + i), monto=Decimal(500 * (i + 1)),
+                estado=('PAGADO', 'PENDIENTE', 'ANULADO')[i % 3],
+            )
+
+    def test_metricas_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            actual, anterior = KPIS_GASTOS.calcular(Gasto.objects.all(), INICIO, FIN)
+        self.assertGreater(actual['numero_gastos'], 0)
+
+    def test_endpoint_metricas_mas_serie(self):
+        # La serie mensual (rollups y bordes de mes) se cuenta aparte
+        with CaptureQueriesContext(connection) as serie:
+            serie_mensual('gastos', KPIS_GASTOS.buckets['pagado'], desde=INICIO, hasta=FIN)
+        with self.assertNumQueries(1 + len(serie)):
+            respuesta = self.client.get('/api/gastos/kpis/', {'start_date': INICIO, 'end_date': FIN})
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class GastoSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Un proveedor y un caso distintos por fila: una FK sin cargar se nota
+        for i in range(5):
+            Gasto.objects.create(
+                nombre_gasto=f'Gasto {i}', id_proveedor=Proveedor.objects.create(nombre_proveedor=f'Proveedor {i}'),
+                id_caso=Caso.objects.create(nombre_caso=f'Caso {i}'),
+                fecha_pago=date(2024, 2, 1 + i), monto=Decimal(500), estado='PAGADO',
+            )
+
+    def test_sin_n_mas_1(self):
+        verificar_consultas(GastoSerializer, cargar(Gasto.objects.all(), GastoSerializer), filas=5)
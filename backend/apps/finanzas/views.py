@@ -1,14 +1,38 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Gasto, Proveedor
 from .serializers import GastoSerializer, ProveedorSerializer
-
-class GastoViewSet(viewsets.ModelViewSet):
+from backend.apps.core import estados
+from backend.apps.core.busqueda import BusquedaFilter, OrdenFilter
+from backend.apps.core.kpis import KPISpec, Metrica
+from backend.apps.core.cache import cachear_respuesta
+from backend.apps.core.carga import CargaAnticipadaMixin, cargar
+from backend.apps.core.exports import Columna, ExportacionMixin
+from backend.apps.core.lotes import LoteMixin
+from backend.apps.core.replicas import LecturaReplicaMixin
+
+# KPIs de gastos: PAGADO alimenta total/promedio/número, PENDIENTE el saldo por pagar
+KPIS_GASTOS = KPISpec(
+    campo_fecha='fecha_pago',
+    buckets={
+        'pagado': estados.filtro(Gasto, 'pagado'),
+        'pendiente': estados.filtro(Gasto, 'pendiente'),
+    },
+    metricas={
+        'total_gasto': Metrica('sum', 'monto', 'pagado'),
+        'promedio_gasto': Metrica('avg', 'monto', 'pagado'),
+        'numero_gastos': Metrica('count', bucket='pagado'),
+        'gastos_pendientes': Metrica('sum', 'monto', 'pendiente'),
+        'count_pendientes': Metrica('count', bucket='pendiente'),
+    },
+)
+
+class GastoViewSet(LecturaReplicaMixin, CargaAnticipadaMixin, ExportacionMixin, LoteMixin, viewsets.ModelViewSet):
     queryset = Gasto.objects.all()
     serializer_class = GastoSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [BusquedaFilter, OrdenFilter]
     filterset_fields = ['estado', 'fecha_pago']
     search_fields = [
         'nombre_gasto',
@@ -19,6 +43,16 @@ class GastoViewSet(viewsets.ModelViewSet):
     ]
     ordering_fields = ['fecha_pago', 'monto', 'nombre_gasto']
     ordering = ['-fecha_pago']
+    nombre_exportacion = 'gastos'
+    columnas_exportacion = [
+        Columna('ID', 'id_gasto'),
+        Columna('Concepto', 'nombre_gasto'),
+        Columna('Proveedor', 'id_proveedor__nombre_proveedor', si_nulo='-'),
+        Columna('Caso', 'id_caso__nombre_caso', si_nulo='-'),
+        Columna('Monto', 'monto'),
+        Columna('Fecha', 'fecha_pago'),
+        Columna('Estado', 'estado'),
+    ]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -36,84 +70,51 @@ class GastoViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+    def filtrar_exportacion(self, queryset):
+        fecha_desde = self.request.query_params.get('fecha_desde')
+        fecha_hasta = self.request.query_params.get('fecha_hasta')
+        if fecha_desde:
+            queryset = queryset.filter(fecha_pago__gte=fecha_desde)
+        if fecha_hasta:
+            queryset = queryset.filter(fecha_pago__lte=fecha_hasta)
+        return queryset
+
     @action(detail=False, methods=['get'])
+    @cachear_respuesta('gastos.kpis', params=('start_date', 'end_date', 'caso'))
     def kpis(self, request):
         """KPIs financieros avanzados + Gráfico"""
-        from django.utils import timezone
-        from django.db.models import Sum, Count, Avg, Max, F
+        from django.db.models import Sum, Count
         from django.db.models.functions import TruncMonth
-        from datetime import date, timedelta
-        from django.utils.dateparse import parse_date
-        import calendar
+        from backend.apps.core.kpis import calcular_variacion, periodo_desde_params
+        from backend.apps.core.rollups import serie_mensual
 
-        # Helper fechas
-        def subtract_month(dt):
-            year = dt.year
-            month = dt.month
-            if month == 1:
-                year -= 1
-                month = 12
-            else:
-                month -= 1
-            last_day = calendar.monthrange(year, month)[1]
-            day = min(dt.day, last_day)
-            return date(year, month, day)
+        # 1. Filtros de Fecha (periodo anterior: mes contra mes)
+        fecha_inicio, fecha_fin = periodo_desde_params(request.query_params)
 
-        # 1. Filtros de Fecha
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        
-        if start_date_str and end_date_str:
-            fecha_inicio = parse_date(start_date_str)
-            fecha_fin = parse_date(end_date_str)
-        else:
-            fecha_fin = timezone.now().date()
-            fecha_inicio = fecha_fin.replace(month=1, day=1)
-
-        # Periodo anterior
-        prev_fecha_inicio = subtract_month(fecha_inicio)
-        prev_fecha_fin = subtract_month(fecha_fin)
-
-        # Queries
-        qs_actual = Gasto.objects.filter(fecha_pago__range=[fecha_inicio, fecha_fin])
-        qs_prev = Gasto.objects.filter(fecha_pago__range=[prev_fecha_inicio, prev_fecha_fin])
-        
+        # Si filtro por caso, la variación es la DE ESE caso (ambos periodos filtrados)
+        base = Gasto.objects.all()
         caso_param = request.query_params.get('caso')
         if caso_param:
-            qs_actual = qs_actual.filter(id_caso__nombre_caso__icontains=caso_param)
-            # Nota: No aplicamos filtro de caso a las métricas "previas" para mantener la comparación global? 
-            # O sí deberíamos? Generalmente sí, si filtro por caso, quiero ver la varación DE ESE caso.
-            qs_prev = qs_prev.filter(id_caso__nombre_caso__icontains=caso_param)
+            base = base.filter(id_caso__nombre_caso__icontains=caso_param)
 
-        # Partition Queries
-        qs_pagados = qs_actual.filter(estado__iexact='PAGADO')
-        qs_pendientes = qs_actual.filter(estado__iexact='PENDIENTE')
-        
-        qs_pagados_prev = qs_prev.filter(estado__iexact='PAGADO')
-
-        # Métricas PAGADOS (Base para Total, Promedio, Numero)
-        total_gasto = qs_pagados.aggregate(s=Sum('monto'))['s'] or 0
-        promedio_gasto = qs_pagados.aggregate(a=Avg('monto'))['a'] or 0
-        numero_gastos = qs_pagados.count()
-        
-        # Métricas PENDIENTES
-        total_pendientes = qs_pendientes.aggregate(s=Sum('monto'))['s'] or 0
-        count_pendientes = qs_pendientes.count()
-        
-        # Métricas Anteriores (Solo Pagados para comparativa lógica)
-        total_prev = qs_pagados_prev.aggregate(s=Sum('monto'))['s'] or 0
-        promedio_prev = qs_pagados_prev.aggregate(a=Avg('monto'))['a'] or 0
-
-        # Variaciones
-        def calc_var(actual, prev):
-            if not prev or float(prev) == 0: 
-                return 100.0 if actual and float(actual) > 0 else 0.0
-            return ((float(actual) - float(prev)) / float(prev)) * 100.0
+        # Métricas de ambos periodos en una sola consulta.
+        # Total, promedio y número salen de PAGADOS; las anteriores solo se usan para la comparativa.
+        actual, anterior = KPIS_GASTOS.calcular(base, fecha_inicio, fecha_fin)
+        total_gasto = actual['total_gasto']
+        promedio_gasto = actual['promedio_gasto']
 
         # Serie Temporal (Muestra todo o solo pagado? Generalmente Cashflow = Pagado. Usaremos Pagado)
-        overview_data = qs_pagados.annotate(mes=TruncMonth('fecha_pago')).values('mes').annotate(
-            total=Sum('monto'), cantidad=Count('id_gasto')
-        ).order_by('mes')
+        # Sin filtro por caso se lee de los rollups; el rollup no tiene la dimensión caso.
+        if caso_param:
+            overview_data = base.filter(
+                KPIS_GASTOS.buckets['pagado'], fecha_pago__range=[fecha_inicio, fecha_fin]
+            ).annotate(mes=TruncMonth('fecha_pago')).values('mes').annotate(
+                total=Sum('monto'), cantidad=Count('id_gasto')
+            ).order_by('mes')
+        else:
+            overview_data = serie_mensual(
+                'gastos', KPIS_GASTOS.buckets['pagado'], desde=fecha_inicio, hasta=fecha_fin
+            )
 
         grafico = [
             {"fecha": item['mes'].strftime('%Y-%m') if item['mes'] else 'S/F', "monto": item['total'], "cantidad": item['cantidad']}
@@ -123,56 +124,40 @@ class GastoViewSet(viewsets.ModelViewSet):
         return Response({
             "total_gasto": total_gasto,
             "promedio_gasto": round(promedio_gasto, 2),
-            "numero_gastos": numero_gastos,         # Renamed from amount
-            "gastos_pendientes": total_pendientes,  # New
-            "count_pendientes": count_pendientes,   # New
-            "variacion_total": round(calc_var(total_gasto, total_prev), 1),
-            "variacion_promedio": round(calc_var(promedio_gasto, promedio_prev), 1),
+            "numero_gastos": actual['numero_gastos'],         # Renamed from amount
+            "gastos_pendientes": actual['gastos_pendientes'],  # New
+            "count_pendientes": actual['count_pendientes'],    # New
+            "variacion_total": round(calcular_variacion(total_gasto, anterior['total_gasto']), 1),
+            "variacion_promedio": round(calcular_variacion(promedio_gasto, anterior['promedio_gasto']), 1),
             # "top_proveedor": ... (User removed request, but I can keep or ignore. Keeping backend logic doesn't hurt)
             "chart_data": grafico
         })
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar gastos a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="gastos_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Concepto', 'Proveedor', 'Caso', 'Monto', 'Fecha', 'Estado'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        fecha_desde = request.query_params.get('fecha_desde')
-        fecha_hasta = request.query_params.get('fecha_hasta')
-        
-        if fecha_desde:
-            queryset = queryset.filter(fecha_pago__gte=fecha_desde)
-        if fecha_hasta:
-            queryset = queryset.filter(fecha_pago__lte=fecha_hasta)
-            
-        for obj in queryset:
-            writer.writerow([
-                obj.id_gasto,
-                obj.nombre_gasto,
-                obj.id_proveedor.nombre_proveedor if obj.id_proveedor else '-',
-                obj.id_caso.nombre_caso if obj.id_caso else '-',
-                obj.monto,
-                obj.fecha_pago,
-                obj.estado
-            ])
-            
-        return response
-
-class ProveedorViewSet(viewsets.ModelViewSet):
+class ProveedorViewSet(LecturaReplicaMixin, ExportacionMixin, viewsets.ModelViewSet):
     queryset = Proveedor.objects.all()
     serializer_class = ProveedorSerializer
     permission_classes = [permissions.IsAuthenticated]
     ordering = ['-id_proveedor']
+    nombre_exportacion = 'proveedores'
+    columnas_exportacion = [
+        Columna('ID', 'id_proveedor'),
+        Columna('Nombre', 'nombre_proveedor'),
+        Columna('NIT', 'nit'),
+        Columna('Contacto', 'nombre_contacto'),
+        Columna('Teléfono', 'telefono'),
+        Columna('Email', 'correo'),
+        Columna('Gastos Totales', 'total_gastos'),
+    ]
+
+    def filtrar_exportacion(self, queryset):
+        # Total por proveedor en la misma consulta (LEFT JOIN + GROUP BY)
+        from decimal import Decimal
+        from django.db.models import DecimalField, Sum
+        from django.db.models.functions import Coalesce
+
+        return queryset.annotate(
+            total_gastos=Coalesce(Sum('gastos__monto'), Decimal('0'), output_field=DecimalField())
+        )
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -187,6 +172,8 @@ class ProveedorViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'])
+    # Sin filtros: el "mes actual" ya va en la clave (fecha de hoy)
+    @cachear_respuesta('proveedores.kpis', params=())
     def kpis(self, request):
         """Indicadores globales de proveedores"""
         from django.utils import timezone
@@ -218,70 +205,7 @@ class ProveedorViewSet(viewsets.ModelViewSet):
     def gastos(self, request, pk=None):
         """Historial de gastos de un proveedor específico"""
         proveedor = self.get_object()
-        gastos = proveedor.gastos.all().order_by('-fecha_pago')
+        gastos = cargar(proveedor.gastos.all(), GastoSerializer).order_by('-fecha_pago')
         serializer = GastoSerializer(gastos, many=True)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
-    def exportar_csv(self, request):
-        """Exportar proveedores a CSV"""
-        import csv
-        from django.http import HttpResponse
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="proveedores_{timezone.now().date()}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Nombre', 'NIT', 'Contacto', 'Teléfono', 'Email'])
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        for obj in queryset:
-            writer.writerow([
-                obj.id_proveedor,
-                obj.nombre_proveedor,
-                obj.nit_proveedor,
-                obj.nombre_contacto,
-                obj.telefono_contacto,
-                obj.email_contacto
-            ])
-            
-        return response
-
-    @action(detail=False, methods=['get'])
-    def exportar_excel(self, request):
-        """Exportar proveedores a Excel"""
-        from django.http import HttpResponse
-        from openpyxl import Workbook
-        from django.utils import timezone
-        
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="proveedores_{timezone.now().date()}.xlsx"'
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Proveedores"
-        
-        # Headers
-        headers = ['ID', 'Nombre', 'NIT', 'Contacto', 'Teléfono', 'Email', 'Gastos Totales']
-        ws.append(headers)
-        
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        for obj in queryset:
-            # Calcular total gastado (opcional pero útil)
-            total_gastos = sum(g.monto for g in obj.gastos.all())
-            
-            ws.append([
-                obj.id_proveedor,
-                obj.nombre_proveedor,
-                obj.nit_proveedor,
-                obj.nombre_contacto,
-                obj.telefono_contacto,
-                obj.email_contacto,
-                total_gastos
-            ])
-            
-        wb.save(response)
-        return response
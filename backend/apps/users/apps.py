@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend.apps.users'
+
+    def ready(self):
+        # Conecta la invalidación de la cache de tokens a los cambios de User
+        from . import cache  # noqa: F401
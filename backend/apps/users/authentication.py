@@ -1,62 +1,68 @@
+import logging
+
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.models import User
-from supabase import create_client, Client
+from supabase import Client
 from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+import jwt
+from .cache import get_principal_cache
+from .clients import cliente_temporal, get_supabase_client
+from .instrumentation import evento, medir, registrar_resultado
+from .tokens import LlaveNoDisponible, TokenInvalido, get_verifier
+
+
+class TokenRechazado(AuthenticationFailed):
+    """Rechazo definitivo del token (se guarda en la cache negativa)."""
 
 class SupabaseAuthBackend(BaseBackend):
     """
     Permite iniciar sesión en Django Admin usando credenciales de Supabase (Email/Password).
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        print(f"🔍 Intentando login con Supabase para: {username}")
         if not username or not password:
             return None
 
+        evento('auth.admin.login', usuario=username)
         try:
             # Verificar configuración
             if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
-                print("❌ Error: SUPABASE_URL o SUPABASE_KEY no están configurados en settings.py")
+                evento('auth.config_incompleta', nivel=logging.ERROR, muestrear=False)
                 return None
 
-            # Conectar a Supabase
-            supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-            
-            # Intentar login con email y contraseña
-            print("📡 Enviando credenciales a Supabase...")
-            response = supabase.auth.sign_in_with_password({
-                "email": username, 
-                "password": password
-            })
+            # Cliente propio del login: la sesión no debe quedar en el compartido
+            with cliente_temporal() as supabase, medir('admin_login'):
+                response = supabase.auth.sign_in_with_password({
+                    "email": username, 
+                    "password": password
+                })
             
             if response.user:
-                print("✅ Login exitoso en Supabase!")
                 email = response.user.email
                 
                 # Buscar o crear el usuario en Django
                 user, created = User.objects.get_or_create(username=email)
                 
                 if created:
-                    print(f"👤 Creando nuevo usuario local: {email}")
                     user.email = email
                     user.first_name = "Supabase User"
                     user.is_staff = True
                     user.is_superuser = True
                     user.save()
                 else:
-                    print(f"👤 Usuario local encontrado: {email}")
                     # Asegurar permisos si ya existía
                     if not user.is_staff:
                         user.is_staff = True
                         user.save()
-                
+
+                evento('auth.admin.login_ok', usuario=email, creado=created, muestrear=False)
                 return user
             else:
-                print("⚠️ Supabase no devolvió un usuario.")
+                evento('auth.admin.sin_usuario', nivel=logging.WARNING, usuario=username, muestrear=False)
                 
         except Exception as e:
-            print(f"❌ Error de autenticación Supabase: {e}")
+            evento('auth.admin.error', nivel=logging.WARNING, usuario=username, error=str(e), muestrear=False)
             return None
         
         return None
@@ -70,47 +76,101 @@ class SupabaseAuthBackend(BaseBackend):
 class SupabaseAuthentication(BaseAuthentication):
     """
     Autenticación para DRF usando el token JWT de Supabase.
+
+    Por defecto (`SUPABASE_AUTH_MODE = 'local'`) el token se verifica dentro del
+    proceso (firma, exp, aud, iss) sin llamar a Supabase. El modo `remote`
+    mantiene la validación con `supabase.auth.get_user`, y con
+    `SUPABASE_AUTH_REMOTE_FALLBACK` se usa solo cuando no hay llave local.
     """
     def authenticate(self, request):
-        print(f"🔍 [Auth] Verificando autenticación para: {request.path}")
         auth_header = request.headers.get('Authorization')
         
-        if not auth_header:
-            print("⚠️ [Auth] No Authorization header found")
-            return None
-            
-        if not auth_header.startswith('Bearer '):
-            print("⚠️ [Auth] Header does not start with Bearer")
+        if not auth_header or not auth_header.startswith('Bearer '):
+            # Sin token: DRF prueba las demás clases de autenticación
+            registrar_resultado('sin_token')
             return None
 
         token = auth_header.split(' ')[1]
-        print(f"🔑 [Auth] Token recibido (inicio): {token[:10]}...")
+
+        with medir('total'):
+            return self._autenticar_token(request, token)
+
+    def _autenticar_token(self, request, token):
+        cache = get_principal_cache()
+        encontrado, user, motivo = cache.obtener(token)
+        if encontrado:
+            if user is None:
+                registrar_resultado('rechazado_cache')
+                raise TokenRechazado(motivo)
+            registrar_resultado('cache')
+            return (user, None)
         
         try:
-            supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-            print("📡 [Auth] Validando token con Supabase...")
-            user_response = supabase.auth.get_user(token)
-            
-            if not user_response.user:
-                print("❌ [Auth] Supabase no retornó usuario")
-                raise AuthenticationFailed('Token inválido o expirado')
-
-            email = user_response.user.email
-            print(f"✅ [Auth] Usuario validado: {email}")
+            with medir('verificacion'):
+                email, exp = self.verificar_token(token)
             
             # Buscar o crear usuario en Django
-            user, created = User.objects.get_or_create(username=email)
-            
-            if created:
-                print(f"👤 [Auth] Creando usuario local: {email}")
-                user.email = email
-                user.first_name = "Supabase API User"
-                user.save()
-            
+            with medir('usuario'):
+                user, created = User.objects.get_or_create(username=email)
+                
+                if created:
+                    user.email = email
+                    user.first_name = "Supabase API User"
+                    user.save()
+
+            cache.guardar(token, user, exp)
+            registrar_resultado('ok')
+            evento('auth.ok', usuario=email, creado=created, path=request.path)
             return (user, None)
 
+        except TokenRechazado as e:
+            cache.rechazar(token, e.detail)
+            registrar_resultado('rechazado')
+            evento('auth.rechazado', nivel=logging.WARNING, motivo=str(e.detail), path=request.path)
+            raise
+        except AuthenticationFailed as e:
+            registrar_resultado('error')
+            evento('auth.error', nivel=logging.WARNING, error=str(e.detail), path=request.path, muestrear=False)
+            raise
         except Exception as e:
-            print(f"❌ [Auth] Error de autenticación: {e}")
-            # Importante: Si fallamos aquí, retornamos None para que DRF pruebe otros métodos?
-            # O lanzamos error? Si enviaron token y falló, debería ser error.
+            registrar_resultado('error')
+            evento('auth.error', nivel=logging.ERROR, error=str(e), path=request.path, muestrear=False)
+            # Si enviaron un token y no se pudo validar es un error, no un request anónimo
             raise AuthenticationFailed(f'Error de autenticación: {str(e)}')
+
+    def verificar_token(self, token):
+        """Retorna (email, exp) del token o lanza AuthenticationFailed."""
+        modo = getattr(settings, 'SUPABASE_AUTH_MODE', 'local')
+        if modo == 'remote':
+            return self.verificar_remoto(token)
+
+        try:
+            claims = get_verifier().verificar(token)
+        except TokenInvalido as e:
+            raise TokenRechazado(f'Token inválido o expirado: {e}')
+        except LlaveNoDisponible:
+            if getattr(settings, 'SUPABASE_AUTH_REMOTE_FALLBACK', False):
+                evento('auth.fallback_remoto', nivel=logging.WARNING)
+                return self.verificar_remoto(token)
+            # Se guarda en la cache negativa: un kid desconocido o un JWKS caído
+            # no debe costar una verificación (ni un refresco) por request
+            raise TokenRechazado('No es posible verificar el token localmente')
+
+        email = claims.get('email')
+        if not email:
+            raise TokenRechazado('El token no contiene email')
+        return email, claims.get('exp')
+
+    def verificar_remoto(self, token):
+        supabase: Client = get_supabase_client()
+        user_response = supabase.auth.get_user(token)
+        
+        if not user_response or not user_response.user:
+            raise TokenRechazado('Token inválido o expirado')
+
+        # Supabase ya validó el token: el exp solo se usa para el TTL de la cache
+        try:
+            exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+        except jwt.PyJWTError:
+            exp = None
+        return user_response.user.email, exp
@@ -0,0 +1,158 @@
+"""
+Cache token → usuario Django para el camino de autenticación.
+
+Cada request autenticado con el mismo token resolvía de nuevo la firma (o la
+llamada a Supabase) y el `User` en Postgres. Esta cache LRU en memoria guarda el
+usuario resuelto por hash del token hasta su `exp` (acotado por un TTL máximo),
+y también los tokens rechazados durante un TTL corto (cache negativa).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+class PrincipalCache:
+    def __init__(self, max_entradas=2048, ttl_maximo=300, ttl_negativo=30):
+        self.max_entradas = max_entradas
+        self.ttl_maximo = ttl_maximo
+        self.ttl_negativo = ttl_negativo
+        self._entradas = OrderedDict()  # clave -> (expira, user | None, motivo)
+        self._por_usuario = {}  # username -> {claves}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hits_negativos = 0
+        self.desalojos = 0
+
+    @staticmethod
+    def clave(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def obtener(self, token):
+        """
+        Retorna (encontrado, user, motivo). Si `user` es None y `encontrado` es
+        True el token fue rechazado recientemente con `motivo`.
+        """
+        if not self.max_entradas:
+            self.misses += 1
+            return False, None, None
+
+        clave = self.clave(token)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return False, None, None
+            expira, user, motivo = entrada
+            if expira <= time.monotonic():
+                self._quitar(clave)
+                self.misses += 1
+                return False, None, None
+            self._entradas.move_to_end(clave)
+            if user is None:
+                self.hits_negativos += 1
+            else:
+                self.hits += 1
+            return True, user, motivo
+
+    def guardar(self, token, user, exp=None):
+        ttl = self.ttl_maximo
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl <= 0 or not self.max_entradas:
+            return
+        self._insertar(self.clave(token), (time.monotonic() + ttl, user, None), user.username)
+
+    def rechazar(self, token, motivo):
+        if not self.ttl_negativo or not self.max_entradas:
+            return
+        self._insertar(self.clave(token), (time.monotonic() + self.ttl_negativo, None, motivo), None)
+
+    def _insertar(self, clave, entrada, username):
+        with self._lock:
+            self._quitar(clave)
+            self._entradas[clave] = entrada
+            if username:
+                self._por_usuario.setdefault(username, set()).add(clave)
+            while len(self._entradas) > self.max_entradas:
+                antigua, _ = next(iter(self._entradas.items()))
+                self._quitar(antigua)
+                self.desalojos += 1
+
+    def _quitar(self, clave):
+        entrada = self._entradas.pop(clave, None)
+        if entrada and entrada[1] is not None:
+            claves = self._por_usuario.get(entrada[1].username)
+            if claves:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_usuario[entrada[1].username]
+
+    def invalidar_token(self, token):
+        with self._lock:
+            self._quitar(self.clave(token))
+
+    def invalidar_usuario(self, username):
+        with self._lock:
+            for clave in list(self._por_usuario.get(username, ())):
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+
+    def stats(self):
+        total = self.hits + self.hits_negativos + self.misses
+        return {
+            'hits': self.hits,
+            'hits_negativos': self.hits_negativos,
+            'misses': self.misses,
+            'desalojos': self.desalojos,
+            'entradas': len(self._entradas),
+            'hit_ratio': round((self.hits + self.hits_negativos) / total, 4) if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_principal_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PrincipalCache(
+                    max_entradas=getattr(settings, 'SUPABASE_AUTH_CACHE_SIZE', 2048),
+                    ttl_maximo=getattr(settings, 'SUPABASE_AUTH_CACHE_TTL', 300),
+                    ttl_negativo=getattr(settings, 'SUPABASE_AUTH_CACHE_NEGATIVE_TTL', 30),
+                )
+    return _cache
+
+
+def reset_principal_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+@receiver(setting_changed)
+def _reset_por_settings(sender, setting, **kwargs):
+    if setting.startswith('SUPABASE_'):
+        reset_principal_cache()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _invalidar_usuario(sender, instance, **kwargs):
+    # Permisos, is_active, etc. cambiaron: la próxima request vuelve a resolver el usuario
+    if _cache is not None:
+        _cache.invalidar_usuario(instance.username)
@@ -0,0 +1,87 @@
+"""
+Registro de clientes Supabase por proceso.
+
+Construir un cliente por request cuesta (instancia httpx, sub-clientes de auth,
+storage, postgrest...) y además pierde la conexión keep-alive hacia Supabase.
+Aquí se crea uno por (url, key) y por proceso: después de un fork de gunicorn
+el registro se vacía para no compartir sockets entre workers.
+
+El cliente compartido solo verifica tokens (`auth.get_user(token)`). Un
+`sign_in_with_password` lo dejaría con la sesión del usuario que inició
+sesión (supabase-py reescribe el header `Authorization` al recibir
+SIGNED_IN) para todos los hilos: los logins usan `cliente_temporal()`.
+"""
+import contextlib
+import os
+import threading
+
+import httpx
+from django.conf import settings
+from supabase import Client, ClientOptions, create_client
+
+_clientes = {}
+_pid = os.getpid()
+_lock = threading.Lock()
+_stats = {'creados': 0, 'reutilizados': 0}
+
+
+def _opciones():
+    # Cliente de servidor: sin sesión persistente ni timers de refresh
+    base = {'auto_refresh_token': False, 'persist_session': False}
+    http = httpx.Client(
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    )
+    try:
+        return ClientOptions(httpx_client=http, **base)
+    except TypeError:
+        # Versiones de supabase-py sin `httpx_client`: usan su propio pool keep-alive
+        http.close()
+        return ClientOptions(**base)
+
+
+def get_supabase_client(url=None, key=None) -> Client:
+    global _pid
+    url = url or settings.SUPABASE_URL
+    key = key or settings.SUPABASE_KEY
+
+    if os.getpid() != _pid:
+        with _lock:
+            if os.getpid() != _pid:
+                _clientes.clear()
+                _pid = os.getpid()
+
+    cliente = _clientes.get((url, key))
+    if cliente is not None:
+        _stats['reutilizados'] += 1
+        return cliente
+
+    with _lock:
+        cliente = _clientes.get((url, key))
+        if cliente is None:
+            cliente = create_client(url, key, options=_opciones())
+            _clientes[(url, key)] = cliente
+            _stats['creados'] += 1
+        return cliente
+
+
+@contextlib.contextmanager
+def cliente_temporal(url=None, key=None):
+    """Cliente fuera del registro para una operación con sesión; se cierra al salir."""
+    opciones = _opciones()
+    cliente = create_client(url or settings.SUPABASE_URL, key or settings.SUPABASE_KEY, options=opciones)
+    try:
+        yield cliente
+    finally:
+        http = getattr(opciones, 'httpx_client', None)
+        if http is not None:
+            http.close()
+
+
+def reset_clients():
+    with _lock:
+        _clientes.clear()
+
+
+def stats():
+    return dict(_stats, activos=len(_clientes))
@@ -0,0 +1,129 @@
+"""
+Emisor local de tokens que imita a Supabase Auth, para benchmarks y pruebas.
+
+Levanta un servidor HTTP en 127.0.0.1 que expone:
+
+* `GET /auth/v1/user`: valida el Bearer token (como `supabase.auth.get_user`).
+* `GET /auth/v1/.well-known/jwks.json`: llaves públicas (si se usa ES256).
+
+y firma tokens con la misma forma de claims que Supabase.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+
+
+class FakeSupabaseIssuer:
+    def __init__(self, algoritmo='HS256', secret='fake-supabase-jwt-secret-para-benchmarks', latencia_ms=0):
+        self.algoritmo = algoritmo
+        self.secret = secret
+        self.latencia_ms = latencia_ms
+        self.kid = uuid.uuid4().hex[:8]
+        self._servidor = None
+        self._hilo = None
+
+        if algoritmo == 'ES256':
+            from cryptography.hazmat.primitives.asymmetric import ec
+            self._llave_privada = ec.generate_private_key(ec.SECP256R1())
+            jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(self._llave_privada.public_key()))
+            jwk.update({'kid': self.kid, 'alg': 'ES256', 'use': 'sig'})
+            self.jwks = {'keys': [jwk]}
+        else:
+            self._llave_privada = None
+            self.jwks = {'keys': []}
+
+    @property
+    def url(self):
+        host, port = self._servidor.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def issuer(self):
+        return f'{self.url}/auth/v1'
+
+    def emitir(self, email, ttl=3600, **claims):
+        ahora = int(time.time())
+        payload = {
+            'sub': str(uuid.uuid5(uuid.NAMESPACE_DNS, email)),
+            'email': email,
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'iss': self.issuer if self._servidor else 'fake',
+            'iat': ahora,
+            'exp': ahora + ttl,
+        }
+        payload.update(claims)
+        if self._llave_privada is not None:
+            return jwt.encode(payload, self._llave_privada, algorithm='ES256', headers={'kid': self.kid})
+        return jwt.encode(payload, self.secret, algorithm=self.algoritmo)
+
+    def _validar(self, token):
+        if self._llave_privada is not None:
+            llave = self._llave_privada.public_key()
+        else:
+            llave = self.secret
+        return jwt.decode(token, llave, algorithms=[self.algoritmo], audience='authenticated')
+
+    def _handler(self):
+        issuer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if issuer.latencia_ms:
+                    time.sleep(issuer.latencia_ms / 1000)
+
+                if self.path.startswith('/auth/v1/.well-known/jwks.json'):
+                    return self._json(200, issuer.jwks)
+
+                if self.path.startswith('/auth/v1/user'):
+                    token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+                    try:
+                        claims = issuer._validar(token)
+                    except jwt.PyJWTError as e:
+                        return self._json(401, {'code': 401, 'msg': str(e)})
+                    return self._json(200, {
+                        'id': claims['sub'],
+                        'aud': claims['aud'],
+                        'role': claims.get('role'),
+                        'email': claims['email'],
+                        'app_metadata': {'provider': 'email'},
+                        'user_metadata': {},
+                        'created_at': '2025-01-01T00:00:00Z',
+                    })
+
+                self._json(404, {'msg': 'not found'})
+
+        return Handler
+
+    def iniciar(self):
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
@@ -0,0 +1,244 @@
+"""
+Instrumentación del subsistema de autenticación.
+
+* Eventos estructurados, con nivel y muestreo, sobre el logger `backend.auth`.
+  El handler `ColaHandler` solo encola el registro: la escritura real la hace un
+  hilo aparte (QueueListener), así el request nunca espera por stdout.
+* Tiempos agregados por fase (`verificacion`, `usuario`, `total`) y contadores
+  de resultado, consultables con `snapshot()`.
+
+Con `AUTH_INSTRUMENTATION_ENABLED = False` `medir()` devuelve un context manager
+vacío compartido y `evento()` retorna tras un chequeo de nivel.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from backend.apps.core import metricas
+
+logger = logging.getLogger('backend.auth')
+
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por evento: ts, nivel, logger, evento y campos extra."""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 3),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'evento': record.getMessage(),
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_ESTANDAR:
+                data[clave] = valor
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class ColaHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler no bloqueante: si la cola está llena el registro se descarta
+    (y se cuenta) en lugar de frenar el request. El listener se (re)inicia por
+    proceso, de modo que funciona igual después del fork de gunicorn.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.destino = logging.StreamHandler(stream or sys.stdout)
+        self.destino.setFormatter(JSONFormatter())
+        self.descartados = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _asegurar_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._listener = logging.handlers.QueueListener(self.queue, self.destino)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+    def prepare(self, record):
+        # Los campos extra viajan tal cual; el formato JSON se hace en el hilo del listener
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_text = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._asegurar_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+# --- Configuración --------------------------------------------------------
+
+_config = None
+
+
+def _cargar_config():
+    global _config
+    if _config is None:
+        from django.conf import settings
+        _config = {
+            'habilitado': getattr(settings, 'AUTH_INSTRUMENTATION_ENABLED', True),
+            'muestreo': float(getattr(settings, 'AUTH_LOG_SAMPLE_RATE', 1.0)),
+        }
+    return _config
+
+
+def recargar_config():
+    global _config
+    _config = None
+
+
+@receiver(setting_changed)
+def _recargar_por_settings(sender, setting, **kwargs):
+    if setting.startswith('AUTH_'):
+        recargar_config()
+
+
+# --- Eventos --------------------------------------------------------------
+
+def evento(nombre, nivel=logging.INFO, muestrear=True, **campos):
+    """
+    Emite un evento estructurado. Los eventos con `muestrear=True` pasan con
+    probabilidad `AUTH_LOG_SAMPLE_RATE`; advertencias y errores conviene
+    emitirlos con `muestrear=False`.
+    """
+    if not logger.isEnabledFor(nivel):
+        return
+    if muestrear:
+        tasa = _cargar_config()['muestreo']
+        if tasa < 1.0 and random.random() >= tasa:
+            return
+    logger.log(nivel, nombre, extra=campos)
+
+
+# --- Tiempos --------------------------------------------------------------
+
+class _Agregado:
+    __slots__ = ('cantidad', 'total', 'minimo', 'maximo')
+
+    def __init__(self):
+        self.cantidad = 0
+        self.total = 0.0
+        self.minimo = float('inf')
+        self.maximo = 0.0
+
+    def registrar(self, segundos):
+        self.cantidad += 1
+        self.total += segundos
+        if segundos < self.minimo:
+            self.minimo = segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def como_dict(self):
+        if not self.cantidad:
+            return {'cantidad': 0, 'total_ms': 0.0, 'media_ms': 0.0, 'min_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'cantidad': self.cantidad,
+            'total_ms': round(self.total * 1000, 3),
+            'media_ms': round(self.total * 1000 / self.cantidad, 3),
+            'min_ms': round(self.minimo * 1000, 3),
+            'max_ms': round(self.maximo * 1000, 3),
+        }
+
+
+_fases = {}
+_resultados = {}
+_lock = threading.Lock()
+
+
+def registrar_tiempo(fase, segundos):
+    with _lock:
+        agregado = _fases.get(fase)
+        if agregado is None:
+            agregado = _fases[fase] = _Agregado()
+        agregado.registrar(segundos)
+
+
+def registrar_resultado(resultado):
+    """Cuenta resultados de autenticación: ok, cache, rechazado, error, anonimo..."""
+    metricas.AUTH.inc(resultado=resultado)
+    if not _cargar_config()['habilitado']:
+        return
+    with _lock:
+        _resultados[resultado] = _resultados.get(resultado, 0) + 1
+
+
+class _Medicion:
+    __slots__ = ('fase', 'inicio', 'duracion')
+
+    def __init__(self, fase):
+        self.fase = fase
+        self.duracion = 0.0
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duracion = time.perf_counter() - self.inicio
+        registrar_tiempo(self.fase, self.duracion)
+        return False
+
+
+class _MedicionNula:
+    __slots__ = ()
+    duracion = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULA = _MedicionNula()
+
+
+def medir(fase):
+    """Context manager que registra la duración de `fase` (no-op si está deshabilitado)."""
+    if not _cargar_config()['habilitado']:
+        return _NULA
+    return _Medicion(fase)
+
+
+def snapshot():
+    """Tiempos por fase y contadores de resultado acumulados en este proceso."""
+    with _lock:
+        return {
+            'fases': {fase: agregado.como_dict() for fase, agregado in _fases.items()},
+            'resultados': dict(_resultados),
+        }
+
+
+def reset():
+    with _lock:
+        _fases.clear()
+        _resultados.clear()
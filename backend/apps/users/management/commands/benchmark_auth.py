@@ -0,0 +1,83 @@
+"""
+Benchmark de latencia de autenticación por request: verificación remota
+(`supabase.auth.get_user`) vs verificación local del JWT vs token en cache.
+
+Uso:
+    python manage.py benchmark_auth --iteraciones 500 --latencia-ms 40
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from backend.apps.users.authentication import SupabaseAuthentication
+from backend.apps.users.cache import get_principal_cache
+from backend.apps.users.clients import stats as clients_stats
+from backend.apps.users.instrumentation import snapshot as auth_snapshot
+from backend.apps.users.fake_issuer import FakeSupabaseIssuer
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de SupabaseAuthentication en modo remoto y local contra un emisor falso'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=200)
+        parser.add_argument('--calentamiento', type=int, default=10)
+        parser.add_argument('--latencia-ms', type=float, default=0,
+                            help='Latencia simulada del emisor (red hacia Supabase)')
+        parser.add_argument('--algoritmo', choices=['HS256', 'ES256'], default='HS256')
+
+    def _medir(self, token, iteraciones, calentamiento):
+        auth = SupabaseAuthentication()
+        request = RequestFactory().get('/api/dashboard/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        for _ in range(calentamiento):
+            auth.authenticate(request)
+
+        tiempos = []
+        for _ in range(iteraciones):
+            inicio = time.perf_counter()
+            auth.authenticate(request)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
+
+    def _resumen(self, modo, tiempos):
+        p = statistics.quantiles(tiempos, n=100)
+        return (f"{modo:<8} n={len(tiempos):<6} media={statistics.mean(tiempos):8.3f}ms "
+                f"p50={p[49]:8.3f}ms p95={p[94]:8.3f}ms max={max(tiempos):8.3f}ms")
+
+    def handle(self, *args, **options):
+        resultados = {}
+        with FakeSupabaseIssuer(algoritmo=options['algoritmo'], latencia_ms=options['latencia_ms']) as issuer:
+            token = issuer.emitir('benchmark@salvandopatitas.local')
+            overrides = {
+                'SUPABASE_URL': issuer.url,
+                'SUPABASE_JWT_SECRET': issuer.secret,
+                'SUPABASE_JWKS_URL': f'{issuer.issuer}/.well-known/jwks.json',
+                'SUPABASE_JWT_ISSUER': issuer.issuer,
+                'SUPABASE_JWT_AUDIENCE': 'authenticated',
+            }
+
+            # El usuario "shadow" que se crea durante la medición no debe quedar en la BD
+            with transaction.atomic():
+                # Sin cache token->usuario para medir la verificación en sí
+                for modo in ('remote', 'local'):
+                    with override_settings(SUPABASE_AUTH_MODE=modo, SUPABASE_AUTH_CACHE_SIZE=0, **overrides):
+                        resultados[modo] = self._medir(token, options['iteraciones'], options['calentamiento'])
+                with override_settings(SUPABASE_AUTH_MODE='local', **overrides):
+                    resultados['cache'] = self._medir(token, options['iteraciones'], options['calentamiento'])
+                    cache_stats = get_principal_cache().stats()
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"Algoritmo: {options['algoritmo']} | latencia simulada: {options['latencia_ms']}ms")
+        for modo, tiempos in resultados.items():
+            self.stdout.write(self._resumen(modo, tiempos))
+
+        self.stdout.write(f"Cache de tokens: {cache_stats}")
+        self.stdout.write(f"Clientes Supabase: {clients_stats()}")
+        for fase, datos in auth_snapshot()['fases'].items():
+            self.stdout.write(f"Fase {fase:<12} {datos}")
+
+        mejora = statistics.median(resultados['remote']) / max(statistics.median(resultados['local']), 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"Mediana local {mejora:.1f}x más rápida que remota"))
@@ -0,0 +1,222 @@
+"""
+Verificación local de los JWT emitidos por Supabase Auth.
+
+En lugar de preguntarle a Supabase por cada request (`auth.get_user`), se valida
+la firma, expiración, audiencia y emisor del token dentro del proceso. Las llaves
+se obtienen de:
+
+* `SUPABASE_JWT_SECRET` para tokens HS256 (proyectos con secreto compartido).
+* El JWKS del proyecto (`SUPABASE_JWKS_URL`) para tokens RS256/ES256. El set de
+  llaves se cachea y se refresca en segundo plano antes de que venza.
+"""
+import json
+import threading
+import time
+import urllib.request
+
+import jwt
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+ALGORITMOS_SIMETRICOS = ('HS256', 'HS384', 'HS512')
+ALGORITMOS_ASIMETRICOS = ('RS256', 'RS384', 'RS512', 'ES256', 'ES384', 'PS256')
+
+
+class TokenInvalido(Exception):
+    """El token fue rechazado (firma, expiración, audiencia o emisor)."""
+
+
+class LlaveNoDisponible(Exception):
+    """No hay una llave local para verificar el token (permite fallback remoto)."""
+
+
+class JWKSCache:
+    """
+    Cache de llaves públicas (JWKS) con refresco en segundo plano.
+
+    Las llaves se indexan por `kid`. Si llega un token con un `kid` desconocido
+    (rotación de llaves) se intenta un refresco síncrono, limitado a uno cada
+    `intervalo_minimo` segundos para no convertir tokens basura en tráfico a Supabase.
+    Solo la primera carga ignora ese límite; si falla (JWKS caído) los
+    reintentos quedan a cargo del hilo de refresco.
+    """
+
+    def __init__(self, url, ttl=600, intervalo_minimo=30, timeout=5):
+        self.url = url
+        self.ttl = ttl
+        self.intervalo_minimo = intervalo_minimo
+        self.timeout = timeout
+        self._llaves = {}
+        self._obtenido_en = 0.0
+        self._ultimo_intento = 0.0
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+
+    def _descargar(self):
+        request = urllib.request.Request(self.url, headers={'Accept': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+
+        llaves = {}
+        for jwk in data.get('keys', []):
+            try:
+                llave = jwt.PyJWK(jwk)
+            except (jwt.PyJWKError, jwt.InvalidKeyError):
+                continue
+            llaves[jwk.get('kid')] = llave
+        return llaves
+
+    def refrescar(self, forzar=False):
+        """Descarga el JWKS. Devuelve True si el set de llaves quedó actualizado."""
+        with self._lock:
+            ahora = time.monotonic()
+            if not forzar and ahora - self._ultimo_intento < self.intervalo_minimo:
+                return False
+            return self._actualizar(ahora)
+
+    def cargar(self):
+        """Primera descarga, sin rate limit; los hilos que esperaban no la repiten."""
+        with self._lock:
+            if self._ultimo_intento:
+                return False
+            return self._actualizar(time.monotonic())
+
+    def _actualizar(self, ahora):
+        self._ultimo_intento = ahora
+        try:
+            llaves = self._descargar()
+        except (OSError, ValueError):
+            # Se conservan las llaves anteriores: un JWKS caído no debe tumbar la API
+            return False
+        self._llaves = llaves
+        self._obtenido_en = ahora
+        return True
+
+    def vencido(self):
+        return time.monotonic() - self._obtenido_en > self.ttl
+
+    def refrescando(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def llave(self, kid):
+        if not self._ultimo_intento:
+            self.cargar()
+        elif self.vencido() and not self.refrescando():
+            self.refrescar()
+        llave = self._llaves.get(kid)
+        if llave is None:
+            # Posible rotación: se intenta un refresco (con rate limit)
+            self.refrescar()
+            llave = self._llaves.get(kid)
+        if llave is None:
+            raise LlaveNoDisponible(f'No hay llave JWKS para kid={kid}')
+        return llave
+
+    def iniciar_refresco(self):
+        """Lanza un hilo daemon que refresca el JWKS al 80% del TTL."""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='supabase-jwks-refresh', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            if self.refrescar(forzar=True):
+                espera = self.ttl * 0.8
+            else:
+                espera = min(self.intervalo_minimo, self.ttl)
+            self._detener.wait(espera)
+
+
+class SupabaseJWTVerifier:
+    """
+    Valida un access token de Supabase y retorna sus claims.
+    """
+
+    def __init__(self, secret=None, jwks_url=None, audience=None, issuer=None,
+                 leeway=0, jwks_ttl=600, refresco_en_segundo_plano=True):
+        self.secret = secret
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.jwks = JWKSCache(jwks_url, ttl=jwks_ttl) if jwks_url else None
+        if self.jwks and refresco_en_segundo_plano:
+            self.jwks.iniciar_refresco()
+
+    @classmethod
+    def desde_settings(cls):
+        return cls(
+            secret=getattr(settings, 'SUPABASE_JWT_SECRET', None),
+            jwks_url=getattr(settings, 'SUPABASE_JWKS_URL', None),
+            audience=getattr(settings, 'SUPABASE_JWT_AUDIENCE', None),
+            issuer=getattr(settings, 'SUPABASE_JWT_ISSUER', None),
+            leeway=getattr(settings, 'SUPABASE_JWT_LEEWAY', 0),
+            jwks_ttl=getattr(settings, 'SUPABASE_JWKS_TTL', 600),
+        )
+
+    def _llave(self, header):
+        alg = header.get('alg')
+        if alg in ALGORITMOS_SIMETRICOS:
+            if not self.secret:
+                raise LlaveNoDisponible('SUPABASE_JWT_SECRET no está configurado')
+            return self.secret, alg
+        if alg in ALGORITMOS_ASIMETRICOS:
+            if not self.jwks:
+                raise LlaveNoDisponible('SUPABASE_JWKS_URL no está configurado')
+            return self.jwks.llave(header.get('kid')).key, alg
+        raise TokenInvalido(f'Algoritmo no permitido: {alg}')
+
+    def verificar(self, token):
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenInvalido(str(e))
+
+        llave, alg = self._llave(header)
+        opciones = {'require': ['exp', 'sub'], 'verify_aud': bool(self.audience)}
+        try:
+            return jwt.decode(
+                token,
+                llave,
+                algorithms=[alg],
+                audience=self.audience,
+                issuer=self.issuer or None,
+                leeway=self.leeway,
+                options=opciones,
+            )
+        except jwt.PyJWTError as e:
+            raise TokenInvalido(str(e))
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """Verificador compartido por proceso (se construye perezosamente)."""
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                _verifier = SupabaseJWTVerifier.desde_settings()
+    return _verifier
+
+
+def reset_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is not None and _verifier.jwks:
+            _verifier.jwks.detener()
+        _verifier = None
+
+
+@receiver(setting_changed)
+def _reset_por_settings(sender, setting, **kwargs):
+    if setting.startswith('SUPABASE_'):
+        reset_verifier()
@@ -1,5 +1,7 @@
+import importlib.util
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir el request completo; solo activo con PROFILING_ENABLED
+    'backend.apps.core.perfilado.PerfiladoMiddleware',
+    'backend.apps.core.metricas.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -49,6 +54,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Marca a quien escribe para que lea de la primaria (solo con réplicas)
+    'backend.apps.core.replicas.ReplicasMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +83,78 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 import dj_database_url
 
 # Database
-# Database
+# Conexiones (ver gunicorn.conf.py y `manage.py benchmark_conexiones`):
+# * DB_CONN_MAX_AGE: segundos que una conexión sobrevive entre requests (0 = una
+#   conexión nueva, con su handshake TLS, por request). Con DB_CONN_HEALTH_CHECKS
+#   se verifica al reutilizarla en un request nuevo y se reabre si se cayó.
+# * DB_POOL: pool de psycopg 3 por proceso (requiere `psycopg[binary,pool]`; no se
+#   combina con DB_CONN_MAX_AGE). Los tamaños son por worker de gunicorn: el total
+#   de conexiones es workers × DB_POOL_MAX_SIZE. Con DASHBOARD_CONCURRENTE sumar
+#   DASHBOARD_MAX_WORKERS a los hilos del worker.
+# * DB_PGBOUNCER: DATABASE_URL apunta a PgBouncer (o al pooler de Supabase) en
+#   modo transacción: sin cursores del lado del servidor ni sentencias preparadas.
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "1"))
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", str(max(GUNICORN_THREADS, 2))))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "False") == "True"
+
+# * DATABASE_REPLICA_URLS: réplicas de lectura separadas por coma (alias `replica`,
+#   `replica_2`...), con las mismas opciones de conexión. Reciben las lecturas
+#   del Dashboard, `kpis`, `top` y las exportaciones (core/replicas.py); el resto
+#   usa la primaria. REPLICA_STICKY_SECONDS: tras escribir, el usuario lee de la
+#   primaria durante ese tiempo. Una réplica caída o con más de
+#   REPLICA_MAX_LAG_SECONDS de atraso se saltea (se revisa cada
+#   REPLICA_CHECK_INTERVAL segundos por proceso). REPLICA_CACHE_TIMEOUT: TTL de
+#   las respuestas cacheadas calculadas en una réplica.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "15"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_CACHE_TIMEOUT = int(os.getenv("REPLICA_CACHE_TIMEOUT", "60"))
+
+_opciones_conexion = {
+    'conn_max_age': 0 if DB_POOL else DB_CONN_MAX_AGE,
+    'conn_health_checks': DB_CONN_HEALTH_CHECKS and not DB_POOL,
+    'disable_server_side_cursors': DB_PGBOUNCER,
+}
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.getenv('DATABASE_URL'),
-        conn_max_age=0
-    )
+    'default': dj_database_url.config(default=os.getenv('DATABASE_URL'), **_opciones_conexion)
 }
+REPLICAS = []
+for _numero, _url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    _alias = 'replica' if _numero == 1 else f'replica_{_numero}'
+    # En tests la réplica es la base de pruebas de default
+    DATABASES[_alias] = dj_database_url.parse(_url, test_options={'MIRROR': 'default'}, **_opciones_conexion)
+    REPLICAS.append(_alias)
+if REPLICAS:
+    DATABASE_ROUTERS = ['backend.apps.core.replicas.RouterReplicas']
+
+for _alias, _base in DATABASES.items():
+    if _base.get('ENGINE') != 'django.db.backends.postgresql':
+        continue
+    _opciones_bd = _base.setdefault('OPTIONS', {})
+    if _alias in REPLICAS:
+        # Una réplica caída no debe colgar el request hasta el timeout de TCP
+        _opciones_bd.setdefault('connect_timeout', 3)
+    if DB_POOL:
+        if importlib.util.find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured(
+                'DB_POOL=True requiere psycopg 3 con su pool: pip install "psycopg[binary,pool]"'
+            )
+        _opciones_bd['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    if DB_PGBOUNCER and importlib.util.find_spec('psycopg') is not None:
+        # psycopg 3: parámetros enlazados en el cliente y nunca PREPARE (la
+        # sentencia preparada quedaría en otra conexión del servidor)
+        _opciones_bd['server_side_binding'] = False
+        _opciones_bd['prepare_threshold'] = None
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,14 +193,119 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("❌ Faltan variables de entorno SUPABASE_URL o SUPABASE_KEY")
 
+# Verificación de JWT de Supabase
+# 'local': firma/exp/aud/iss verificados en proceso. 'remote': supabase.auth.get_user por request.
+SUPABASE_AUTH_MODE = os.getenv("SUPABASE_AUTH_MODE", "local")
+SUPABASE_AUTH_REMOTE_FALLBACK = os.getenv("SUPABASE_AUTH_REMOTE_FALLBACK", "False") == "True"
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json")
+SUPABASE_JWKS_TTL = int(os.getenv("SUPABASE_JWKS_TTL", "600"))
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWT_ISSUER = os.getenv("SUPABASE_JWT_ISSUER", f"{SUPABASE_URL.rstrip('/')}/auth/v1")
+SUPABASE_JWT_LEEWAY = int(os.getenv("SUPABASE_JWT_LEEWAY", "10"))
+
+# Cache token -> usuario (LRU por proceso). SIZE=0 la desactiva.
+SUPABASE_AUTH_CACHE_SIZE = int(os.getenv("SUPABASE_AUTH_CACHE_SIZE", "2048"))
+SUPABASE_AUTH_CACHE_TTL = int(os.getenv("SUPABASE_AUTH_CACHE_TTL", "300"))
+SUPABASE_AUTH_CACHE_NEGATIVE_TTL = int(os.getenv("SUPABASE_AUTH_CACHE_NEGATIVE_TTL", "30"))
+
+# Instrumentación de autenticación (eventos JSON vía cola + tiempos por fase)
+AUTH_INSTRUMENTATION_ENABLED = os.getenv("AUTH_INSTRUMENTATION_ENABLED", "True") == "True"
+AUTH_LOG_SAMPLE_RATE = float(os.getenv("AUTH_LOG_SAMPLE_RATE", "0.1"))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'auth_cola': {
+            'class': 'backend.apps.users.instrumentation.ColaHandler',
+        },
+        'perfilado_cola': {
+            'class': 'backend.apps.users.instrumentation.ColaHandler',
+        },
+    },
+    'loggers': {
+        'backend.auth': {
+            'handlers': ['auth_cola'],
+            'level': os.getenv("AUTH_LOG_LEVEL", "INFO"),
+            'propagate': False,
+        },
+        'backend.perfilado': {
+            'handlers': ['perfilado_cola'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Perfilado por request (core/perfilado.py): fases auth/view/db/serializer/render
+# en el header Server-Timing, un log JSON muestreado y el reporte de consultas
+# lentas por endpoint en GET /api/perfilado/ (staff). PROFILING_SAMPLE_RATE es la
+# fracción de requests perfilados; con PROFILING_ENABLED=False el middleware no se carga.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+PROFILING_LOG_SAMPLE_RATE = float(os.getenv("PROFILING_LOG_SAMPLE_RATE", "0.01"))
+PROFILING_TOP_QUERIES = int(os.getenv("PROFILING_TOP_QUERIES", "10"))
+PROFILING_SERVER_TIMING = os.getenv("PROFILING_SERVER_TIMING", "True") == "True"
+
+# Métricas Prometheus (core/metricas.py) en GET /api/metricas/ (staff). Con varios
+# workers de gunicorn cada proceso escribe en METRICS_MULTIPROC_DIR y la URL suma
+# todos; gunicorn.conf.py lo define y lo vacía al arrancar. Vacío = en memoria.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+
+# Cache (respuestas del Dashboard y KPIs). Con varios workers usar un backend
+# compartido, p.ej. CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# y CACHE_LOCATION=/var/tmp/crm_cache, o redis. Con locmem cada worker tendría
+# su propia versión de datos (y serviría datos viejos): la cache de respuestas
+# queda apagada salvo DASHBOARD_CACHE_ENABLED=True explícito (check core.W001).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        'LOCATION': os.getenv("CACHE_LOCATION", "crm-fsp"),
+    }
+}
+_CACHE_COMPARTIDO = not CACHES['default']['BACKEND'].endswith('.LocMemCache')
+DASHBOARD_CACHE_ENABLED = os.getenv("DASHBOARD_CACHE_ENABLED", str(_CACHE_COMPARTIDO)) == "True"
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "300"))
+
+# Dashboard: secciones en paralelo (una conexión por hilo; contar con ellas en el pool de la BD)
+DASHBOARD_CONCURRENTE = os.getenv("DASHBOARD_CONCURRENTE", "False") == "True"
+DASHBOARD_MAX_WORKERS = int(os.getenv("DASHBOARD_MAX_WORKERS", "4"))
+DASHBOARD_TIMEOUT_SECCION = float(os.getenv("DASHBOARD_TIMEOUT_SECCION", "5"))
+
+# Exportaciones: filas leídas por lote del cursor (ver core/exports.py)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Exportaciones asíncronas (?async=1, ver core/trabajos.py y `manage.py export_worker`)
+EXPORTS_ROOT = os.getenv("EXPORTS_ROOT", str(BASE_DIR / 'exports'))
+EXPORT_TTL_HORAS = int(os.getenv("EXPORT_TTL_HORAS", "24"))
+EXPORT_MAX_ACTIVOS_POR_USUARIO = int(os.getenv("EXPORT_MAX_ACTIVOS_POR_USUARIO", "3"))
+EXPORT_MAX_CONCURRENTES_POR_USUARIO = int(os.getenv("EXPORT_MAX_CONCURRENTES_POR_USUARIO", "1"))
+# El worker marca `latido` cada EXPORT_LATIDO_SEGUNDOS; un trabajo sin latido por
+# EXPORT_TIMEOUT_TRABAJO segundos se considera de un worker caído y se reencola
+EXPORT_LATIDO_SEGUNDOS = int(os.getenv("EXPORT_LATIDO_SEGUNDOS", "30"))
+EXPORT_TIMEOUT_TRABAJO = int(os.getenv("EXPORT_TIMEOUT_TRABAJO", "300"))
+EXPORT_MAX_INTENTOS = int(os.getenv("EXPORT_MAX_INTENTOS", "2"))
+
+# Altas masivas (POST /api/donaciones/batch/, /api/gastos/batch/; ver core/lotes.py)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+
+# Importación de CSV: filas por bloque, cada bloque en su transacción (ver core/importacion.py)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "50000"))
+
+# Paginación: con ?conteo=estimado, por debajo de este número se hace COUNT(*) igual
+PAGINACION_CONTEO_EXACTO_HASTA = int(os.getenv("PAGINACION_CONTEO_EXACTO_HASTA", "1000"))
+
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'backend.apps.core.pagination.CustomPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
+        'backend.apps.core.busqueda.BusquedaFilter',
+        'backend.apps.core.busqueda.OrdenFilter',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -0,0 +1,46 @@
+"""
+Configuración de gunicorn. Se lee por defecto desde el directorio de trabajo
+(`gunicorn backend.wsgi`, ver Procfile).
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parent / '.env', override=True)
+
+# Métricas multiproceso (backend/apps/core/metricas.py): cada worker escribe
+# en su archivo dentro de este directorio. Se define aquí para que los workers
+# lo hereden del master.
+if not os.environ.get('METRICS_MULTIPROC_DIR'):
+    os.environ['METRICS_MULTIPROC_DIR'] = os.path.join(tempfile.gettempdir(), 'crm_metricas')
+
+
+def on_starting(server):
+    # Los archivos de una corrida anterior no deben sumarse a esta
+    directorio = os.environ['METRICS_MULTIPROC_DIR']
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+
+
+# Hilos por worker. El pool de conexiones (DB_POOL_MAX_SIZE en settings.py) se
+# dimensiona por worker a partir de este mismo valor.
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+
+
+def post_worker_init(worker):
+    # La aplicación ya está cargada: abrir la conexión (o el pool) antes del
+    # primer request. Con un solo hilo la conexión persistente se reutiliza.
+    from backend.apps.core import conexiones
+
+    tiempos = conexiones.precalentar(mantener=worker.cfg.threads == 1)
+    worker.log.info('Conexiones pre-calentadas (%s): %s', conexiones.modo(),
+                    ', '.join(f'{alias} {ms:.0f}ms' for alias, ms in tiempos.items()))
+
+
+def worker_exit(server, worker):
+    from backend.apps.core import conexiones
+
+    conexiones.cerrar()